@@ -0,0 +1,253 @@
+"""
+Micro-benchmarks of the CRUD methods, with pytest-benchmark.
+
+Seeds a skewed dataset of `BENCH_TASKS` tasks in `BENCH_LISTS` lists into a
+throwaway SQLite database, unless `DATABASE_URL` is set, and times each
+method of `CRUDTodo` and `CRUDTodoList`. Reads of one list run on the
+largest and on the median list, writes on a list of their own.
+
+Usage:
+    BENCH_TASKS=1000000 python -m pytest benchmarks/bench_crud.py --no-cov \
+        --benchmark-json benchmarks/results/crud.json
+"""
+
+import itertools
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+os.environ.setdefault(
+    "DATABASE_URL",
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'crud.db')}",
+)
+
+import pytest  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from datasets import seed  # noqa: E402
+from domain.schemas.todo import TodoCreate, TodoUpdate  # noqa: E402
+from domain.schemas.todo_list import (  # noqa: E402
+    TodoListCreate,
+    TodoListUpdate,
+)
+from infraestructure.crud.todo import todo  # noqa: E402
+from infraestructure.crud.todo_list import todo_list  # noqa: E402
+from infraestructure.db.database import engine  # noqa: E402
+
+BENCH_TASKS = int(os.getenv("BENCH_TASKS", "10000"))
+BENCH_LISTS = int(os.getenv("BENCH_LISTS", "100"))
+BATCH = 100
+
+counter = itertools.count()
+
+
+@pytest.fixture(scope="session")
+def dataset():
+    return seed(BENCH_TASKS, BENCH_LISTS)
+
+
+@pytest.fixture
+def db():
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture(params=["largest", "median"])
+def list_id(request, dataset):
+    index = 0 if request.param == "largest" else len(dataset.list_ids) // 2
+    return dataset.list_ids[index]
+
+
+@pytest.fixture
+def task_id(dataset, list_id):
+    return dataset.task_ids[list_id][-1]
+
+
+@pytest.fixture(scope="session")
+def scratch_list_id(dataset):
+    with Session(engine) as session:
+        return todo_list.create(session, TodoListCreate(name="Scratch")).id
+
+
+def new_todos(db, list_id, count=1):
+    return todo.bulk_create(
+        db,
+        [TodoCreate(title=f"Todo {next(counter)}") for _ in range(count)],
+        list_id,
+    )
+
+
+def test_todo_list_get(benchmark, db, list_id):
+    benchmark(todo_list.get, db, list_id)
+
+
+def test_todo_list_all(benchmark, db, dataset):
+    benchmark(todo_list.all, db)
+
+
+def test_todo_list_all_search(benchmark, db, dataset):
+    benchmark(todo_list.all, db, name="List")
+
+
+def test_todo_list_stats(benchmark, db, list_id):
+    benchmark(todo_list.stats, db, list_id)
+
+
+def test_todo_list_include_todos(benchmark, db, dataset):
+    lists = todo_list.all(db)["data"]
+    benchmark(todo_list.include_todos, db, lists)
+
+
+def test_todo_get(benchmark, db, task_id):
+    benchmark(todo.get, db, task_id)
+
+
+def test_todo_get_in_list(benchmark, db, list_id, task_id):
+    benchmark(todo.get_in_list, db, list_id, task_id)
+
+
+def test_todo_collection_version(benchmark, db, list_id):
+    benchmark(todo.collection_version, db, list_id)
+
+
+def test_todo_get_all_by_list_id(benchmark, db, list_id):
+    benchmark(todo.get_all_by_list_id, db, list_id)
+
+
+def test_todo_get_all_by_list_id_deep_offset(benchmark, db, list_id, dataset):
+    size = dataset.sizes[dataset.list_ids.index(list_id)]
+    benchmark(todo.get_all_by_list_id, db, list_id, skip=max(size - 100, 0))
+
+
+def test_todo_get_all_by_list_id_completed_first(benchmark, db, list_id):
+    benchmark(todo.get_all_by_list_id, db, list_id, order_by_completed=True)
+
+
+def test_todo_get_all_by_list_id_search(benchmark, db, list_id):
+    benchmark(todo.get_all_by_list_id, db, list_id, name="Task")
+
+
+def test_todo_get_all_by_list_id_fields(benchmark, db, list_id):
+    benchmark(todo.get_all_by_list_id, db, list_id, fields=["id", "title"])
+
+
+def test_todo_get_by_list_ids(benchmark, db, dataset):
+    benchmark(todo.get_by_list_ids, db, dataset.list_ids[:BATCH])
+
+
+def test_todo_list_create(benchmark, db):
+    benchmark(
+        lambda: todo_list.create(
+            db, TodoListCreate(name=f"List {next(counter)}")
+        )
+    )
+
+
+def test_todo_list_update(benchmark, db, scratch_list_id):
+    db_obj = todo_list.get(db, scratch_list_id)
+    benchmark(
+        lambda: todo_list.update(
+            db, db_obj, TodoListUpdate(name=f"Scratch {next(counter)}")
+        )
+    )
+
+
+def test_todo_list_delete(benchmark, db):
+    def setup():
+        db_obj = todo_list.create(db, TodoListCreate(name="Deleted"))
+        return (db, db_obj.id), {}
+
+    benchmark.pedantic(todo_list.delete, setup=setup, rounds=50)
+
+
+def test_todo_create(benchmark, db, scratch_list_id):
+    benchmark(
+        lambda: todo.create(
+            db, TodoCreate(title=f"Todo {next(counter)}"), scratch_list_id
+        )
+    )
+
+
+def test_todo_update(benchmark, db, scratch_list_id):
+    db_obj = new_todos(db, scratch_list_id)[0]
+    benchmark(
+        lambda: todo.update(
+            db, db_obj, TodoUpdate(title=f"Todo {next(counter)}")
+        )
+    )
+
+
+def test_todo_update_in_list(benchmark, db, scratch_list_id):
+    todo_id = new_todos(db, scratch_list_id)[0].id
+    benchmark(
+        lambda: todo.update_in_list(
+            db,
+            scratch_list_id,
+            todo_id,
+            TodoUpdate(is_completed=next(counter) % 2 == 0),
+        )
+    )
+
+
+def test_todo_delete(benchmark, db, scratch_list_id):
+    def setup():
+        return (db, new_todos(db, scratch_list_id)[0].id), {}
+
+    benchmark.pedantic(todo.delete, setup=setup, rounds=50)
+
+
+def test_todo_delete_in_list(benchmark, db, scratch_list_id):
+    def setup():
+        todo_id = new_todos(db, scratch_list_id)[0].id
+        return (db, scratch_list_id, todo_id), {}
+
+    benchmark.pedantic(todo.delete_in_list, setup=setup, rounds=50)
+
+
+def test_todo_bulk_create(benchmark, db, scratch_list_id):
+    benchmark(new_todos, db, scratch_list_id, BATCH)
+
+
+def test_todo_bulk_update(benchmark, db, scratch_list_id):
+    ids = [db_obj.id for db_obj in new_todos(db, scratch_list_id, BATCH)]
+
+    def bulk_update():
+        obj_in = TodoUpdate(is_completed=next(counter) % 2 == 0)
+        return todo.bulk_update(
+            db, [(id, obj_in) for id in ids], scratch_list_id
+        )
+
+    benchmark(bulk_update)
+
+
+def test_todo_bulk_delete(benchmark, db, scratch_list_id):
+    def setup():
+        ids = [db_obj.id for db_obj in new_todos(db, scratch_list_id, BATCH)]
+        return (db, ids, scratch_list_id), {}
+
+    benchmark.pedantic(todo.bulk_delete, setup=setup, rounds=20)
+
+
+def test_todo_import_rows(benchmark, db, scratch_list_id):
+    objs_in = [TodoCreate(title=f"Imported {index}") for index in range(1000)]
+    benchmark(todo.import_rows, db, objs_in, scratch_list_id)
+
+
+def test_todo_flush_updates(benchmark, db, scratch_list_id):
+    ids = [db_obj.id for db_obj in new_todos(db, scratch_list_id, BATCH)]
+
+    def flush():
+        is_completed = next(counter) % 2 == 0
+        batch = {
+            (scratch_list_id, id): {"is_completed": is_completed} for id in ids
+        }
+        return todo.flush_updates(db, batch)
+
+    benchmark(flush)
+
+
+def test_todo_list_reconcile_counters(benchmark, db, dataset):
+    benchmark.pedantic(todo_list.reconcile_counters, args=(db,), rounds=3)
@@ -0,0 +1,90 @@
+"""
+Compare benchmark results against a stored baseline.
+
+Reads two JSON reports of the same kind: the output of
+`pytest --benchmark-json` for `bench_crud.py`, or the output of `load.py`.
+CRUD benchmarks are compared by median time, routes by p95 latency and by
+throughput. Exits with status 1 when a measure is worse than the baseline
+by more than `--threshold`, so it can gate a CI job.
+
+Usage:
+    python benchmarks/compare.py benchmarks/results/baseline-load.json \
+        benchmarks/results/load.json --threshold 0.1
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Tuple
+
+# Measure name -> whether higher values are better.
+LOAD_MEASURES = {"p95": False, "throughput": True}
+CRUD_MEASURES = {"median": False}
+
+
+def measures(report: dict) -> Dict[Tuple[str, str], Tuple[float, bool]]:
+    """
+    Flatten a report into (name, measure) -> (value, higher is better).
+    """
+    if "routes" in report:
+        return {
+            (route, measure): (result[measure], higher)
+            for route, result in report["routes"].items()
+            for measure, higher in LOAD_MEASURES.items()
+        }
+    return {
+        (benchmark["name"], measure): (benchmark["stats"][measure], higher)
+        for benchmark in report["benchmarks"]
+        for measure, higher in CRUD_MEASURES.items()
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> int:
+    """
+    Print the change of every measure, returning the number of regressions.
+    """
+    before, after = measures(baseline), measures(current)
+    regressions = 0
+    for key in sorted(before.keys() | after.keys()):
+        name, measure = key
+        if key not in before or key not in after:
+            state = "new" if key in after else "missing"
+            print(f"{name:<60} {measure:<10} {state}")
+            continue
+        (old, higher), (new, _) = before[key], after[key]
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher else change
+        regressed = worse > threshold
+        regressions += regressed
+        print(
+            f"{name:<60} {measure:<10} {old:12.4g} -> {new:12.4g} "
+            f"{change:+8.1%}{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("current", type=Path)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="The relative change counted as a regression",
+    )
+    args = parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text())
+    current = json.loads(args.current.read_text())
+    if ("routes" in baseline) != ("routes" in current):
+        parser.error("The reports are not of the same kind")
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"{regressions} regression(s) over {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Seed synthetic datasets for the benchmarks.
+
+Tasks are spread over lists with a Zipf-like skew: the list of rank i holds
+a share of the tasks proportional to 1 / i ** skew, so a few lists are huge
+and most are small. Rows are loaded batch by batch with the bulk loader of
+the import endpoint, into the database of `DATABASE_URL`.
+
+Usage:
+    DATABASE_URL=sqlite:///bench.db \
+        python benchmarks/datasets.py --tasks 10000000 --lists 10000
+"""
+
+import argparse
+import random
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List
+from uuid import UUID
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from sqlalchemy import bindparam, update  # noqa: E402
+
+from domain.models.base import uuid7  # noqa: E402
+from domain.models.todo import Todo  # noqa: E402
+from domain.models.todo_list import TodoList  # noqa: E402
+from infraestructure.crud.ingest import copy_rows  # noqa: E402
+from infraestructure.db.database import get_db, init_db  # noqa: E402
+
+SEED_BATCH_SIZE = 10_000
+SAMPLE_SIZE = 100
+
+
+@dataclass
+class Dataset:
+    """
+    A seeded dataset.
+
+    Attributes:
+        list_ids: The ids of the lists, largest first.
+        sizes: The number of tasks of each list, in the same order.
+        task_ids: Up to `SAMPLE_SIZE` task ids of each list, by list id.
+    """
+
+    list_ids: List[UUID] = field(default_factory=list)
+    sizes: List[int] = field(default_factory=list)
+    task_ids: Dict[UUID, List[UUID]] = field(default_factory=dict)
+
+    @property
+    def tasks(self) -> int:
+        return sum(self.sizes)
+
+
+def list_sizes(tasks: int, lists: int, skew: float) -> List[int]:
+    """
+    Split `tasks` over `lists` lists, the list of rank i getting a share
+    proportional to 1 / i ** skew.
+    """
+    weights = [1 / rank**skew for rank in range(1, lists + 1)]
+    total = sum(weights)
+    sizes = [int(tasks * weight / total) for weight in weights]
+    sizes[0] += tasks - sum(sizes)
+    return sizes
+
+
+def seed(
+    tasks: int = 10_000,
+    lists: int = 100,
+    skew: float = 1.1,
+    completed: float = 0.3,
+    random_seed: int = 0,
+) -> Dataset:
+    """
+    Create `lists` lists holding `tasks` tasks in total.
+
+    Args:
+        tasks: The number of tasks.
+        lists: The number of lists.
+        skew: How unevenly tasks are spread, 0 for lists of equal size.
+        completed: The share of completed tasks.
+        random_seed: The seed of the titles and completion flags.
+
+    Returns:
+        The ids and sizes of the seeded lists.
+    """
+    init_db()
+    rng = random.Random(random_seed)
+    dataset = Dataset(sizes=list_sizes(tasks, lists, skew))
+    dataset.list_ids = [uuid7() for _ in dataset.sizes]
+    db_session = get_db()
+    db = next(db_session)
+    copy_rows(
+        db,
+        TodoList.__table__,
+        [
+            {
+                "id": list_id,
+                "is_active": True,
+                "version": 1,
+                "name": f"List {rank}",
+                "todos_version": 1,
+                "todos_total": size,
+                "todos_completed": 0,
+            }
+            for rank, (list_id, size) in enumerate(
+                zip(dataset.list_ids, dataset.sizes)
+            )
+        ],
+    )
+    counters, task_rows = [], []
+    for rank, (list_id, size) in enumerate(
+        zip(dataset.list_ids, dataset.sizes)
+    ):
+        done = 0
+        for index in range(size):
+            is_completed = rng.random() < completed
+            done += is_completed
+            task_id = uuid7()
+            if index < SAMPLE_SIZE:
+                dataset.task_ids.setdefault(list_id, []).append(task_id)
+            task_rows.append(
+                {
+                    "id": task_id,
+                    "is_active": True,
+                    "version": 1,
+                    "title": f"Task {rank}.{index} {rng.randrange(10**6)}",
+                    "description": None,
+                    "is_completed": is_completed,
+                    "list_id": list_id,
+                }
+            )
+            if len(task_rows) == SEED_BATCH_SIZE:
+                copy_rows(db, Todo.__table__, task_rows)
+                db.commit()
+                task_rows = []
+        counters.append({"list_id": list_id, "done": done})
+    copy_rows(db, Todo.__table__, task_rows)
+    db.execute(
+        update(TodoList.__table__)
+        .where(TodoList.__table__.c.id == bindparam("list_id"))
+        .values(todos_completed=bindparam("done")),
+        counters,
+    )
+    db.commit()
+    db_session.close()
+    return dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=10_000)
+    parser.add_argument("--lists", type=int, default=100)
+    parser.add_argument("--skew", type=float, default=1.1)
+    args = parser.parse_args()
+
+    dataset = seed(args.tasks, args.lists, args.skew)
+    print(
+        f"{dataset.tasks:,} tasks in {len(dataset.list_ids)} lists, "
+        f"largest {dataset.sizes[0]:,}, smallest {dataset.sizes[-1]:,}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Measure time and peak memory of streaming a list's tasks out.
+
+For each size, one list is seeded with that many tasks and exported the way
+the export endpoint does it, chunks being dropped as soon as they are made.
+The peak of traced Python memory should stay flat as the list grows.
+
+Usage:
+    python benchmarks/export.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from uuid import UUID
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+os.environ.setdefault(
+    "DATABASE_URL",
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'export.db')}",
+)
+
+from domain.schemas.todo import TodoCreate  # noqa: E402
+from domain.schemas.todo_list import TodoListCreate  # noqa: E402
+from infraestructure.api.formats import ENCODERS, StreamFormat  # noqa: E402
+from infraestructure.crud.todo import EXPORT_FIELDS, async_todo  # noqa: E402
+from infraestructure.crud.todo import todo as todo_crud  # noqa: E402
+from infraestructure.crud.todo_list import todo_list as todo_list_crud  # noqa
+from infraestructure.db.database import (  # noqa: E402
+    get_async_db,
+    get_db,
+    init_db,
+)
+
+
+def seed(tasks: int) -> UUID:
+    """
+    Create one list with `tasks` tasks.
+    """
+    db_session = get_db()
+    db = next(db_session)
+    list_id = todo_list_crud.create(db, TodoListCreate(name="Export")).id
+    batch = [TodoCreate(title=f"Todo {index}") for index in range(10_000)]
+    for start in range(0, tasks, len(batch)):
+        todo_crud.bulk_create(db, batch[: tasks - start], list_id)
+    db_session.close()
+    return list_id
+
+
+async def export(list_id: UUID, format: StreamFormat) -> int:
+    """
+    Export a list's tasks and return the number of bytes produced.
+    """
+    size = 0
+    async for db in get_async_db():
+        rows = async_todo.stream_by_list_id(db, list_id)
+        async for chunk in ENCODERS[format](rows, EXPORT_FIELDS):
+            size += len(chunk)
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000]
+    )
+    args = parser.parse_args()
+
+    init_db()
+    for tasks in args.sizes:
+        list_id = seed(tasks)
+        for format in StreamFormat:
+            tracemalloc.start()
+            started = time.perf_counter()
+            size = asyncio.run(export(list_id, format))
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                f"{tasks:>9} tasks  {format.value:<6} "
+                f"{elapsed:7.2f} s  {size / 2**20:8.1f} MiB out  "
+                f"peak {peak / 2**20:6.1f} MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+Load every route of the API in process and record its latency percentiles.
+
+Seeds a skewed dataset into a throwaway SQLite database, unless
+`DATABASE_URL` is set, then sends `--requests` requests to each route of
+`router.py` from `--concurrency` concurrent clients, through the ASGI
+transport of httpx so no server or socket is involved. Requests pick their
+list uniformly, so most land on small lists and some on the huge ones.
+Routes that delete get targets created beforehand, so every request does
+real work. Routes that stream are skipped.
+
+The results are written as JSON, to compare against a stored baseline with
+`benchmarks/compare.py`.
+
+Usage:
+    python benchmarks/load.py --tasks 100000 --requests 200 --concurrency 10 \
+        --output benchmarks/results/load.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+os.environ.setdefault(
+    "DATABASE_URL",
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load.db')}",
+)
+
+import httpx  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from datasets import Dataset, seed  # noqa: E402
+from domain.schemas.todo import TodoCreate  # noqa: E402
+from domain.schemas.todo_list import TodoListCreate  # noqa: E402
+from infraestructure.crud.todo import async_todo, todo  # noqa: E402
+from infraestructure.crud.todo_list import todo_list  # noqa: E402
+from infraestructure.db.database import engine  # noqa: E402
+from main import app  # noqa: E402
+
+API_PREFIX = "/api"
+BATCH = 100
+PERCENTILES = (50, 95, 99)
+
+Route = Tuple[str, str]
+
+
+class Targets:
+    """
+    The ids requests are sent to.
+
+    Attributes:
+        dataset: The seeded lists and a sample of their tasks.
+        scratch_list_id: A list of its own for the routes that write.
+        todo_ids: Tasks of the scratch list left to delete.
+        list_ids: Lists left to delete.
+        import_list_ids: Lists left to import into, one import at a time
+            being allowed per list.
+        batches: Batches of tasks of the scratch list left to bulk delete.
+    """
+
+    def __init__(self, dataset: Dataset, requests: int):
+        self.dataset = dataset
+        self.rng = random.Random(0)
+        with Session(engine) as db:
+            self.scratch_list_id = todo_list.create(
+                db, TodoListCreate(name="Load")
+            ).id
+            self.todo_ids = self.new_todos(db, requests)
+            self.list_ids = self.new_lists(db, requests)
+            self.import_list_ids = self.new_lists(db, requests)
+            self.batches = [
+                [str(id) for id in self.new_todos(db, BATCH)]
+                for _ in range(requests)
+            ]
+
+    def new_todos(self, db: Session, count: int) -> List[str]:
+        objs_in = [TodoCreate(title=f"Load {index}") for index in range(count)]
+        return [
+            db_obj.id
+            for db_obj in todo.bulk_create(db, objs_in, self.scratch_list_id)
+        ]
+
+    def new_lists(self, db: Session, count: int) -> List[str]:
+        return [
+            todo_list.create(db, TodoListCreate(name=f"Load {index}")).id
+            for index in range(count)
+        ]
+
+    def list_id(self):
+        return self.rng.choice(self.dataset.list_ids)
+
+    def task(self):
+        list_id = self.list_id()
+        return list_id, self.rng.choice(self.dataset.task_ids[list_id])
+
+
+def todo_items(count: int) -> List[dict]:
+    return [{"title": f"Load {index}"} for index in range(count)]
+
+
+def import_body() -> str:
+    return "".join(json.dumps(item) + "\n" for item in todo_items(BATCH))
+
+
+def bulk_update_request(targets: Targets) -> dict:
+    list_id = targets.list_id()
+    return {
+        "url": f"/api/lists/{list_id}/task/bulk",
+        "json": {
+            "items": [
+                {"id": str(id), "is_completed": targets.rng.random() < 0.5}
+                for id in targets.dataset.task_ids[list_id]
+            ]
+        },
+    }
+
+
+def task_request(targets: Targets, **kwargs) -> dict:
+    list_id, todo_id = targets.task()
+    return {"url": f"/api/lists/{list_id}/task/{todo_id}", **kwargs}
+
+
+# How to build a request to each route, from the targets.
+REQUESTS: Dict[Route, Callable[[Targets], dict]] = {
+    ("POST", "/api/lists/{todo_list_id}/task"): lambda t: {
+        "url": f"/api/lists/{t.scratch_list_id}/task",
+        "json": {"title": "Load"},
+    },
+    ("GET", "/api/lists/{todo_list_id}/task"): lambda t: {
+        "url": f"/api/lists/{t.list_id()}/task",
+    },
+    ("GET", "/api/lists/{todo_list_id}/task/export"): lambda t: {
+        "url": f"/api/lists/{t.list_id()}/task/export",
+    },
+    ("POST", "/api/lists/{todo_list_id}/task/import"): lambda t: {
+        "url": f"/api/lists/{t.import_list_ids.pop()}/task/import",
+        "content": import_body(),
+    },
+    ("GET", "/api/lists/{todo_list_id}/task/import"): lambda t: {
+        "url": f"/api/lists/{t.scratch_list_id}/task/import",
+    },
+    ("GET", "/api/lists/{todo_list_id}/task/{todo_id}"): task_request,
+    ("PUT", "/api/lists/{todo_list_id}/task/{todo_id}"): lambda t: (
+        task_request(t, json={"is_completed": t.rng.random() < 0.5})
+    ),
+    ("DELETE", "/api/lists/{todo_list_id}/task/{todo_id}"): lambda t: {
+        "url": f"/api/lists/{t.scratch_list_id}/task/{t.todo_ids.pop()}",
+    },
+    ("POST", "/api/lists/{todo_list_id}/task/bulk"): lambda t: {
+        "url": f"/api/lists/{t.scratch_list_id}/task/bulk",
+        "json": {"items": todo_items(BATCH)},
+    },
+    ("PATCH", "/api/lists/{todo_list_id}/task/bulk"): bulk_update_request,
+    ("POST", "/api/lists/{todo_list_id}/task/bulk/delete"): lambda t: {
+        "url": f"/api/lists/{t.scratch_list_id}/task/bulk/delete",
+        "json": {"ids": t.batches.pop()},
+    },
+    ("POST", "/api/lists/"): lambda t: {
+        "url": "/api/lists/",
+        "json": {"name": "Load"},
+    },
+    ("GET", "/api/lists/"): lambda t: {"url": "/api/lists/"},
+    ("GET", "/api/lists/{todo_list_id}"): lambda t: {
+        "url": f"/api/lists/{t.list_id()}",
+        "params": {"include": "todos"},
+    },
+    ("PUT", "/api/lists/{todo_list_id}"): lambda t: {
+        "url": f"/api/lists/{t.scratch_list_id}",
+        "json": {"name": f"Load {t.rng.randrange(10**6)}"},
+    },
+    ("DELETE", "/api/lists/{todo_list_id}"): lambda t: {
+        "url": f"/api/lists/{t.list_ids.pop()}",
+    },
+    ("GET", "/api/lists/{todo_list_id}/stats"): lambda t: {
+        "url": f"/api/lists/{t.list_id()}/stats",
+    },
+    ("GET", "/api/lists/{todo_list_id}/changes"): lambda t: {
+        "url": f"/api/lists/{t.list_id()}/changes",
+    },
+}
+
+# Routes that stream until the client leaves, so they have no latency to
+# record.
+STREAMING: List[Route] = [
+    ("GET", "/api/lists/{todo_list_id}/events"),
+]
+
+
+def api_routes() -> List[Route]:
+    """
+    Return the (method, path) of every route of the API, in the order they
+    are declared.
+    """
+    return [
+        (method.upper(), path)
+        for path, operations in app.openapi()["paths"].items()
+        if path.startswith(API_PREFIX)
+        for method in operations
+    ]
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """
+    Return the nearest-rank percentile of sorted values.
+    """
+    rank = max(round(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+async def load_route(
+    client: httpx.AsyncClient,
+    route: Route,
+    targets: Targets,
+    requests: int,
+    concurrency: int,
+) -> dict:
+    """
+    Send `requests` requests to a route from `concurrency` clients.
+
+    Returns:
+        The requests sent, the errors, the throughput in requests per
+        second and the latency percentiles in milliseconds.
+    """
+    method, _ = route
+    build = REQUESTS[route]
+    remaining = requests
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            kwargs = build(targets)
+            started = time.perf_counter()
+            response = await client.request(method, **kwargs)
+            await response.aread()
+            latencies.append(time.perf_counter() - started)
+            errors += response.status_code >= 400
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    await async_todo.coalescer.settle()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / elapsed,
+        **{
+            f"p{percent}": percentile(latencies, percent) * 1000
+            for percent in PERCENTILES
+        },
+    }
+
+
+async def run(
+    routes: List[Route], targets: Targets, requests: int, concurrency: int
+) -> Dict[str, dict]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        # The import progress route reports the last import of a list.
+        await client.post(
+            f"/api/lists/{targets.scratch_list_id}/task/import",
+            content=import_body(),
+        )
+        results = {}
+        for route in routes:
+            results[" ".join(route)] = await load_route(
+                client, route, targets, requests, concurrency
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=10_000)
+    parser.add_argument("--lists", type=int, default=100)
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument(
+        "--route", help="Only load routes whose path contains this text"
+    )
+    parser.add_argument("--output", help="Write the results to this file")
+    args = parser.parse_args()
+
+    routes = [
+        route
+        for route in api_routes()
+        if route not in STREAMING
+        and (args.route is None or args.route in route[1])
+    ]
+    missing = [" ".join(route) for route in routes if route not in REQUESTS]
+    if missing:
+        parser.error(f"No request defined for: {', '.join(missing)}")
+
+    dataset = seed(args.tasks, args.lists, args.skew)
+    targets = Targets(dataset, args.requests)
+    results = asyncio.run(run(routes, targets, args.requests, args.concurrency))
+
+    for name, result in results.items():
+        print(
+            f"{name:<52} {result['throughput']:8,.0f} req/s  "
+            f"p50 {result['p50']:7.1f} ms  p95 {result['p95']:7.1f} ms  "
+            f"p99 {result['p99']:7.1f} ms  errors {result['errors']}"
+        )
+    if args.output:
+        report = {
+            "meta": {
+                "kind": "load",
+                "tasks": args.tasks,
+                "lists": args.lists,
+                "skew": args.skew,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "database": engine.dialect.name,
+                "python": platform.python_version(),
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            },
+            "routes": results,
+        }
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Compare offset and cursor pagination on the task collection.
+
+Seeds a single list with many tasks in a throwaway SQLite database and
+times the first and the deepest page with both strategies.
+
+Usage:
+    python benchmarks/pagination.py --rows 1000000 --limit 100
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from uuid import uuid4
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from sqlmodel import Session, SQLModel, create_engine  # noqa: E402
+
+from domain.models.todo import Todo  # noqa: E402
+from domain.models.todo_list import TodoList  # noqa: E402
+from infraestructure.crud.todo import todo as todo_crud  # noqa: E402
+
+
+def seed(engine, rows: int):
+    """
+    Create one list holding `rows` tasks.
+    """
+    list_id = uuid4()
+    with Session(engine) as db:
+        db.add(TodoList(id=list_id, name="Benchmark"))
+        db.commit()
+        batch = 10_000
+        for start in range(0, rows, batch):
+            db.bulk_insert_mappings(
+                Todo,
+                [
+                    {
+                        "id": uuid4(),
+                        "title": f"Todo {index}",
+                        "is_active": True,
+                        "is_completed": False,
+                        "list_id": list_id,
+                    }
+                    for index in range(start, min(start + batch, rows))
+                ],
+            )
+        db.commit()
+    return list_id
+
+
+def timed(function, repeat: int) -> float:
+    """
+    Return the median wall time of `function` in milliseconds.
+    """
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "pagination.db")
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    list_id = seed(engine, args.rows)
+
+    deep_skip = args.rows - args.limit
+    with Session(engine) as db:
+        page = todo_crud.get_all_by_list_id(
+            db, list_id, skip=deep_skip - args.limit, limit=args.limit
+        )
+        deep_cursor = page["next_cursor"]
+
+        results = {
+            "offset first page": timed(
+                lambda: todo_crud.get_all_by_list_id(
+                    db, list_id, limit=args.limit
+                ),
+                args.repeat,
+            ),
+            "offset last page": timed(
+                lambda: todo_crud.get_all_by_list_id(
+                    db, list_id, skip=deep_skip, limit=args.limit
+                ),
+                args.repeat,
+            ),
+            "cursor first page": timed(
+                lambda: todo_crud.get_all_by_list_id(
+                    db, list_id, limit=args.limit
+                ),
+                args.repeat,
+            ),
+            "cursor last page": timed(
+                lambda: todo_crud.get_all_by_list_id(
+                    db, list_id, limit=args.limit, after=deep_cursor
+                ),
+                args.repeat,
+            ),
+        }
+
+    print(f"rows={args.rows} limit={args.limit}")
+    for name, milliseconds in results.items():
+        print(f"{name:<20} {milliseconds:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
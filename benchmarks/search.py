@@ -0,0 +1,95 @@
+"""
+Compare substring search latency of LIKE and the FTS5 backend as lists grow.
+
+Usage:
+    python benchmarks/search.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from uuid import uuid4
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from sqlmodel import Session, SQLModel, create_engine  # noqa: E402
+
+from domain.models.todo import Todo  # noqa: E402, F401
+from domain.models.todo_list import TodoList  # noqa: E402
+from infraestructure.crud import search  # noqa: E402
+from infraestructure.crud.todo_list import todo_list as todo_list_crud  # noqa
+
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf"]
+
+
+def seed(engine, rows: int):
+    """
+    Insert `rows` lists with pseudo random names and one rare match.
+    """
+    with Session(engine) as db:
+        batch = 10_000
+        for start in range(0, rows, batch):
+            db.bulk_insert_mappings(
+                TodoList,
+                [
+                    {
+                        "id": uuid4(),
+                        "is_active": True,
+                        "name": " ".join(
+                            WORDS[(index * step) % len(WORDS)]
+                            for step in (1, 3, 5)
+                        )
+                        + f" {index}",
+                    }
+                    for index in range(start, min(start + batch, rows))
+                ],
+            )
+        db.add(TodoList(name="needle in the haystack"))
+        db.commit()
+
+
+def timed(function, repeat: int = 5) -> float:
+    """
+    Return the median wall time of `function` in milliseconds.
+    """
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000]
+    )
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        path = os.path.join(tempfile.mkdtemp(), "search.db")
+        engine = create_engine(f"sqlite:///{path}")
+        SQLModel.metadata.create_all(engine)
+        search.setup_search(engine)
+        seed(engine, size)
+
+        with Session(engine) as db:
+            results = {}
+            for backend in ("like", "auto"):
+                search.SEARCH_BACKEND = backend
+                results[backend] = timed(
+                    lambda: todo_list_crud.all(db, name="needle", limit=20)
+                )
+        print(
+            f"rows={size:<9} like {results['like']:8.2f} ms  "
+            f"fts5 {results['auto']:8.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
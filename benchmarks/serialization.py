@@ -0,0 +1,142 @@
+"""
+Compare the CPU time of serializing responses and reading inputs.
+
+Responses: a 1k-item task page rendered the way FastAPI does it from the
+response model (validate every item, then dump), the way it used to
+(`jsonable_encoder`, then `json.dumps`), and through the compiled orjson
+serializer the collection routes use. Then the whole `GET /{id}/task` route,
+read from a throwaway SQLite database, with the read cache off and with an
+in-process one, as the route also encodes what it caches. Inputs:
+`jsonable_encoder` against `model_dump` for a create, and encoding the row
+against reading the model fields for an update.
+
+Usage:
+    python benchmarks/serialization.py --items 1000 --repeat 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+from uuid import uuid4
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+os.environ.setdefault(
+    "DATABASE_URL",
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'serialization.db')}",
+)
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from domain.models.todo import Todo  # noqa: E402
+from domain.schemas.todo import TodoAll, TodoCreate  # noqa: E402
+from domain.schemas.todo_list import TodoListCreate  # noqa: E402
+from infraestructure.api.responses import serialized  # noqa: E402
+from infraestructure.crud.cache import LRUCache, NullCache, read_cache  # noqa
+from infraestructure.crud.todo import todo  # noqa: E402
+from infraestructure.crud.todo_list import todo_list  # noqa: E402
+from infraestructure.db.database import engine, init_db  # noqa: E402
+from main import app  # noqa: E402
+
+
+def page(items: int) -> dict:
+    """
+    Build a page of `items` tasks, as the CRUD layer returns it.
+    """
+    list_id = uuid4()
+    data = [
+        Todo(
+            id=uuid4(),
+            title=f"Todo {index}",
+            description="A task to serialize" * 4,
+            is_completed=index % 2 == 0,
+            list_id=list_id,
+        )
+        for index in range(items)
+    ]
+    return {"total": items, "data": data, "next_cursor": None}
+
+
+def seeded_list(items: int) -> str:
+    """
+    Create a list of `items` tasks in the database, and return its url.
+    """
+    init_db()
+    with Session(engine) as db:
+        todo_list_id = todo_list.create(db, TodoListCreate(name="Page")).id
+        objs_in = [
+            TodoCreate(title=f"Todo {index}", description="A task" * 4)
+            for index in range(items)
+        ]
+        todo.bulk_create(db, objs_in, todo_list_id)
+    return f"/api/lists/{todo_list_id}/task"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    content = page(args.items)
+    adapter = TypeAdapter(TodoAll)
+
+    def response_model():
+        value = adapter.validate_python(content, from_attributes=True)
+        return adapter.dump_json(value)
+
+    def encoder():
+        value = adapter.validate_python(content, from_attributes=True)
+        return json.dumps(jsonable_encoder(value)).encode()
+
+    def lean():
+        return serialized(TodoAll, content).body
+
+    assert json.loads(lean()) == json.loads(response_model())
+
+    obj_in = TodoCreate(title="Todo", description="A task")
+    db_obj = content["data"][0]
+    benchmarks = {
+        f"response  {args.items} items, response model": response_model,
+        f"response  {args.items} items, jsonable_encoder": encoder,
+        f"response  {args.items} items, compiled orjson": lean,
+        "create    jsonable_encoder(obj_in)": lambda: jsonable_encoder(obj_in),
+        "create    obj_in.model_dump()": lambda: obj_in.model_dump(),
+        "update    jsonable_encoder(db_obj)": lambda: jsonable_encoder(db_obj),
+        "update    model_fields": lambda: list(Todo.model_fields),
+    }
+    client = TestClient(app)
+    url = seeded_list(args.items)
+    params = {"limit": min(args.items, 1000)}
+
+    def route(backend):
+        def get():
+            read_cache.use(backend)
+            response = client.get(url, params=params)
+            assert response.status_code == 200
+            return response.content
+
+        return get
+
+    benchmarks[f"route     {args.items} items, no read cache"] = route(
+        NullCache()
+    )
+    benchmarks[f"route     {args.items} items, memory read cache"] = route(
+        LRUCache()
+    )
+    for name, function in benchmarks.items():
+        repeat = 10_000
+        if name.startswith(("response", "route")):
+            repeat = args.repeat
+        seconds = min(timeit.repeat(function, number=repeat, repeat=3))
+        print(f"{name:<48} {seconds / repeat * 1e6:10.1f} us")
+
+
+if __name__ == "__main__":
+    main()
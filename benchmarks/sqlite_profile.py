@@ -0,0 +1,123 @@
+"""
+Compare mixed read/write throughput with and without the tuned SQLite profile.
+
+Each profile runs in a child process, as the engines are built at import,
+on a fresh database seeded with a skewed dataset. Concurrent clients then
+read pages and tasks and toggle tasks through the application, in process,
+counting the requests answered and the ones that failed, such as with
+"database is locked".
+
+Usage:
+    python benchmarks/sqlite_profile.py --clients 20 --requests 100 --writes 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+
+async def client_loop(client, dataset, requests: int, writes: float) -> tuple:
+    """
+    Send a mix of reads and writes, returning the latencies and failures.
+    """
+    latencies, failures = [], 0
+    for _ in range(requests):
+        list_id = random.choice(dataset.list_ids)
+        todo_id = random.choice(dataset.task_ids[list_id])
+        if random.random() < writes:
+            request = client.put(
+                f"/api/lists/{list_id}/task/{todo_id}",
+                json={"is_completed": random.random() < 0.5},
+            )
+        elif random.random() < 0.5:
+            request = client.get(f"/api/lists/{list_id}/task")
+        else:
+            request = client.get(f"/api/lists/{list_id}/task/{todo_id}")
+        started = time.perf_counter()
+        try:
+            response = await request
+            failures += response.status_code >= 500
+        except Exception:
+            failures += 1
+        latencies.append(time.perf_counter() - started)
+    return latencies, failures
+
+
+async def run(args) -> dict:
+    import httpx
+
+    from datasets import seed
+    from main import app
+
+    dataset = seed(args.tasks, args.lists)
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(
+                client_loop(client, dataset, args.requests, args.writes)
+                for _ in range(args.clients)
+            )
+        )
+        elapsed = time.perf_counter() - started
+    latencies = sorted(latency for result, _ in results for latency in result)
+    return {
+        "requests": len(latencies),
+        "failures": sum(failures for _, failures in results),
+        "throughput": len(latencies) / elapsed,
+        "p50": latencies[len(latencies) // 2] * 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--writes", type=float, default=0.2)
+    parser.add_argument("--tasks", type=int, default=10_000)
+    parser.add_argument("--lists", type=int, default=100)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(run(args))))
+        return
+
+    for profile in ("default", "tuned"):
+        directory = tempfile.mkdtemp()
+        env = {
+            **os.environ,
+            "SQLITE_PROFILE": profile,
+            "DATABASE_URL": f"sqlite:///{os.path.join(directory, 'mix.db')}",
+        }
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", *sys.argv[1:]],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{profile:<8} {result['requests']} requests  "
+            f"{result['throughput']:8,.0f} req/s  "
+            f"p50 {result['p50']:6.1f} ms  p99 {result['p99']:7.1f} ms  "
+            f"failures {result['failures']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
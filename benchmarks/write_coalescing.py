@@ -0,0 +1,121 @@
+"""
+Measure the commits saved by coalescing task updates.
+
+Concurrent clients toggle the completion of tasks of one list through the
+application, in process. The same load runs without coalescing, then with
+each acknowledgement mode, counting the commits made and the latency of the
+updates.
+
+Usage:
+    python benchmarks/write_coalescing.py --clients 10 --toggles 40 --window 5
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+os.environ.setdefault(
+    "DATABASE_URL",
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'coalescing.db')}",
+)
+
+import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from infraestructure.crud.coalescing import AckMode  # noqa: E402
+from infraestructure.crud.todo import async_todo  # noqa: E402
+from infraestructure.db.database import async_engine, init_db  # noqa: E402
+from main import app  # noqa: E402
+
+
+async def toggle(
+    client: httpx.AsyncClient, url: str, ids: list, toggles: int
+) -> list:
+    """
+    Toggle random tasks one after the other, returning each latency.
+    """
+    latencies = []
+    for _ in range(toggles):
+        started = time.perf_counter()
+        response = await client.put(
+            f"{url}/{random.choice(ids)}",
+            json={"is_completed": random.random() < 0.5},
+        )
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def run(clients: int, toggles: int, tasks: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as client:
+        response = await client.post("/api/lists/", json={"name": "Toggle"})
+        url = f"/api/lists/{response.json()['id']}/task"
+        ids = []
+        for index in range(tasks):
+            response = await client.post(url, json={"title": f"Todo {index}"})
+            ids.append(response.json()["id"])
+
+        commits = 0
+
+        def count(connection):
+            nonlocal commits
+            commits += 1
+
+        event.listen(async_engine.sync_engine, "commit", count)
+        started = time.perf_counter()
+        try:
+            results = await asyncio.gather(
+                *(toggle(client, url, ids, toggles) for _ in range(clients))
+            )
+            await async_todo.coalescer.settle()
+        finally:
+            event.remove(async_engine.sync_engine, "commit", count)
+        elapsed = time.perf_counter() - started
+    latencies = sorted(latency for result in results for latency in result)
+    return {
+        "updates": len(latencies),
+        "commits": commits,
+        "seconds": elapsed,
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--toggles", type=int, default=40)
+    parser.add_argument("--tasks", type=int, default=20)
+    parser.add_argument("--window", type=float, default=5)
+    args = parser.parse_args()
+
+    init_db()
+    coalescer = async_todo.coalescer
+    for name, window_ms, ack in (
+        ("off", 0, AckMode.commit),
+        ("commit", args.window, AckMode.commit),
+        ("buffer", args.window, AckMode.buffer),
+    ):
+        coalescer.window_ms, coalescer.ack = window_ms, ack
+        result = asyncio.run(run(args.clients, args.toggles, args.tasks))
+        print(
+            f"{name:<7} {result['updates']} updates  "
+            f"{result['commits']:6} commits  "
+            f"{result['updates'] / result['seconds']:8,.0f} updates/s  "
+            f"p50 {result['p50'] * 1000:6.1f} ms  "
+            f"p99 {result['p99'] * 1000:6.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
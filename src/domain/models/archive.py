@@ -0,0 +1,39 @@
+"""
+This file contains the archive tables of the purged rows.
+
+Each archive table has the columns of its table, plus the time the row was
+archived, and no index or foreign key, so archiving stays cheap. The purge
+horizon records, per table, the deletion time up to which rows may have
+been purged.
+"""
+
+from sqlalchemy import Column, DateTime, String, Table
+from sqlmodel import SQLModel
+
+from domain.models.todo import Todo
+from domain.models.todo_list import TodoList
+
+
+def archive_table(table: Table) -> Table:
+    """
+    Build the archive table of a table.
+    """
+    return Table(
+        f"{table.name}_archive",
+        SQLModel.metadata,
+        *(
+            Column(column.name, column.type, primary_key=column.primary_key)
+            for column in table.columns
+        ),
+        Column("archived_at", DateTime(timezone=True), nullable=False),
+    )
+
+
+todo_archive = archive_table(Todo.__table__)
+todo_list_archive = archive_table(TodoList.__table__)
+purge_horizon = Table(
+    "purge_horizon",
+    SQLModel.metadata,
+    Column("table_name", String, primary_key=True),
+    Column("purged_before", DateTime(timezone=True), nullable=False),
+)
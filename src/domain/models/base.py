@@ -2,24 +2,105 @@
 This is a base class for all models
 """
 
-from uuid import UUID, uuid4
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from uuid import UUID
 
+from sqlalchemy import Index, text
 from sqlmodel import Field, SQLModel
 
+UUID7_COUNTER_MAX = 0xFFF
+
+uuid7_lock = threading.Lock()
+uuid7_last = [0, 0]
+
+
+def uuid7() -> UUID:
+    """
+    Generate a time-ordered UUID, version 7 of RFC 9562.
+
+    The first 48 bits hold the Unix time in milliseconds, so new ids sort
+    after older ones and inserts land on the last page of the primary key
+    index instead of a random one. Within a millisecond the next 12 bits
+    count up from a random start, keeping the ids of this process in order,
+    and the last 62 bits are random.
+    """
+    random = int.from_bytes(os.urandom(10), "big")
+    with uuid7_lock:
+        millis = max(time.time_ns() // 1_000_000, uuid7_last[0])
+        if millis == uuid7_last[0]:
+            counter = uuid7_last[1] + 1
+            if counter > UUID7_COUNTER_MAX:
+                # The counter ran out: borrow the next millisecond.
+                millis, counter = millis + 1, random >> 69
+        else:
+            counter = random >> 69
+        uuid7_last[:] = millis, counter
+    return UUID(
+        int=millis << 80
+        | 0x7 << 76
+        | counter << 64
+        | 0b10 << 62
+        | random & (1 << 62) - 1
+    )
+
+
+def active_index(name: str, *columns: str) -> Index:
+    """
+    Build a partial index over the active rows of a table.
+
+    The predicate matches how `is_active == True` is rendered by each
+    backend, so the planner can prove a query only reads active rows.
+    """
+    return Index(
+        name,
+        *columns,
+        postgresql_where=text("is_active = true"),
+        sqlite_where=text("is_active = 1"),
+    )
+
+
+def inactive_index(name: str, *columns: str) -> Index:
+    """
+    Build a partial index over the soft deleted rows of a table, for the
+    purge to find them without scanning the active ones.
+    """
+    return Index(
+        name,
+        *columns,
+        postgresql_where=text("is_active = false"),
+        sqlite_where=text("is_active = 0"),
+    )
+
+
+def utcnow() -> datetime:
+    """
+    Return the current time, in UTC.
+    """
+    return datetime.now(timezone.utc)
+
 
 class Base(SQLModel):
     """
     Base class for all models
 
+    New ids are UUIDv7, existing uuid4 ids stay valid as they are.
+
     Attributes:
         id: UUID
         is_active: bool
-        date_created: datetime
+        version: int
+        deleted_at: Optional[datetime], when the row was soft deleted
     """
 
     id: UUID = Field(
-        default_factory=uuid4,
+        default_factory=uuid7,
         primary_key=True,
         index=True,
     )
     is_active: bool = Field(default=True)
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
+    deleted_at: Optional[datetime] = None
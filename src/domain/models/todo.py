@@ -5,9 +5,10 @@ This file contains model definitions for the Todo.
 from typing import Optional
 from uuid import UUID
 
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship
 
-from domain.models.base import Base
+from domain.models.base import Base, active_index, inactive_index
 from domain.models.todo_list import TodoList
 
 
@@ -18,11 +19,25 @@ class Todo(Base, table=True):
     title: str
     description: Optional[str] = None
     is_completed: bool = Field(default=False)
+    change_seq: int, the list's `todos_version` of the last write
     """
 
-    title: str
+    __table_args__ = (
+        Index(
+            "ix_todo_list_id_is_active_is_completed",
+            "list_id",
+            "is_active",
+            "is_completed",
+        ),
+        active_index("ix_todo_active_list_id_id", "list_id", "id"),
+        inactive_index("ix_todo_inactive_deleted_at", "deleted_at"),
+        Index("ix_todo_list_id_change_seq_id", "list_id", "change_seq", "id"),
+    )
+
+    title: str = Field(sa_column_kwargs={"info": {"search": True}})
     description: Optional[str] = None
     is_completed: bool = Field(default=False)
+    change_seq: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
 
     list_id: UUID = Field(foreign_key="todolist.id")
     list: Optional[TodoList] = Relationship(back_populates="todos")
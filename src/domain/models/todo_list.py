@@ -2,9 +2,9 @@
 This file contains model definitions for the Todo List.
 """
 
-from sqlmodel import Relationship
+from sqlmodel import Field, Relationship
 
-from domain.models.base import Base
+from domain.models.base import Base, active_index, inactive_index
 
 
 class TodoList(Base, table=True):
@@ -20,5 +20,19 @@ class TodoList(Base, table=True):
         is_completed: bool
     """
 
-    name: str
+    __table_args__ = (
+        active_index("ix_todolist_active_id", "id"),
+        inactive_index("ix_todolist_inactive_deleted_at", "deleted_at"),
+    )
+
+    name: str = Field(sa_column_kwargs={"info": {"search": True}})
+    todos_version: int = Field(
+        default=0, sa_column_kwargs={"server_default": "0"}
+    )
+    todos_total: int = Field(
+        default=0, sa_column_kwargs={"server_default": "0"}
+    )
+    todos_completed: int = Field(
+        default=0, sa_column_kwargs={"server_default": "0"}
+    )
     todos: list["Todo"] = Relationship(back_populates="list")
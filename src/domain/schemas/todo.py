@@ -1,7 +1,7 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from uuid import UUID
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class TodoBase(BaseModel):
@@ -50,4 +50,90 @@ class TodoAll(BaseModel):
     """
 
     total: int
+    next_cursor: Optional[str] = None
     data: List[TodoResponse]
+
+
+class TodoBulkCreate(BaseModel):
+    """
+    Todo Bulk Create Schema
+
+    Items are validated one by one so a bad item does not fail the batch.
+    """
+
+    items: List[Dict[str, Any]] = Field(max_length=10_000)
+
+
+class TodoBulkUpdateItem(TodoUpdate):
+    """
+    Todo Bulk Update Item Schema
+    """
+
+    id: UUID
+
+
+class TodoBulkUpdate(BaseModel):
+    """
+    Todo Bulk Update Schema
+
+    Each item holds the id of a Todo and the fields of a TodoUpdate.
+    """
+
+    items: List[Dict[str, Any]] = Field(max_length=10_000)
+
+
+class TodoBulkDelete(BaseModel):
+    """
+    Todo Bulk Delete Schema
+    """
+
+    ids: List[UUID] = Field(max_length=10_000)
+
+
+class TodoBulkError(BaseModel):
+    """
+    Todo Bulk Error Schema
+    """
+
+    index: int
+    id: Optional[UUID] = None
+    detail: Any
+
+
+class TodoBulkResponse(BaseModel):
+    """
+    Todo Bulk Response Schema
+    """
+
+    data: List[TodoResponse]
+    errors: List[TodoBulkError]
+
+
+class TodoImportProgress(BaseModel):
+    """
+    Todo Import Progress Schema
+
+    `errors` holds the first problems found, by position of the row in the
+    body; `failed` counts all of them.
+    """
+
+    rows: int = 0
+    imported: int = 0
+    failed: int = 0
+    done: bool = False
+    errors: List[TodoBulkError] = []
+
+
+class TodoChanges(BaseModel):
+    """
+    Todo Changes Schema
+
+    `data` holds the Todos written since the token and `deleted` the ids of
+    the removed ones; pass `token` to the next call, right away while
+    `has_more`.
+    """
+
+    data: List[TodoResponse]
+    deleted: List[UUID]
+    has_more: bool
+    token: str
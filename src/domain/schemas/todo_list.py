@@ -7,6 +7,8 @@ from uuid import UUID
 
 from pydantic import BaseModel, ConfigDict
 
+from domain.schemas.todo import TodoResponse
+
 
 class TodoList(BaseModel):
     """
@@ -32,13 +34,29 @@ class TodoListUpdate(TodoList):
     name: Optional[str]
 
 
+class TodoListStats(BaseModel):
+    """
+    Todo List Stats Schema
+
+    Counts of the active Todos of the list.
+    """
+
+    total: int
+    completed: int
+    percent: float
+
+
 class TodoListResponse(TodoList):
     """
     Todo List Response Schema
+
+    `stats` and `todos` are only set when asked for.
     """
 
     model_config = ConfigDict(from_attributes=True)
     id: UUID
+    stats: Optional[TodoListStats] = None
+    todos: Optional[List[TodoResponse]] = None
 
 
 class TodoListAll(BaseModel):
@@ -47,4 +65,5 @@ class TodoListAll(BaseModel):
     """
 
     total: int
+    next_cursor: Optional[str] = None
     data: List[TodoListResponse]
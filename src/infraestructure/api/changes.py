@@ -0,0 +1,145 @@
+"""
+This file contains the endpoints for the changes of a Todo List.
+
+Clients subscribe once, with Server-Sent Events or a WebSocket, instead of
+polling the Todos of the list. Every write then pushes a `created`,
+`updated` or `deleted` event with the Todo, `imported` after an import, and
+`list_updated` or `list_deleted` for the list itself. A client that falls
+behind gets `resync`, and should read the list again and resubscribe.
+Subscribers do not hold a database connection while they wait.
+
+Clients coming back online read what they missed with a change token
+instead of the whole list.
+"""
+
+import json
+from typing import AsyncIterator
+from uuid import UUID
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from domain.schemas.todo import TodoChanges
+from infraestructure.crud import changes
+from infraestructure.crud.changes import Subscription, change_feed
+from infraestructure.crud.pagination import InvalidCursorError
+from infraestructure.crud.todo import CHANGES_LIMIT, ExpiredTokenError
+from infraestructure.crud.todo import async_todo as todo_crud
+from infraestructure.crud.todo_list import async_todo_list as todo_list_crud
+from infraestructure.db.database import async_engine, get_async_db
+
+router = APIRouter()
+
+
+async def list_exists(todo_list_id: UUID) -> bool:
+    """
+    Tell whether an active Todo List exists, on a session released right
+    away rather than held for the whole subscription.
+    """
+    async with AsyncSession(async_engine) as db:
+        return await todo_list_crud.get(db, todo_list_id) is not None
+
+
+async def subscribe_or_404(todo_list_id: UUID) -> Subscription:
+    """
+    Subscribe to the events of an active Todo List, or raise a 404.
+
+    The subscription starts before the check, so no write made after the
+    list was found is missed.
+    """
+    subscription = change_feed.subscribe(todo_list_id)
+    if not await list_exists(todo_list_id):
+        change_feed.unsubscribe(subscription)
+        raise HTTPException(status_code=404, detail="Todo list not found")
+    return subscription
+
+
+async def server_sent_events(subscription: Subscription) -> AsyncIterator[str]:
+    """
+    Encode the events of a subscription as Server-Sent Events, with a
+    comment as heartbeat.
+    """
+    try:
+        async for event in subscription.events(
+            changes.CHANGE_FEED_HEARTBEAT_SECONDS
+        ):
+            if event is None:
+                yield ": ping\n\n"
+            else:
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        change_feed.unsubscribe(subscription)
+
+
+@router.get("/{todo_list_id}/events")
+async def todo_list_events(todo_list_id: UUID) -> StreamingResponse:
+    """
+    Stream the changes of a specific Todo List as Server-Sent Events.
+    """
+    subscription = await subscribe_or_404(todo_list_id)
+    return StreamingResponse(
+        server_sent_events(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/{todo_list_id}/ws")
+async def todo_list_socket(websocket: WebSocket, todo_list_id: UUID):
+    """
+    Send the changes of a specific Todo List as JSON messages, with a
+    `ping` message as heartbeat.
+
+    Closes with code 4404 if the Todo List does not exist.
+    """
+    try:
+        subscription = await subscribe_or_404(todo_list_id)
+    except HTTPException:
+        await websocket.close(code=4404)
+        return
+    try:
+        await websocket.accept()
+        async for event in subscription.events(
+            changes.CHANGE_FEED_HEARTBEAT_SECONDS
+        ):
+            await websocket.send_json(event or {"type": "ping"})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        change_feed.unsubscribe(subscription)
+
+
+@router.get("/{todo_list_id}/changes", response_model=TodoChanges)
+async def get_todo_list_changes(
+    todo_list_id: UUID,
+    since: str = Query(None, description="Token of the previous call"),
+    limit: int = Query(CHANGES_LIMIT, ge=1, le=1000, description="Page size"),
+    db=Depends(get_async_db),
+) -> TodoChanges:
+    """
+    Get the Todos of a specific Todo List written since a change token.
+
+    Without `since`, all the active Todos are returned. Answers 410 when
+    the token is older than the purge of deleted Todos: sync again without
+    it.
+    """
+    try:
+        changed = await todo_crud.get_changes(
+            db, todo_list_id, since=since, limit=limit
+        )
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except ExpiredTokenError as exc:
+        raise HTTPException(status_code=410, detail=str(exc))
+    if changed is None:
+        raise HTTPException(status_code=404, detail="Todo list not found")
+    return changed
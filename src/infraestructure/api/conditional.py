@@ -0,0 +1,69 @@
+"""
+This file contains the helpers for conditional requests.
+
+Resources are tagged with their version, so a client can poll with
+`If-None-Match` and get a bodyless 304 while nothing changed, or write with
+`If-Match` and get a 412 when someone else wrote first.
+"""
+
+from typing import List, Optional
+
+from fastapi import HTTPException, Request, Response
+
+
+def etag(*versions: int) -> str:
+    """
+    Build the entity tag of a version, or of several joined with dots for
+    a representation made of several resources.
+    """
+    return '"' + ".".join(str(version) for version in versions) + '"'
+
+
+def parse_tags(header: str) -> List[str]:
+    """
+    Split an `If-None-Match` or `If-Match` header into its tags.
+
+    Weak tags are compared by their opaque part.
+    """
+    return [
+        tag.strip().removeprefix("W/")
+        for tag in header.split(",")
+        if tag.strip()
+    ]
+
+
+def not_modified(request: Request, tag: str) -> Optional[Response]:
+    """
+    Build the 304 response of a GET whose `If-None-Match` holds the tag.
+
+    Returns:
+        The 304 response, or None if the representation must be sent.
+    """
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return None
+    tags = parse_tags(header)
+    if "*" not in tags and tag not in tags:
+        return None
+    return Response(status_code=304, headers={"ETag": tag})
+
+
+def if_match_version(request: Request) -> Optional[int]:
+    """
+    Get the version a write is conditioned on by `If-Match`.
+
+    Returns:
+        The version, or None if the write is unconditional.
+
+    Raises:
+        HTTPException: The header holds no tag this API issued.
+    """
+    header = request.headers.get("if-match")
+    if header is None:
+        return None
+    tags = parse_tags(header)
+    if tags == ["*"]:
+        return None
+    if len(tags) == 1 and tags[0].strip('"').isdigit():
+        return int(tags[0].strip('"'))
+    raise HTTPException(status_code=412, detail="Precondition failed")
@@ -0,0 +1,160 @@
+"""
+This file contains the encoders and decoders of the streamed task formats.
+
+Each encoder turns batches of rows into text chunks, one chunk per batch, so
+a response can be sent while the rows are still being read. Decoders work
+the other way, turning a body received in chunks into records as soon as
+each one is complete.
+"""
+
+import csv
+import io
+import json
+from enum import Enum
+from typing import Any, AsyncIterator, Sequence
+
+
+class StreamFormat(str, Enum):
+    """
+    Formats tasks can be streamed in.
+    """
+
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+MEDIA_TYPES = {
+    StreamFormat.ndjson: "application/x-ndjson",
+    StreamFormat.csv: "text/csv",
+}
+
+
+async def encode_ndjson(
+    batches: AsyncIterator[Sequence], fields: Sequence[str]
+) -> AsyncIterator[str]:
+    """
+    Encode batches of rows as JSON objects, one per line.
+    """
+    async for rows in batches:
+        yield "".join(
+            json.dumps(dict(zip(fields, row)), default=str) + "\n"
+            for row in rows
+        )
+
+
+async def encode_csv(
+    batches: AsyncIterator[Sequence], fields: Sequence[str]
+) -> AsyncIterator[str]:
+    """
+    Encode batches of rows as CSV, after a header line.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    yield buffer.getvalue()
+    async for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+ENCODERS = {
+    StreamFormat.ndjson: encode_ndjson,
+    StreamFormat.csv: encode_csv,
+}
+
+
+class DecodeError(ValueError):
+    """
+    Raised for a record that cannot be decoded.
+    """
+
+
+def decoded(line: bytes) -> Any:
+    """
+    Decode a UTF-8 line without its line ending, or return a DecodeError.
+    """
+    try:
+        return line.removesuffix(b"\r").decode("utf-8")
+    except UnicodeDecodeError as exc:
+        return DecodeError(f"Invalid UTF-8: {exc}")
+
+
+async def lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """
+    Split a body received in chunks into UTF-8 lines, without line endings.
+
+    Lines are split before they are decoded, as a newline byte is never part
+    of a UTF-8 sequence, so a line that is not valid UTF-8 is yielded as a
+    DecodeError and the others are not affected.
+    """
+    pending = b""
+    async for chunk in chunks:
+        *complete, pending = (pending + chunk).split(b"\n")
+        for line in complete:
+            yield decoded(line)
+    if pending:
+        yield decoded(pending)
+
+
+async def decode_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """
+    Decode a body of JSON objects, one per line.
+
+    Blank lines are skipped. A line that is not a JSON object is yielded as
+    a DecodeError, so the caller can report it and carry on.
+    """
+    async for line in lines(chunks):
+        if isinstance(line, DecodeError):
+            yield line
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            record = DecodeError(f"Invalid JSON: {exc}")
+        if not isinstance(record, (dict, DecodeError)):
+            record = DecodeError("Expected a JSON object")
+        yield record
+
+
+async def decode_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """
+    Decode a CSV body whose first line holds the field names.
+
+    Quoted fields may span lines. Empty fields are left out of the records,
+    so they take their default value.
+    """
+    fields, pending = None, ""
+    async for line in lines(chunks):
+        if isinstance(line, DecodeError):
+            pending = ""
+            yield line
+            continue
+        pending = f"{pending}\n{line}" if pending else line
+        if pending.count('"') % 2:
+            continue
+        values = next(csv.reader([pending]), [])
+        pending = ""
+        if not values:
+            continue
+        if fields is None:
+            fields = values
+        elif len(values) != len(fields):
+            yield DecodeError(
+                f"Expected {len(fields)} fields, got {len(values)}"
+            )
+        else:
+            yield {
+                field: value for field, value in zip(fields, values) if value
+            }
+    if pending:
+        yield DecodeError("Unterminated quoted field")
+
+
+DECODERS = {
+    StreamFormat.ndjson: decode_ndjson,
+    StreamFormat.csv: decode_csv,
+}
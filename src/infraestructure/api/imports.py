@@ -0,0 +1,95 @@
+"""
+This file contains the streamed import of Todos into a Todo List.
+
+Records are validated against `TodoCreate` and loaded batch by batch as the
+body arrives, each batch in its own transaction, so memory use does not grow
+with the size of the import and progress can be followed while it runs.
+"""
+
+from typing import Any, AsyncIterator, Dict, List
+from uuid import UUID
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from domain.schemas.todo import TodoBulkError, TodoCreate, TodoImportProgress
+from infraestructure.api.formats import DecodeError
+from infraestructure.crud.todo import async_todo as todo_crud
+
+IMPORT_BATCH_SIZE = 10000
+IMPORT_MAX_ERRORS = 1000
+IMPORT_MAX_TRACKED = 1000
+
+imports: Dict[UUID, TodoImportProgress] = {}
+
+
+async def import_todos(
+    db: Any, todo_list_id: UUID, records: AsyncIterator[Any]
+) -> TodoImportProgress:
+    """
+    Validate and load decoded records into a Todo List.
+
+    Only one import per Todo List runs at a time in a process; its progress
+    is kept in `imports` until the next one starts, or until it is one of
+    the oldest finished imports beyond `IMPORT_MAX_TRACKED`.
+
+    Raises:
+        HTTPException: An import into the Todo List is already running.
+    """
+    running = imports.get(todo_list_id)
+    if running and not running.done:
+        raise HTTPException(status_code=409, detail="Import already running")
+    progress = track(todo_list_id)
+
+    batch: List[TodoCreate] = []
+    try:
+        async for record in records:
+            index = progress.rows
+            progress.rows += 1
+            try:
+                if isinstance(record, DecodeError):
+                    raise record
+                batch.append(TodoCreate.model_validate(record))
+            except (DecodeError, ValidationError) as exc:
+                add_error(progress, index, exc)
+            if len(batch) == IMPORT_BATCH_SIZE:
+                progress.imported += await todo_crud.import_rows(
+                    db, batch, todo_list_id
+                )
+                batch = []
+        if batch:
+            progress.imported += await todo_crud.import_rows(
+                db, batch, todo_list_id
+            )
+    finally:
+        progress.done = True
+    return progress
+
+
+def track(todo_list_id: UUID) -> TodoImportProgress:
+    """
+    Start the progress of an import, forgetting the oldest finished ones
+    beyond `IMPORT_MAX_TRACKED`.
+    """
+    imports.pop(todo_list_id, None)
+    progress = imports[todo_list_id] = TodoImportProgress()
+    excess = len(imports) - IMPORT_MAX_TRACKED
+    if excess > 0:
+        finished = [key for key, value in imports.items() if value.done]
+        for key in finished[:excess]:
+            del imports[key]
+    return progress
+
+
+def add_error(progress: TodoImportProgress, index: int, exc: Exception):
+    """
+    Count a row that failed, keeping its error if there is room.
+    """
+    progress.failed += 1
+    if len(progress.errors) >= IMPORT_MAX_ERRORS:
+        return
+    if isinstance(exc, ValidationError):
+        detail = exc.errors(include_url=False, include_context=False)
+    else:
+        detail = str(exc)
+    progress.errors.append(TodoBulkError(index=index, detail=detail))
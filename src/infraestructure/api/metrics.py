@@ -0,0 +1,89 @@
+"""
+This file contains the metrics middleware and the `/metrics` endpoint.
+
+The middleware times every request by route template, and counts the
+statements it runs through the context the engine events read. It is only
+added when `METRICS_ENABLED` is set.
+"""
+
+import time
+
+from fastapi.responses import PlainTextResponse
+
+from infraestructure.db import metrics
+from infraestructure.db.database import all_pool_metrics
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+POOL_GAUGES = ("checkedout", "checkedin", "overflow", "size")
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the latency and queries of each request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = metrics.RequestStats()
+        token = metrics.current_request.set(stats)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.current_request.reset(token)
+            metrics.record_request(
+                scope["method"], route_of(scope), status, elapsed, stats
+            )
+
+
+def route_of(scope: dict) -> str:
+    """
+    Return the path template a request matched, so ids do not make new
+    series, or "unmatched".
+
+    The template is the matched route's `path`. Routes of included routers
+    may only know their path within the router, so the literal prefix they
+    were matched under is put back in front.
+    """
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    path = scope["path"]
+    start = 0
+    while start != -1:
+        if route.path_regex.match(path[start:]):
+            return path[:start] + route.path
+        start = path.find("/", start + 1)
+    return route.path
+
+
+def metrics_endpoint() -> PlainTextResponse:
+    """
+    Expose the metrics in the Prometheus text format.
+    """
+    gauges = []
+    for pool in all_pool_metrics:
+        snapshot = pool.snapshot()
+        for name in POOL_GAUGES:
+            if name in snapshot:
+                gauges.append(
+                    (f"db_pool_{name}", {"engine": pool.name}, snapshot[name])
+                )
+    return PlainTextResponse(
+        metrics.render(gauges), media_type=PROMETHEUS_CONTENT_TYPE
+    )
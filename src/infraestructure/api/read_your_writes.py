@@ -0,0 +1,72 @@
+"""
+This file contains the read-your-writes middleware.
+
+A successful write request gets a cookie holding the time until which the
+client reads from the primary. Requests carrying a cookie still valid read
+from the primary instead of a replica, so a client sees its own writes
+while the replicas catch up. It is only added when read replicas are set.
+"""
+
+import math
+import time
+
+from starlette.requests import HTTPConnection
+
+from infraestructure.db import routing
+
+STICKY_COOKIE = "read_primary_until"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI middleware pinning the reads of clients that just wrote to the
+    primary.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        seconds = routing.READ_YOUR_WRITES_SECONDS
+        writes = scope["method"] not in SAFE_METHODS
+
+        async def send_cookie(message):
+            if (
+                writes
+                and seconds > 0
+                and message["type"] == "http.response.start"
+                and message["status"] < 400
+            ):
+                until = time.time() + seconds
+                cookie = (
+                    f"{STICKY_COOKIE}={until:.3f}; "
+                    f"Max-Age={math.ceil(seconds)}; Path=/; HttpOnly; "
+                    "SameSite=Lax"
+                )
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"set-cookie", cookie.encode("latin-1")),
+                ]
+            await send(message)
+
+        token = routing.read_primary.set(sticky(scope))
+        try:
+            await self.app(scope, receive, send_cookie)
+        finally:
+            routing.read_primary.reset(token)
+
+
+def sticky(scope: dict) -> bool:
+    """
+    Tell whether a request carries a read-your-writes cookie still valid.
+    """
+    value = HTTPConnection(scope).cookies.get(STICKY_COOKIE)
+    try:
+        return value is not None and float(value) > time.time()
+    except ValueError:
+        return False
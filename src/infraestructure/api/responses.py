@@ -0,0 +1,248 @@
+"""
+This file contains the lean JSON responses of the collection endpoints.
+
+By default FastAPI validates what a route returns against its response
+model, building a Pydantic model per item, and then serializes those. The
+rows read by the CRUD layer are already typed, so collections are instead
+turned into plain dicts by a serializer compiled once per schema and set of
+selected fields, and encoded with orjson. Both the derived schemas and the
+serializers are kept in bounded caches, keyed by the sorted fields, so
+clients asking for fields in any order share them.
+"""
+
+import functools
+import types
+import typing
+import warnings
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+)
+
+import sqlalchemy
+from fastapi import HTTPException, responses
+from pydantic import BaseModel, create_model
+from sqlalchemy import Row
+
+Serializer = Callable[[Any], Any]
+
+MISSING = object()
+SERIALIZER_CACHE_SIZE = 256
+
+
+with warnings.catch_warnings():
+    # FastAPI deprecates it in favour of response models, which these
+    # responses skip on purpose. The warning is raised once here, when
+    # subclassing, instead of for every response.
+    warnings.filterwarnings("ignore", message="ORJSONResponse is deprecated")
+
+    class ORJSONResponse(responses.ORJSONResponse):
+        """
+        A JSON response encoded with orjson, as FastAPI does it.
+        """
+
+
+def model_of(annotation: Any) -> Any:
+    """
+    Return the model of a field annotated with a model, an optional model
+    or a list of models, and whether it holds a list.
+    """
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin is list and args:
+        model, _ = model_of(args[0])
+        return model, True
+    if origin in (typing.Union, types.UnionType):
+        present = [arg for arg in args if arg is not type(None)]
+        if len(present) == 1:
+            return model_of(present[0])
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+    return None, False
+
+
+def canonical_fields(fields: Iterable[str]) -> Tuple[str, ...]:
+    """
+    Sort and deduplicate selected fields, the key of the caches.
+    """
+    return tuple(sorted(set(fields)))
+
+
+@functools.lru_cache(maxsize=SERIALIZER_CACHE_SIZE)
+def compile_serializer(
+    schema: Type[BaseModel], selected: Tuple[str, ...] = ()
+) -> Serializer:
+    """
+    Compile the serializer of a schema, reading its fields from a dict or
+    from attributes and leaving their values as they are.
+
+    Args:
+        schema: The schema to serialize.
+        selected: The canonical fields to keep of the items of a
+            collection schema, or all of them if empty.
+    """
+    if selected:
+        schema = sparse_schema(schema, selected)
+
+    fields = []
+    for name, field in schema.model_fields.items():
+        model, many = model_of(field.annotation)
+        nested = compile_serializer(model) if model else None
+        default = None
+        if not field.is_required():
+            default = field.get_default(call_default_factory=True)
+        fields.append((name, nested, many, default))
+
+    names = [name for name, *_ in fields]
+    attributes: Dict[type, set] = {}
+
+    def attributes_of(cls: type) -> set:
+        """
+        Return the fields found on instances of a class, so missing ones
+        are defaulted without a failing getattr.
+
+        Relationships are left out: they are serialized once loaded, and
+        never lazy loaded one instance at a time.
+        """
+        if cls not in attributes:
+            model_fields = getattr(cls, "model_fields", {})
+            mapper = sqlalchemy.inspect(cls, raiseerr=False)
+            relationships = mapper.relationships.keys() if mapper else ()
+            attributes[cls] = {
+                name
+                for name in names
+                if name not in relationships
+                and (name in model_fields or hasattr(cls, name))
+            }
+        return attributes[cls]
+
+    def serialize(value: Any) -> Any:
+        if value is None:
+            return None
+        if isinstance(value, dict):
+            loaded, present = value, None
+        elif isinstance(value, Row):
+            loaded, present = value._mapping, None
+        else:
+            # Loaded attributes of models and rows live in their __dict__,
+            # anything else goes through getattr, which loads it if needed.
+            loaded, present = value.__dict__, attributes_of(type(value))
+        data = {}
+        for name, nested, many, default in fields:
+            item = loaded.get(name, MISSING)
+            if item is MISSING:
+                if present is not None and name in present:
+                    item = getattr(value, name)
+                else:
+                    item = default
+            if nested is not None and item is not None:
+                item = [nested(i) for i in item] if many else nested(item)
+            data[name] = item
+        return data
+
+    return serialize
+
+
+def serialized(
+    schema: Type[BaseModel],
+    content: Any,
+    fields: Optional[Sequence[str]] = None,
+    **kwargs: Any,
+) -> ORJSONResponse:
+    """
+    Build the response of content shaped like a schema, without validating
+    it again.
+
+    Args:
+        schema: The response model of the route.
+        content: The content, as dicts, models or rows with the schema's
+            fields as attributes.
+        fields: The fields to keep of the items of a collection schema, or
+            None for all of them.
+        kwargs: Extra arguments of the response, such as headers.
+    """
+    serialize = compile_serializer(schema, canonical_fields(fields or ()))
+    return ORJSONResponse(serialize(content), **kwargs)
+
+
+def sparse_schema(
+    schema: Type[BaseModel], fields: Sequence[str]
+) -> Type[BaseModel]:
+    """
+    Derive a collection schema whose items only hold some fields.
+
+    Args:
+        schema: The collection schema, with its items in `data`.
+        fields: The fields of the items to keep.
+
+    Returns:
+        The derived schema, built once per set of fields, whatever their
+        order, with the fields sorted.
+    """
+    return derive_sparse_schema(schema, canonical_fields(fields))
+
+
+@functools.lru_cache(maxsize=SERIALIZER_CACHE_SIZE)
+def derive_sparse_schema(
+    schema: Type[BaseModel], fields: Tuple[str, ...]
+) -> Type[BaseModel]:
+    """
+    Build the sparse schema of canonical fields, see `sparse_schema`.
+    """
+    item, _ = model_of(schema.model_fields["data"].annotation)
+    sparse_item = create_model(
+        f"{item.__name__}_{'_'.join(fields)}",
+        **{name: (item.model_fields[name].annotation, None) for name in fields},
+    )
+    return create_model(
+        f"{schema.__name__}_{'_'.join(fields)}",
+        __base__=schema,
+        data=(List[sparse_item], ...),
+    )
+
+
+def selectable_fields(
+    schema: Type[BaseModel], model: Type[BaseModel]
+) -> Tuple[str, ...]:
+    """
+    Return the item fields of a collection schema that are model columns.
+    """
+    item, _ = model_of(schema.model_fields["data"].annotation)
+    columns = model.__table__.columns.keys()
+    return tuple(name for name in item.model_fields if name in columns)
+
+
+def parse_fields(
+    fields: Optional[str], columns: Sequence[str], kind: str = "fields"
+) -> Optional[Tuple[str, ...]]:
+    """
+    Parse a comma separated `fields` parameter of a collection endpoint.
+
+    Args:
+        fields: The parameter, or None to return whole items.
+        columns: The item fields that can be selected.
+        kind: What the parameter names, for the error.
+
+    Returns:
+        The requested fields, without duplicates, or None.
+
+    Raises:
+        HTTPException: A field is not an item field that can be selected.
+    """
+    if not fields:
+        return None
+    requested = tuple(dict.fromkeys(f.strip() for f in fields.split(",")))
+    unknown = [field for field in requested if field not in columns]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown {kind}: {', '.join(unknown)}",
+        )
+    return requested
@@ -4,83 +4,334 @@ This file contains API endpoints for the Todo resource.
 
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 
 from domain.models.todo import Todo
-from domain.schemas.todo import TodoAll, TodoCreate, TodoResponse, TodoUpdate
-from infraestructure.crud.todo import todo as todo_crud
-from infraestructure.crud.todo_list import todo_list as todo_list_crud
-from infraestructure.db.database import get_db
+from domain.schemas.todo import (
+    TodoAll,
+    TodoBulkCreate,
+    TodoBulkDelete,
+    TodoBulkError,
+    TodoBulkResponse,
+    TodoBulkUpdate,
+    TodoBulkUpdateItem,
+    TodoCreate,
+    TodoImportProgress,
+    TodoResponse,
+    TodoUpdate,
+)
+from infraestructure.api.conditional import etag, if_match_version, not_modified
+from infraestructure.api import imports
+from infraestructure.api.formats import (
+    DECODERS,
+    ENCODERS,
+    MEDIA_TYPES,
+    StreamFormat,
+)
+from infraestructure.api.responses import (
+    parse_fields,
+    selectable_fields,
+    serialized,
+)
+from infraestructure.crud.base import StaleVersionError
+from infraestructure.crud.coalescing import AckMode
+from infraestructure.crud.counting import CountMode
+from infraestructure.crud.pagination import InvalidCursorError
+from infraestructure.crud.todo import EXPORT_FIELDS
+from infraestructure.crud.todo import async_todo as todo_crud
+from infraestructure.crud.todo_list import async_todo_list as todo_list_crud
+from infraestructure.db.database import get_async_db
 
 router = APIRouter()
 
+TODO_FIELDS = selectable_fields(TodoAll, Todo)
+
+
+def validate_items(items: list, schema) -> tuple:
+    """
+    Validate bulk items one by one against a schema.
+
+    Returns:
+        The (index, item) pairs that are valid and the errors of the rest.
+    """
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, schema.model_validate(item)))
+        except ValidationError as exc:
+            errors.append(
+                TodoBulkError(
+                    index=index,
+                    detail=exc.errors(include_url=False, include_context=False),
+                )
+            )
+    return valid, errors
+
+
+def todo_or_404(todo_list_found: bool, todo: Todo) -> Todo:
+    """
+    Raise the 404 matching what was missing, or return the Todo.
+    """
+    if not todo_list_found:
+        raise HTTPException(status_code=404, detail="Todo list not found")
+    if not todo:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    return todo
+
+
+async def get_todo_list_or_404(db, todo_list_id: UUID):
+    """
+    Get a Todo List from the primary, as the writes and the export that
+    check it run there too, or raise a 404.
+    """
+    todo_list = await todo_list_crud.get_for_write(db, todo_list_id)
+    if not todo_list:
+        raise HTTPException(status_code=404, detail="Todo list not found")
+    return todo_list
+
 
 @router.post("/{todo_list_id}/task", response_model=TodoResponse)
-def create_todo(
-    todo_list_id: UUID, todo: TodoCreate, db=Depends(get_db)
+async def create_todo(
+    todo_list_id: UUID, todo: TodoCreate, db=Depends(get_async_db)
 ) -> TodoResponse:
     """
     Create a new Todo in a specific Todo List.
     """
-    todo = todo_crud.create(db, todo, todo_list_id)
+    todo = await todo_crud.create(db, todo, todo_list_id)
     return todo
 
 
 @router.get("/{todo_list_id}/task", response_model=TodoAll)
-def get_all_todos(todo_list_id: UUID, db=Depends(get_db)) -> TodoAll:
+async def get_all_todos(
+    todo_list_id: UUID,
+    request: Request,
+    name: str = Query(None, description="Filter by title"),
+    skip: int = Query(0, ge=0, description="Offset, ignored with after"),
+    limit: int = Query(100, ge=1, le=1000, description="Page size"),
+    after: str = Query(None, description="Cursor of the next page"),
+    count: CountMode = Query(CountMode.exact, description="How to count"),
+    fields: str = Query(None, description="Fields of the Todos, e.g. id,title"),
+    db=Depends(get_async_db),
+) -> TodoAll:
     """
     Get all Todos for a specific Todo List.
+
+    Tagged with the version of the list's Todos, checked before the page is
+    loaded. The page is serialized without being validated again, and only
+    the requested `fields` are selected.
+    """
+    selected = parse_fields(fields, TODO_FIELDS)
+    headers = {}
+    version = await todo_crud.collection_version(db, todo_list_id)
+    if version is not None:
+        tag = etag(version)
+        cached = not_modified(request, tag)
+        if cached:
+            return cached
+        headers["ETag"] = tag
+    try:
+        todos = await todo_crud.get_all_by_list_id_cached(
+            db,
+            todo_list_id,
+            name=name,
+            skip=skip,
+            limit=limit,
+            after=after,
+            count=count,
+            fields=selected,
+        )
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return serialized(TodoAll, todos, fields=selected, headers=headers)
+
+
+@router.get("/{todo_list_id}/task/export")
+async def export_todos(
+    todo_list_id: UUID,
+    format: StreamFormat = Query(StreamFormat.ndjson, description="Format"),
+    db=Depends(get_async_db),
+) -> StreamingResponse:
+    """
+    Stream the active Todos of a specific Todo List as NDJSON or CSV.
+
+    Rows are read from a server-side cursor and encoded batch by batch, so
+    memory use does not depend on the size of the list.
+    """
+    await get_todo_list_or_404(db, todo_list_id)
+    rows = todo_crud.stream_by_list_id(db, todo_list_id)
+    return StreamingResponse(
+        ENCODERS[format](rows, EXPORT_FIELDS),
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="{todo_list_id}.{format.value}"'
+            )
+        },
+    )
+
+
+@router.post("/{todo_list_id}/task/import", response_model=TodoImportProgress)
+async def import_todos(
+    todo_list_id: UUID,
+    request: Request,
+    format: StreamFormat = Query(StreamFormat.ndjson, description="Format"),
+    db=Depends(get_async_db),
+) -> TodoImportProgress:
+    """
+    Import Todos into a specific Todo List from a NDJSON or CSV body.
+
+    The body is read as it arrives and loaded in batches; rows that fail
+    to decode or validate are reported and skipped.
+    """
+    await get_todo_list_or_404(db, todo_list_id)
+    records = DECODERS[format](request.stream())
+    return await imports.import_todos(db, todo_list_id, records)
+
+
+@router.get("/{todo_list_id}/task/import", response_model=TodoImportProgress)
+async def get_import_progress(todo_list_id: UUID) -> TodoImportProgress:
     """
-    todos = todo_crud.get_all_by_list_id(db, todo_list_id)
-    return todos
+    Get the progress of the last import into a specific Todo List.
+    """
+    progress = imports.imports.get(todo_list_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return progress
 
 
 @router.get("/{todo_list_id}/task/{todo_id}", response_model=Todo)
-def get_todo(todo_list_id: UUID, todo_id: UUID, db=Depends(get_db)) -> Todo:
+async def get_todo(
+    todo_list_id: UUID,
+    todo_id: UUID,
+    request: Request,
+    response: Response,
+    db=Depends(get_async_db),
+) -> Todo:
     """
     Get a single Todo from a specific Todo List.
     """
-    todo_list = todo_list_crud.get(db, todo_list_id)
-    if not todo_list:
-        raise HTTPException(status_code=404, detail="Todo list not found")
-
-    todo = todo_crud.get_by_list_and_id(db, todo_list.id, todo_id)
-    if not todo:
-        raise HTTPException(status_code=404, detail="Todo not found")
+    found, todo = await todo_crud.get_in_list_cached(db, todo_list_id, todo_id)
+    todo = todo_or_404(found, todo)
+    tag = etag(todo.version)
+    cached = not_modified(request, tag)
+    if cached:
+        return cached
+    response.headers["ETag"] = tag
     return todo
 
 
 @router.put("/{todo_list_id}/task/{todo_id}", response_model=Todo)
-def update_todo(
-    todo_list_id: UUID, todo_id: UUID, obj_in: TodoUpdate, db=Depends(get_db)
+async def update_todo(
+    todo_list_id: UUID,
+    todo_id: UUID,
+    obj_in: TodoUpdate,
+    request: Request,
+    response: Response,
+    db=Depends(get_async_db),
 ) -> Todo:
     """
     Update a Todo in a specific Todo List.
-    """
-    todo_list = todo_list_crud.get(db, todo_list_id)
-    if not todo_list:
-        raise HTTPException(status_code=404, detail="Todo list not found")
 
-    db_obj = todo_crud.get_by_list_and_id(db, todo_list.id, todo_id)
-    if not db_obj:
-        raise HTTPException(status_code=404, detail="Todo not found")
-
-    todo = todo_crud.update(db, db_obj, obj_in)
+    With `If-Match`, the Todo is only updated if it still has that version.
+    Otherwise the update may be buffered by the coalescer; when it is
+    answered before being written, the status is 202.
+    """
+    version = if_match_version(request)
+    try:
+        found, todo = await todo_crud.update_in_list(
+            db, todo_list_id, todo_id, obj_in, version
+        )
+    except StaleVersionError:
+        raise HTTPException(status_code=412, detail="Todo was modified")
+    todo = todo_or_404(found, todo)
+    response.headers["ETag"] = etag(todo.version)
+    if (
+        todo_crud.buffers(obj_in, version)
+        and todo_crud.coalescer.ack is AckMode.buffer
+    ):
+        response.status_code = 202
     return todo
 
 
 @router.delete("/{todo_list_id}/task/{todo_id}")
-def delete_todo(todo_list_id: UUID, todo_id: UUID, db=Depends(get_db)) -> Todo:
+async def delete_todo(
+    todo_list_id: UUID, todo_id: UUID, db=Depends(get_async_db)
+) -> Todo:
     """
     Delete a Todo from a specific Todo List.
     """
-    todo_list = todo_list_crud.get(db, todo_list_id)
-    if not todo_list:
-        raise HTTPException(status_code=404, detail="Todo list not found")
+    found, todo = await todo_crud.delete_in_list(db, todo_list_id, todo_id)
+    return todo_or_404(found, todo)
 
-    todo = todo_crud.get_by_list_and_id(db, todo_list.id, todo_id)
-    if not todo:
-        raise HTTPException(status_code=404, detail="Todo not found")
 
-    todo = todo_crud.delete(db, todo_id)
-    return todo
+@router.post("/{todo_list_id}/task/bulk", response_model=TodoBulkResponse)
+async def bulk_create_todos(
+    todo_list_id: UUID, obj_in: TodoBulkCreate, db=Depends(get_async_db)
+) -> TodoBulkResponse:
+    """
+    Create many Todos in a specific Todo List in one transaction.
+    """
+    await get_todo_list_or_404(db, todo_list_id)
+    valid, errors = validate_items(obj_in.items, TodoCreate)
+    todos = await todo_crud.bulk_create(
+        db, [todo for _, todo in valid], todo_list_id
+    )
+    return {"data": todos, "errors": errors}
+
+
+@router.patch("/{todo_list_id}/task/bulk", response_model=TodoBulkResponse)
+async def bulk_update_todos(
+    todo_list_id: UUID, obj_in: TodoBulkUpdate, db=Depends(get_async_db)
+) -> TodoBulkResponse:
+    """
+    Update many Todos of a specific Todo List in one transaction.
+
+    Items without any field to change are reported as errors rather than
+    written.
+    """
+    await get_todo_list_or_404(db, todo_list_id)
+    valid, errors = validate_items(obj_in.items, TodoBulkUpdateItem)
+    empty = [
+        (index, item)
+        for index, item in valid
+        if not item.model_dump(exclude={"id"}, exclude_none=True)
+    ]
+    errors += [
+        TodoBulkError(index=index, id=item.id, detail="No fields to update")
+        for index, item in empty
+    ]
+    valid = [pair for pair in valid if pair not in empty]
+    todos = await todo_crud.bulk_update(
+        db,
+        [(item.id, TodoUpdate(**item.model_dump())) for _, item in valid],
+        todo_list_id,
+    )
+    found = {todo.id for todo in todos}
+    errors += [
+        TodoBulkError(index=index, id=item.id, detail="Todo not found")
+        for index, item in valid
+        if item.id not in found
+    ]
+    return {"data": todos, "errors": sorted(errors, key=lambda e: e.index)}
+
+
+@router.post(
+    "/{todo_list_id}/task/bulk/delete", response_model=TodoBulkResponse
+)
+async def bulk_delete_todos(
+    todo_list_id: UUID, obj_in: TodoBulkDelete, db=Depends(get_async_db)
+) -> TodoBulkResponse:
+    """
+    Soft delete many Todos of a specific Todo List in one transaction.
+    """
+    await get_todo_list_or_404(db, todo_list_id)
+    todos = await todo_crud.bulk_delete(db, obj_in.ids, todo_list_id)
+    found = {todo.id for todo in todos}
+    errors = [
+        TodoBulkError(index=index, id=id, detail="Todo not found")
+        for index, id in enumerate(obj_in.ids)
+        if id not in found
+    ]
+    return {"data": todos, "errors": errors}
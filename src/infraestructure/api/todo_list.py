@@ -4,75 +4,200 @@ This file contains API endpoints for the Todo resource.
 
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 
 from domain.models.todo_list import TodoList
 from domain.schemas.todo_list import (
     TodoListAll,
     TodoListCreate,
     TodoListResponse,
+    TodoListStats,
     TodoListUpdate,
 )
-from infraestructure.crud.todo_list import todo_list as todo_list_crud
-from infraestructure.db.database import get_db
+from infraestructure.api.conditional import etag, if_match_version, not_modified
+from infraestructure.api.responses import (
+    parse_fields,
+    selectable_fields,
+    serialized,
+)
+from infraestructure.crud.base import StaleVersionError
+from infraestructure.crud.counting import CountMode
+from infraestructure.crud.pagination import InvalidCursorError
+from infraestructure.crud.todo import EMBED_LIMIT
+from infraestructure.crud.todo_list import async_todo_list as todo_list_crud
+from infraestructure.crud.todo_list import stats_of
+from infraestructure.db.database import get_async_db
 
 router = APIRouter()
 
+LIST_FIELDS = selectable_fields(TodoListAll, TodoList)
+STATS_FIELDS = ("todos_total", "todos_completed")
+INCLUDES = ("todos",)
+
 
 @router.post("/", response_model=TodoListResponse)
-def create_todo(todo: TodoListCreate, db=Depends(get_db)) -> TodoListResponse:
+async def create_todo(
+    todo: TodoListCreate, db=Depends(get_async_db)
+) -> TodoListResponse:
     """
     Create a new Todo.
+
+    Serialized without reading `todos`, which would lazy load them.
     """
-    todo = todo_list_crud.create(db, todo)
-    return todo
+    todo = await todo_list_crud.create(db, todo)
+    return serialized(TodoListResponse, todo)
 
 
 @router.get("/", response_model=TodoListAll)
-def get_all_todos(
-    name: str = Query(None, description="Filter by name"), db=Depends(get_db)
+async def get_all_todos(
+    name: str = Query(None, description="Filter by name"),
+    skip: int = Query(0, ge=0, description="Offset, ignored with after"),
+    limit: int = Query(100, ge=1, le=1000, description="Page size"),
+    after: str = Query(None, description="Cursor of the next page"),
+    count: CountMode = Query(CountMode.exact, description="How to count"),
+    stats: bool = Query(False, description="Embed the completion stats"),
+    fields: str = Query(None, description="Fields of the lists, e.g. id,name"),
+    include: str = Query(None, description="Relations to embed: todos"),
+    todos_limit: int = Query(
+        EMBED_LIMIT, ge=1, le=100, description="Most Todos per list"
+    ),
+    todos_completed: bool = Query(None, description="Filter embedded Todos"),
+    db=Depends(get_async_db),
 ) -> TodoListAll:
     """
     Get all Todos.
-    """
-    todos = todo_list_crud.all(db, name=name)
-    return todos
 
-
-@router.get("/{todo_list_id}", response_model=TodoList)
-def get_todo(todo_list_id: UUID, db=Depends(get_db)) -> TodoList:
+    The page is serialized without being validated again, and only the
+    requested `fields`, plus the counters behind `stats`, are selected.
+    With `include=todos`, the first Todos of every list on the page are
+    embedded, read in one statement.
+    """
+    selected = parse_fields(fields, LIST_FIELDS)
+    included = parse_fields(include, INCLUDES, kind="include") or ()
+    columns = selected
+    if stats:
+        columns = (*(selected or LIST_FIELDS), *STATS_FIELDS)
+    if columns and included and "id" not in columns:
+        columns = (*columns, "id")
+    try:
+        todos = await todo_list_crud.all(
+            db,
+            skip=skip,
+            limit=limit,
+            name=name,
+            after=after,
+            count=count,
+            fields=columns,
+        )
+    except InvalidCursorError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if stats:
+        todos["data"] = [
+            {**row, "stats": stats_of(*(row[f] for f in STATS_FIELDS))}
+            for row in todos["data"]
+        ]
+        if selected:
+            selected = (*selected, "stats")
+    if "todos" in included:
+        await todo_list_crud.include_todos(
+            db,
+            todos["data"],
+            limit=todos_limit,
+            is_completed=todos_completed,
+        )
+        if selected:
+            selected = (*selected, "todos")
+    return serialized(TodoListAll, todos, fields=selected)
+
+
+@router.get("/{todo_list_id}", response_model=TodoListResponse)
+async def get_todo(
+    todo_list_id: UUID,
+    request: Request,
+    include: str = Query(None, description="Relations to embed: todos"),
+    todos_limit: int = Query(
+        EMBED_LIMIT, ge=1, le=100, description="Most Todos to embed"
+    ),
+    todos_completed: bool = Query(None, description="Filter embedded Todos"),
+    db=Depends(get_async_db),
+) -> TodoListResponse:
     """
     Get a single Todo
+
+    With `include=todos`, its first Todos are embedded, and the ETag also
+    covers the version of its Todos.
     """
-    todo = todo_list_crud.get(db, todo_list_id)
+    included = parse_fields(include, INCLUDES, kind="include") or ()
+    if "todos" in included:
+        todo = await todo_list_crud.get(db, todo_list_id)
+    else:
+        todo = await todo_list_crud.get_cached(db, todo_list_id)
 
     if not todo:
         raise HTTPException(status_code=404, detail="Todo not found")
 
-    return todo
+    tag = etag(todo.version)
+    if "todos" in included:
+        tag = etag(todo.version, todo.todos_version)
+    cached = not_modified(request, tag)
+    if cached:
+        return cached
+    if "todos" in included:
+        await todo_list_crud.include_todos(
+            db, [todo], limit=todos_limit, is_completed=todos_completed
+        )
+    return serialized(TodoListResponse, todo, headers={"ETag": tag})
+
+
+@router.get("/{todo_list_id}/stats", response_model=TodoListStats)
+async def get_todo_list_stats(
+    todo_list_id: UUID, db=Depends(get_async_db)
+) -> TodoListStats:
+    """
+    Get the completion stats of a Todo List.
+    """
+    stats = await todo_list_crud.stats(db, todo_list_id)
+    if not stats:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    return stats
 
 
-@router.put("/{todo_list_id}", response_model=TodoList)
-def update_todo(
-    todo_list_id: UUID, obj_in: TodoListUpdate, db=Depends(get_db)
-) -> TodoList:
+@router.put("/{todo_list_id}", response_model=TodoListResponse)
+async def update_todo(
+    todo_list_id: UUID,
+    obj_in: TodoListUpdate,
+    request: Request,
+    db=Depends(get_async_db),
+) -> TodoListResponse:
     """
     Update a Todo List.
+
+    With `If-Match`, the Todo List is only updated if it still has that
+    version.
     """
-    db_obj = todo_list_crud.get(db, todo_list_id)
+    db_obj = await todo_list_crud.get_for_write(db, todo_list_id)
     if not db_obj:
         raise HTTPException(status_code=404, detail="Todo not found")
-    todo = todo_list_crud.update(db, db_obj, obj_in)
-    return todo
-
-
-@router.delete("/{todo_list_id}")
-def delete_todo(todo_list_id: UUID, db=Depends(get_db)) -> TodoList:
+    try:
+        todo = await todo_list_crud.update(
+            db, db_obj, obj_in, if_match_version(request)
+        )
+    except StaleVersionError:
+        raise HTTPException(status_code=412, detail="Todo was modified")
+    return serialized(
+        TodoListResponse, todo, headers={"ETag": etag(todo.version)}
+    )
+
+
+@router.delete("/{todo_list_id}", response_model=TodoListResponse)
+async def delete_todo(
+    todo_list_id: UUID, db=Depends(get_async_db)
+) -> TodoListResponse:
     """
     Delete a Todo List.
     """
-    todo = todo_list_crud.get(db, todo_list_id)
+    todo = await todo_list_crud.get_for_write(db, todo_list_id)
     if not todo:
         raise HTTPException(status_code=404, detail="Todo not found")
-    todo_list_crud.delete(db, todo_list_id)
-    return todo
+    await todo_list_crud.delete(db, todo_list_id)
+    return serialized(TodoListResponse, todo)
@@ -2,19 +2,81 @@
 This is the base crud file.
 """
 
-from typing import Any, Generic, List, Optional, TypeVar
+import os
+from datetime import datetime, timezone
+from typing import (
+    Any,
+    Callable,
+    Generic,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+)
+from uuid import UUID
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel as PydanticBaseModel
+from sqlalchemy import Table, delete, insert, literal, update
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from domain.models.base import Base
+from domain.models.archive import purge_horizon
+from domain.models.base import Base, utcnow
+from infraestructure.crud.cache import read_cache
+from infraestructure.crud.coalescing import UpdateCoalescer
+from infraestructure.crud.counting import (
+    CountMode,
+    cached_count,
+    count_cache,
+    estimated_count,
+    exact_count,
+)
+from infraestructure.crud.pagination import (
+    decode_cursor,
+    encode_cursor,
+    keyset_after,
+)
+from infraestructure.crud.search import search_backend, searchable_column
+from infraestructure.db import routing
+
+BULK_BATCH_SIZE = 500
+PURGE_BATCH_SIZE = 1000
+PURGE_AFTER_DAYS = float(os.getenv("PURGE_AFTER_DAYS", "30"))
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=PydanticBaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=PydanticBaseModel)
 
 
+def deleted_values() -> dict:
+    """
+    Build the values a soft delete sets.
+    """
+    return {"is_active": False, "deleted_at": utcnow()}
+
+
+class StaleVersionError(Exception):
+    """
+    Raised when a conditional write targets an outdated version of a row.
+    """
+
+
+class InvalidFieldsError(ValueError):
+    """
+    Raised when fields that are not columns of the model are selected.
+    """
+
+
+def encode(value: Any) -> Any:
+    """
+    Encode a model or a collection for the read cache, keeping None.
+    """
+    return None if value is None else jsonable_encoder(value)
+
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     """
     A base class for CRUD operations.
@@ -22,14 +84,16 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         model: The database model to perform CRUD operations on.
     """
 
-    def __init__(self, model: ModelType):
+    def __init__(self, model: ModelType, archive: Optional[Table] = None):
         """
         Initialize the CRUD operations.
 
         Args:
             model: The database model to perform CRUD operations
+            archive: The table purged models are moved to, if any.
         """
         self.model = model
+        self.archive = archive
 
     def get(self, db: Session, id: Any) -> Optional[ModelType]:
         """
@@ -55,25 +119,220 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         limit: int = 100,
         alive_only: bool = True,
         name: str = None,
-    ) -> List[ModelType]:
+        after: Optional[str] = None,
+        count: CountMode = CountMode.exact,
+        fields: Optional[Sequence[str]] = None,
+    ) -> dict:
         """
         Get all models, with optional filtering by name.
 
         Args:
             db: The database session.
+            skip: The number of rows to skip, ignored when `after` is given.
+            limit: The maximum number of rows to return.
+            alive_only: Whether to return only active rows.
+            name: The term to search names for, results are ranked by it.
+            after: The cursor returned by the previous page.
+            count: How the total of the filtered rows is computed.
+            fields: The columns to select, as dicts, instead of models.
 
         Returns:
-            All models.
+            All models, the total and the cursor of the next page.
         """
-        statement = select(self.model)
+        statement = self.select_fields(fields)
         if alive_only:
             statement = statement.where(self.model.is_active == True)  # noqa E712
-        if name and hasattr(self.model, "name"):
-            statement = statement.where(self.model.name.ilike(f"%{name}%"))
-        statement = statement.offset(skip).limit(limit)
-        results = db.exec(statement).all()
-        total = len(results)
-        return {"total": total, "data": results}
+        sort_keys = []
+        if name:
+            statement, sort_keys = self.search(db, statement, name)
+        results, next_cursor = self.paginate(
+            db,
+            statement,
+            skip=skip,
+            limit=limit,
+            after=after,
+            sort_keys=sort_keys,
+        )
+        total = self.count(db, statement, mode=count)
+        return {"total": total, "data": results, "next_cursor": next_cursor}
+
+    def select_fields(self, fields: Optional[Sequence[str]] = None) -> Any:
+        """
+        Build the select statement of the model, or of some of its columns.
+
+        Args:
+            fields: The names of the columns to select, or None for the
+                whole model.
+
+        Returns:
+            The select statement.
+
+        Raises:
+            InvalidFieldsError: A field is not a column of the model.
+        """
+        if fields is None:
+            return select(self.model)
+        unknown = set(fields) - set(self.model.__table__.columns.keys())
+        if unknown:
+            raise InvalidFieldsError(
+                f"Unknown fields: {', '.join(sorted(unknown))}"
+            )
+        return select(*(getattr(self.model, field) for field in fields))
+
+    def search(
+        self, db: Session, statement: Any, term: str
+    ) -> Tuple[Any, List[Any]]:
+        """
+        Filter a select statement by a search term on the searchable column.
+
+        Args:
+            db: The database session.
+            statement: The select statement to filter.
+            term: The search term.
+
+        Returns:
+            The filtered statement and the sort keys ranking the matches.
+        """
+        search_column = searchable_column(self.model)
+        if search_column is None:
+            return statement, []
+        backend = search_backend(db.get_bind().dialect.name)
+        statement, rank = backend.apply(statement, search_column, term)
+        return statement, [rank] if rank is not None else []
+
+    def paginate(
+        self,
+        db: Session,
+        statement: Any,
+        skip: int = 0,
+        limit: int = 100,
+        after: Optional[str] = None,
+        sort_keys: Sequence[Any] = (),
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        """
+        Run a select statement one page at a time.
+
+        Rows are ordered by the given sort keys followed by the primary key,
+        so the order is stable. When a cursor is given the page seeks past
+        it instead of using an offset, which keeps deep pages as cheap as
+        the first one.
+
+        Args:
+            db: The database session.
+            statement: The filtered select statement.
+            skip: The number of rows to skip, ignored when `after` is given.
+            limit: The maximum number of rows to return.
+            after: The cursor returned by the previous page.
+            sort_keys: The expressions to order by before the primary key.
+
+        Returns:
+            The rows of the page and the cursor of the next page, if any.
+            Rows are models, or dicts when only some columns are selected.
+        """
+        selected = [column["name"] for column in statement.column_descriptions]
+        whole_model = statement.column_descriptions[0]["expr"] is self.model
+        columns = [*sort_keys, self.model.id]
+        statement = statement.order_by(*columns).add_columns(
+            *(
+                column.label(f"sort_key_{index}")
+                for index, column in enumerate(columns)
+            )
+        )
+        if after:
+            values = decode_cursor(after, columns)
+            statement = statement.where(keyset_after(columns, values))
+        else:
+            statement = statement.offset(skip)
+        rows = db.execute(statement.limit(limit)).all()
+        if whole_model:
+            results = [row[0] for row in rows]
+        else:
+            results = [dict(zip(selected, row)) for row in rows]
+
+        next_cursor = None
+        if rows and len(rows) == limit:
+            next_cursor = encode_cursor(rows[-1][len(selected) :])
+        return results, next_cursor
+
+    def count(
+        self, db: Session, statement: Any, mode: CountMode = CountMode.exact
+    ) -> int:
+        """
+        Count the rows matched by a filtered select statement.
+
+        Args:
+            db: The database session.
+            statement: The filtered select statement, without paging.
+            mode: Whether to count exactly, estimate or reuse a recent count.
+
+        Returns:
+            The number of matching rows.
+        """
+        if mode == CountMode.estimated:
+            return estimated_count(db, statement)
+        if mode == CountMode.cached:
+            return cached_count(db, statement, self.model.__tablename__)
+        return exact_count(db, statement)
+
+    def cache_key(self, *parts: Any) -> str:
+        """
+        Build the read cache key of the model for the given parts.
+        """
+        return ":".join([self.model.__tablename__, *map(str, parts)])
+
+    def on_write(self, db: Session, *db_objs: ModelType):
+        """
+        Hook run in the transaction of a write, right before it commits.
+
+        Args:
+            db: The database session.
+            db_objs: The written models.
+        """
+
+    def invalidate(self, *db_objs: ModelType):
+        """
+        Drop the cached counts and reads of the model after a write.
+
+        Args:
+            db_objs: The written models.
+        """
+        count_cache.invalidate(self.model.__tablename__)
+        for db_obj in db_objs:
+            read_cache.bump(self.cache_key(db_obj.id))
+
+    def id_cache_key(self, id: Any) -> str:
+        """
+        Build the read cache key of a model by id, in a namespace its
+        writes replace, so a read loaded before a write is stored where it
+        is never found again.
+        """
+        namespace = read_cache.namespace(self.cache_key(id))
+        return self.cache_key(id, namespace)
+
+    def get_cached(self, db: Session, id: Any) -> Optional[ModelType]:
+        """
+        Get a model by id through the read cache.
+
+        Args:
+            db: The database session.
+            id: The id of the model to get.
+
+        Returns:
+            The model with the given id, detached from the session when
+            cached.
+        """
+        if not read_cache.enabled:
+            return self.get(db, id)
+        value = read_cache.get_or_load(
+            self.id_cache_key(id), lambda: encode(self.get(db, id))
+        )
+        return self.decode(value)
+
+    def decode(self, value: Optional[dict]) -> Optional[ModelType]:
+        """
+        Rebuild a model read from the cache, keeping None.
+        """
+        return None if value is None else self.model.model_validate(value)
 
     def create(self, db: Session, obj_in: CreateSchemaType) -> ModelType:
         """
@@ -86,15 +345,21 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         Returns:
             The created model.
         """
-        obj_in_data = jsonable_encoder(obj_in)
+        obj_in_data = self.input_data(obj_in)
         db_obj = self.model(**obj_in_data)
         db.add(db_obj)
+        self.on_write(db, db_obj)
         db.commit()
+        self.invalidate(db_obj)
         db.refresh(db_obj)
         return db_obj
 
     def update(
-        self, db: Session, db_obj: ModelType, obj_in: UpdateSchemaType
+        self,
+        db: Session,
+        db_obj: ModelType,
+        obj_in: UpdateSchemaType,
+        version: Optional[int] = None,
     ) -> ModelType:
         """
         Update a model.
@@ -103,25 +368,35 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             db: The database session.
             db_obj: The model to update.
             obj_in: The updated model.
+            version: The version the model must still have, if any.
 
         Returns:
             The updated model.
+
+        Raises:
+            StaleVersionError: The model was written since `version`.
         """
-        if isinstance(obj_in, Base):
-            update_data = obj_in.model_dump(exclude_unset=True)
-        else:
-            update_data = {
-                key: value
-                for key, value in obj_in.__dict__.items()
-                if value is not None
-            }
-
-        obj_data = jsonable_encoder(db_obj)
-        for field in obj_data:
+        update_data = self.update_data(obj_in)
+        if version is not None:
+            changed = self._bulk_set(
+                db, [db_obj.id], update_data, [self.model.version == version]
+            )
+            if not changed:
+                db.rollback()
+                raise StaleVersionError(db_obj.id)
+            self.on_write(db, *changed)
+            db.commit()
+            self.invalidate(*changed)
+            return changed[0]
+
+        for field in self.model.model_fields:
             if field in update_data:
                 setattr(db_obj, field, update_data[field])
+        db_obj.version += 1
         db.add(db_obj)
+        self.on_write(db, db_obj)
         db.commit()
+        self.invalidate(db_obj)
         db.refresh(db_obj)
         return db_obj
 
@@ -141,7 +416,427 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         if not db_obj:
             return None
         db_obj.is_active = False
+        db_obj.deleted_at = utcnow()
+        db_obj.version += 1
         db.add(db_obj)
+        self.on_write(db, db_obj)
         db.commit()
+        self.invalidate(db_obj)
         db.refresh(db_obj)
         return db_obj
+
+    def input_data(self, obj_in: CreateSchemaType) -> dict:
+        """
+        Get the fields of a created model, without encoding their values.
+
+        Args:
+            obj_in: The model to create, or a dict of its fields.
+
+        Returns:
+            The fields and their values.
+        """
+        if isinstance(obj_in, dict):
+            return dict(obj_in)
+        return obj_in.model_dump()
+
+    def update_data(self, obj_in: UpdateSchemaType) -> dict:
+        """
+        Get the fields an update sets.
+
+        Args:
+            obj_in: The updated model.
+
+        Returns:
+            The fields to set and their values.
+        """
+        if isinstance(obj_in, Base):
+            return obj_in.model_dump(exclude_unset=True)
+        return {
+            key: value
+            for key, value in obj_in.__dict__.items()
+            if value is not None
+        }
+
+    def bulk_create(
+        self, db: Session, objs_in: List[CreateSchemaType], **values: Any
+    ) -> List[ModelType]:
+        """
+        Create many models in one transaction.
+
+        Each batch is a single multi-row `INSERT ... RETURNING`.
+
+        Args:
+            db: The database session.
+            objs_in: The models to create.
+            values: Values set on every created model.
+
+        Returns:
+            The created models, in the order of `objs_in`.
+        """
+        rows = [
+            self.model(**obj_in.model_dump(), **values).model_dump()
+            for obj_in in objs_in
+        ]
+        created = []
+        for start in range(0, len(rows), BULK_BATCH_SIZE):
+            created.extend(
+                db.scalars(
+                    insert(self.model).returning(
+                        self.model, sort_by_parameter_order=True
+                    ),
+                    rows[start : start + BULK_BATCH_SIZE],
+                ).all()
+            )
+        self.on_write(db, *created)
+        db.commit()
+        self.invalidate(*created)
+        return created
+
+    def bulk_update(
+        self,
+        db: Session,
+        objs_in: List[Tuple[Any, UpdateSchemaType]],
+        filters: Sequence[Any] = (),
+    ) -> List[ModelType]:
+        """
+        Update many active models in one transaction.
+
+        Models receiving the same changes are updated together, one
+        `UPDATE ... WHERE id IN (...) RETURNING` per batch.
+
+        Args:
+            db: The database session.
+            objs_in: The ids of the models to update and their changes.
+            filters: Extra conditions the models must match.
+
+        Returns:
+            The updated models. Ids that matched no model, and models
+            without changes, are left out.
+        """
+        groups = {}
+        for id, obj_in in objs_in:
+            update_data = self.update_data(obj_in)
+            if update_data:
+                key = tuple(sorted(update_data.items()))
+                groups.setdefault(key, []).append(id)
+
+        updated = []
+        for update_data, ids in groups.items():
+            updated.extend(self._bulk_set(db, ids, dict(update_data), filters))
+        self.on_write(db, *updated)
+        db.commit()
+        self.invalidate(*updated)
+        return updated
+
+    def bulk_delete(
+        self, db: Session, ids: List[Any], filters: Sequence[Any] = ()
+    ) -> List[ModelType]:
+        """
+        Soft delete many active models in one transaction.
+
+        Args:
+            db: The database session.
+            ids: The ids of the models to remove.
+            filters: Extra conditions the models must match.
+
+        Returns:
+            The removed models. Ids that matched no model are left out.
+        """
+        deleted = self._bulk_set(db, ids, deleted_values(), filters)
+        self.on_write(db, *deleted)
+        db.commit()
+        self.invalidate(*deleted)
+        return deleted
+
+    def purge(
+        self,
+        db: Session,
+        before: datetime,
+        archive: bool = True,
+        batch_size: int = PURGE_BATCH_SIZE,
+        filters: Sequence[Any] = (),
+    ) -> int:
+        """
+        Remove the models soft deleted before a time, batch by batch.
+
+        Each batch is copied to the archive table, if any, and deleted in
+        its own transaction, so locks are only held for one batch at a
+        time. Rows soft deleted before `deleted_at` was recorded are kept.
+        The first batch moves the purge horizon of the model to `before`.
+
+        Args:
+            db: The database session.
+            before: The time the models must have been deleted before.
+            archive: Whether to copy the models to the archive table, if
+                the model has one, or only delete them.
+            batch_size: The most models removed per transaction.
+            filters: Extra conditions the models must match.
+
+        Returns:
+            The number of models removed.
+        """
+        table = self.model.__table__
+        archive_table = self.archive if archive else None
+        columns = [column.name for column in table.columns]
+        statement = (
+            select(self.model.id)
+            .where(
+                self.model.is_active == False,  # noqa E712
+                self.model.deleted_at < before,
+                *filters,
+            )
+            .limit(batch_size)
+        )
+        purged = 0
+        while True:
+            ids = db.exec(statement).all()
+            if not ids:
+                if purged:
+                    self.invalidate()
+                return purged
+            if not purged:
+                self.record_purge(db, before)
+            if archive_table is not None:
+                rows = select(
+                    *(table.c[column] for column in columns),
+                    literal(utcnow()).label("archived_at"),
+                ).where(table.c.id.in_(ids))
+                db.execute(
+                    insert(archive_table).from_select(
+                        [*columns, "archived_at"], rows
+                    )
+                )
+            db.execute(delete(table).where(table.c.id.in_(ids)))
+            db.commit()
+            purged += len(ids)
+
+    def purged_before(self, db: Session) -> Optional[datetime]:
+        """
+        Get the time up to which soft deleted models may have been purged,
+        or None if they never were.
+        """
+        value = db.exec(
+            select(purge_horizon.c.purged_before).where(
+                purge_horizon.c.table_name == self.model.__tablename__
+            )
+        ).first()
+        if value is not None and value.tzinfo is None:
+            # SQLite keeps no time zone, the times written are UTC.
+            value = value.replace(tzinfo=timezone.utc)
+        return value
+
+    def record_purge(self, db: Session, before: datetime):
+        """
+        Move the purge horizon of the model forward to a time, in the
+        transaction of the purge, never back.
+        """
+        current = self.purged_before(db)
+        name = self.model.__tablename__
+        if current is None:
+            db.execute(
+                insert(purge_horizon).values(
+                    table_name=name, purged_before=before
+                )
+            )
+        elif current < before:
+            db.execute(
+                update(purge_horizon)
+                .where(purge_horizon.c.table_name == name)
+                .values(purged_before=before)
+            )
+
+    def _bulk_set(
+        self,
+        db: Session,
+        ids: List[Any],
+        values: dict,
+        filters: Sequence[Any],
+    ) -> List[ModelType]:
+        """
+        Set the same values on many active models, batch by batch.
+        """
+        changed = []
+        for start in range(0, len(ids), BULK_BATCH_SIZE):
+            statement = (
+                update(self.model)
+                .where(
+                    self.model.id.in_(ids[start : start + BULK_BATCH_SIZE]),
+                    self.model.is_active == True,  # noqa E712
+                    *filters,
+                )
+                .values(**values, version=self.model.version + 1)
+                .returning(self.model)
+                .execution_options(synchronize_session="fetch")
+            )
+            changed.extend(db.scalars(statement).all())
+        return changed
+
+
+CRUDType = TypeVar("CRUDType", bound=CRUDBase)
+
+
+def ids_of(args: Sequence[Any]) -> Optional[Set[UUID]]:
+    """
+    Collect the ids an operation is about: its id arguments and the ids of
+    its models, in lists too. None when it has none, as it may read
+    anything.
+    """
+    ids = set()
+    for arg in args:
+        for value in arg if isinstance(arg, list) else (arg,):
+            value = getattr(value, "id", value)
+            if isinstance(value, UUID):
+                ids.add(value)
+    return ids or None
+
+
+class AsyncCRUDBase(Generic[CRUDType]):
+    """
+    Asyncio version of a CRUD object.
+
+    Each method runs the matching method of the wrapped CRUD object on the
+    session's asyncio connection, so the event loop is never blocked while
+    waiting on the database.
+
+    Attributes:
+        crud: The CRUD object to run.
+        coalescer: The write-behind buffer whose updates are written before
+            the operations on their Todo Lists or Todos, if any.
+    """
+
+    def __init__(
+        self, crud: CRUDType, coalescer: Optional[UpdateCoalescer] = None
+    ):
+        """
+        Initialize the asyncio CRUD operations.
+
+        Args:
+            crud: The CRUD object to run
+            coalescer: The write-behind buffer of updates, if any.
+        """
+        self.crud = crud
+        self.model = crud.model
+        self.coalescer = coalescer
+
+    async def run(
+        self, db: AsyncSession, method: Callable, *args: Any, **kwargs: Any
+    ) -> Any:
+        """
+        Run a method of the wrapped CRUD object on an asyncio session.
+
+        Updates held by the coalescer for the ids among the arguments, or
+        all of them without any, are written first, so the method sees
+        them.
+
+        Args:
+            db: The asyncio database session.
+            method: The CRUD method, called with the sync session first.
+
+        Returns:
+            The result of the method.
+        """
+        if self.coalescer is not None:
+            await self.coalescer.settle(ids_of(args))
+        return await db.run_sync(
+            lambda session: method(session, *args, **kwargs)
+        )
+
+    async def read(
+        self, db: AsyncSession, method: Callable, *args: Any, **kwargs: Any
+    ) -> Any:
+        """
+        Run a read-only method of the wrapped CRUD object, whose queries may
+        go to a read replica.
+
+        Writes, and the reads they depend on, use `run` and stay on the
+        primary.
+        """
+
+        def call(session: Session, *args: Any, **kwargs: Any) -> Any:
+            with routing.reading(session):
+                return method(session, *args, **kwargs)
+
+        return await self.run(db, call, *args, **kwargs)
+
+    async def get(self, db: AsyncSession, id: Any) -> Optional[ModelType]:
+        """
+        Get a model by id, maybe from a read replica.
+        """
+        return await self.read(db, self.crud.get, id)
+
+    async def get_for_write(
+        self, db: AsyncSession, id: Any
+    ) -> Optional[ModelType]:
+        """
+        Get a model by id from the primary, for a write to follow.
+        """
+        return await self.run(db, self.crud.get, id)
+
+    async def get_cached(
+        self, db: AsyncSession, id: Any
+    ) -> Optional[ModelType]:
+        """
+        Get a model by id through the read cache, loaded from a read
+        replica on a miss.
+        """
+        return await self.read(db, self.crud.get_cached, id)
+
+    async def all(self, db: AsyncSession, **kwargs: Any) -> dict:
+        """
+        Get all models, maybe from a read replica, see `CRUDBase.all` for
+        the filters.
+        """
+        return await self.read(db, self.crud.all, **kwargs)
+
+    async def create(
+        self, db: AsyncSession, obj_in: CreateSchemaType, *args: Any
+    ) -> ModelType:
+        """
+        Create a new model.
+        """
+        return await self.run(db, self.crud.create, obj_in, *args)
+
+    async def update(
+        self,
+        db: AsyncSession,
+        db_obj: ModelType,
+        obj_in: UpdateSchemaType,
+        version: Optional[int] = None,
+    ) -> ModelType:
+        """
+        Update a model.
+        """
+        return await self.run(db, self.crud.update, db_obj, obj_in, version)
+
+    async def delete(self, db: AsyncSession, id: Any) -> ModelType:
+        """
+        Delete a model.
+        """
+        return await self.run(db, self.crud.delete, id)
+
+    async def bulk_create(
+        self, db: AsyncSession, objs_in: List[CreateSchemaType], *args: Any
+    ) -> List[ModelType]:
+        """
+        Create many models in one transaction.
+        """
+        return await self.run(db, self.crud.bulk_create, objs_in, *args)
+
+    async def bulk_update(
+        self,
+        db: AsyncSession,
+        objs_in: List[Tuple[Any, UpdateSchemaType]],
+        *args,
+    ) -> List[ModelType]:
+        """
+        Update many active models in one transaction.
+        """
+        return await self.run(db, self.crud.bulk_update, objs_in, *args)
+
+    async def bulk_delete(
+        self, db: AsyncSession, ids: List[Any], *args: Any
+    ) -> List[ModelType]:
+        """
+        Soft delete many active models in one transaction.
+        """
+        return await self.run(db, self.crud.bulk_delete, ids, *args)
@@ -0,0 +1,207 @@
+"""
+This file contains the read-through cache in front of the CRUD reads.
+
+Values are JSON-compatible dicts, so the same entries can live in process
+memory or in Redis. Groups of entries, such as every cached read of one
+list's tasks, share a namespace token that writes replace, which drops the
+whole group at once without scanning keys.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+from uuid import uuid4
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "none")
+CACHE_TTL = float(os.getenv("CACHE_TTL", "30"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+
+
+class NullCache:
+    """
+    A cache that stores nothing, used when caching is disabled.
+    """
+
+    evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        return None
+
+    def set(self, key: str, value: Any, ttl: float):
+        pass
+
+    def delete(self, key: str):
+        pass
+
+
+class LRUCache(NullCache):
+    """
+    An in-process least recently used cache with a time to live.
+
+    Attributes:
+        max_entries: The number of entries kept before evicting.
+        evictions: The entries dropped to make room for new ones.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class RedisCache(NullCache):
+    """
+    A cache stored in Redis, or any server speaking its protocol.
+
+    Requires the `redis` package unless a client is given.
+    """
+
+    def __init__(self, client: Any = None, url: str = CACHE_URL):
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url)
+        self.client = client
+
+    @property
+    def evictions(self) -> int:
+        try:
+            return int(self.client.info("stats").get("evicted_keys", 0))
+        except Exception:
+            return 0
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.client.get(key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: float):
+        self.client.set(key, json.dumps(value), px=int(ttl * 1000))
+
+    def delete(self, key: str):
+        self.client.delete(key)
+
+
+def create_backend(name: str) -> NullCache:
+    """
+    Create the cache backend named by CACHE_BACKEND.
+    """
+    if name == "memory":
+        return LRUCache()
+    if name == "redis":
+        return RedisCache()
+    return NullCache()
+
+
+class ReadCache:
+    """
+    Read-through access to a cache backend, with hit and miss counters.
+
+    Attributes:
+        backend: The cache backend entries are stored in.
+        ttl: The time to live of entries, in seconds.
+        hits: Reads served from the cache.
+        misses: Reads that had to be loaded.
+    """
+
+    def __init__(self, backend: NullCache, ttl: float = CACHE_TTL):
+        self._lock = threading.Lock()
+        self.use(backend, ttl)
+
+    def use(self, backend: NullCache, ttl: float = CACHE_TTL):
+        """
+        Swap the cache backend and reset the counters.
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Tell whether entries are stored at all, so callers can skip
+        encoding values for a cache that drops them.
+        """
+        return type(self.backend) is not NullCache
+
+    def get_or_load(self, key: str, load: Callable[[], Any]) -> Any:
+        """
+        Get a value from the cache, or load and store it on a miss.
+
+        Values loaded as None are not stored.
+        """
+        value = self.backend.get(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            return value
+
+        with self._lock:
+            self.misses += 1
+        value = load()
+        if value is not None:
+            self.backend.set(key, value, self.ttl)
+        return value
+
+    def set(self, key: str, value: Any):
+        self.backend.set(key, value, self.ttl)
+
+    def delete(self, key: str):
+        self.backend.delete(key)
+
+    def namespace(self, key: str) -> str:
+        """
+        Get the current token of a group of entries.
+        """
+        token = self.backend.get(key)
+        if token is None:
+            token = self.bump(key)
+        return token
+
+    def bump(self, key: str) -> str:
+        """
+        Replace the token of a group of entries, dropping all of them.
+        """
+        token = uuid4().hex
+        self.backend.set(key, token, self.ttl)
+        return token
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.backend.evictions,
+        }
+
+
+read_cache = ReadCache(create_backend(CACHE_BACKEND))
@@ -0,0 +1,292 @@
+"""
+This file contains the change feed of the Todo Lists.
+
+Writes record an event per written Todo, or Todo List, in their
+transaction. The events are published to the subscribers of the list once
+the transaction commits, and dropped if it rolls back. Each subscriber reads
+from a bounded queue: one that falls `CHANGE_FEED_QUEUE_SIZE` events behind
+is dropped and sent a `resync` event, so a slow client never holds writers
+back, and idle subscribers cost nothing but their queue.
+
+On Postgres the events are sent with `NOTIFY` in the write's transaction
+instead, and every worker `LISTEN`s and publishes them to its own
+subscribers, so the clients of any worker get every write.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+from infraestructure.crud.base import encode
+
+CHANGE_FEED_QUEUE_SIZE = int(os.getenv("CHANGE_FEED_QUEUE_SIZE", "100"))
+CHANGE_FEED_HEARTBEAT_SECONDS = float(
+    os.getenv("CHANGE_FEED_HEARTBEAT_SECONDS", "15")
+)
+CHANGE_FEED_CHANNEL = os.getenv("CHANGE_FEED_CHANNEL", "todo_changes")
+
+PENDING = "change_feed_pending"
+# Postgres refuses NOTIFY payloads of 8000 bytes or more.
+NOTIFY_LIMIT = 7900
+CLOSING = {"resync", "list_deleted"}
+
+log = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    The events of a Todo List waiting to be sent to one client.
+
+    Attributes:
+        list_id: The id of the Todo List.
+        queue: The events not sent yet.
+        dropped: Whether the client fell behind and was unsubscribed.
+    """
+
+    def __init__(self, list_id: str, size: int):
+        self.list_id = list_id
+        self.queue: asyncio.Queue = asyncio.Queue(size)
+        self.dropped = False
+
+    def put(self, event: dict) -> bool:
+        """
+        Queue an event, or replace the backlog with a `resync` event when
+        the queue is full.
+
+        Returns:
+            Whether the event was queued.
+        """
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            self.dropped = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync", "list_id": self.list_id})
+            return False
+
+    async def events(
+        self, heartbeat: Optional[float] = None
+    ) -> AsyncIterator[Optional[dict]]:
+        """
+        Iterate the events as they come, until one closes the feed.
+
+        Yields None after `heartbeat` seconds without events, for the
+        caller to keep the connection alive.
+        """
+        if heartbeat is None:
+            heartbeat = CHANGE_FEED_HEARTBEAT_SECONDS
+        while True:
+            try:
+                event = await asyncio.wait_for(self.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            yield event
+            if event["type"] in CLOSING:
+                return
+
+
+class ChangeFeed:
+    """
+    In-process publish/subscribe of the events of Todo Lists.
+
+    Subscriptions are made on the event loop; events can be published from
+    any thread and are handed to the loop.
+
+    Attributes:
+        queue_size: The events a subscriber can fall behind.
+        subscribers: The subscriptions, by Todo List id.
+        published: The events delivered to subscribers.
+        dropped: The subscribers dropped for falling behind.
+    """
+
+    def __init__(self, queue_size: int = CHANGE_FEED_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers: Dict[str, Set[Subscription]] = {}
+        self.published = 0
+        self.dropped = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def subscribe(self, list_id: Any) -> Subscription:
+        """
+        Subscribe to the events of a Todo List.
+        """
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(str(list_id), self.queue_size)
+        self.subscribers.setdefault(subscription.list_id, set()).add(
+            subscription
+        )
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self.subscribers.get(subscription.list_id, set())
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            self.subscribers.pop(subscription.list_id, None)
+
+    def publish(self, events: List[dict]):
+        """
+        Send events to the subscribers of their Todo Lists.
+        """
+        loop = self._loop
+        if not self.subscribers or loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(events)
+            return
+        try:
+            loop.call_soon_threadsafe(self._deliver, events)
+        except RuntimeError:
+            # The loop is closed, so nobody is subscribed anymore.
+            pass
+
+    def _deliver(self, events: List[dict]):
+        for change in events:
+            subscriptions = self.subscribers.get(change["list_id"], ())
+            for subscription in list(subscriptions):
+                if subscription.put(change):
+                    self.published += 1
+                else:
+                    self.dropped += 1
+                    self.unsubscribe(subscription)
+
+    def stats(self) -> dict:
+        return {
+            "lists": len(self.subscribers),
+            "subscribers": sum(map(len, self.subscribers.values())),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+
+change_feed = ChangeFeed()
+
+
+def notifies(db: Session) -> bool:
+    """
+    Tell whether the events of a session go through Postgres `NOTIFY`.
+    """
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def listened(db: Session) -> bool:
+    """
+    Tell whether anyone may receive the events of a session, so writes
+    skip building events nobody reads.
+    """
+    return bool(change_feed.subscribers) or notifies(db)
+
+
+def record(db: Session, events: List[dict]):
+    """
+    Record events in the transaction of a write, to be published when it
+    commits.
+
+    Args:
+        db: The database session.
+        events: The events, each with a `type` and a `list_id`.
+    """
+    if not events:
+        return
+    if not notifies(db):
+        db.info.setdefault(PENDING, []).extend(events)
+        return
+    db.execute(
+        text(
+            "SELECT pg_notify(:channel, payload) "
+            "FROM unnest(CAST(:payloads AS text[])) AS payload"
+        ),
+        {
+            "channel": CHANGE_FEED_CHANNEL,
+            "payloads": [payload(change) for change in events],
+        },
+    )
+
+
+def payload(event: dict) -> str:
+    """
+    Encode an event for `NOTIFY`, leaving the row out if it is too long.
+    """
+    value = json.dumps(event)
+    if len(value.encode()) < NOTIFY_LIMIT:
+        return value
+    return json.dumps({key: event[key] for key in event if key != "data"})
+
+
+def written(db_obj: Any, list_id: UUID, prefix: str = "") -> dict:
+    """
+    Build the event of a written row: created, updated or deleted, told
+    apart like the counters of `CRUDTodo.on_write` are.
+    """
+    if not db_obj.is_active:
+        type = "deleted"
+    elif db_obj.version == 1:
+        type = "created"
+    else:
+        type = "updated"
+    return {
+        "type": prefix + type,
+        "list_id": str(list_id),
+        "data": encode(db_obj),
+    }
+
+
+@event.listens_for(Session, "after_commit")
+def publish_pending(session: Session):
+    events = session.info.pop(PENDING, None)
+    if events:
+        change_feed.publish(events)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_pending(session: Session):
+    session.info.pop(PENDING, None)
+
+
+async def listen(
+    engine: AsyncEngine, feed: ChangeFeed = change_feed, retry: float = 1.0
+):
+    """
+    Publish the events `NOTIFY`ed on Postgres to the subscribers of this
+    worker, until cancelled.
+
+    Holds one connection of the engine's pool, and reconnects when it is
+    lost.
+    """
+
+    def received(connection, pid, channel, value):
+        feed.publish([json.loads(value)])
+
+    while True:
+        try:
+            async with engine.connect() as connection:
+                raw = await connection.get_raw_connection()
+                driver = raw.driver_connection
+                lost = asyncio.Event()
+                driver.add_termination_listener(lambda _: lost.set())
+                await driver.add_listener(CHANGE_FEED_CHANNEL, received)
+                try:
+                    await lost.wait()
+                finally:
+                    if not driver.is_closed():
+                        await driver.remove_listener(
+                            CHANGE_FEED_CHANNEL, received
+                        )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception("Listening to the change feed failed")
+        await asyncio.sleep(retry)
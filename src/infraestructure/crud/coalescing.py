@@ -0,0 +1,224 @@
+"""
+This file contains the write-behind buffer of Todo updates.
+
+Rapid updates of the same Todos, such as completion toggles, are held for a
+few milliseconds, merged per Todo and written by one transaction instead of
+one commit per request. It is off unless `WRITE_COALESCING_WINDOW_MS` is set.
+
+`WRITE_COALESCING_ACK` trades durability for latency: with `commit`, an
+update is answered once its batch is committed, so nothing acknowledged is
+lost, at the cost of up to one window of latency; with `buffer`, it is
+answered as soon as it is buffered, and a crash loses up to one window of
+acknowledged updates.
+"""
+
+import asyncio
+import os
+from enum import Enum
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Collection,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+from uuid import UUID
+
+WRITE_COALESCING_WINDOW_MS = float(os.getenv("WRITE_COALESCING_WINDOW_MS", "0"))
+WRITE_COALESCING_MAX_BATCH = int(os.getenv("WRITE_COALESCING_MAX_BATCH", "500"))
+WRITE_COALESCING_ACK = os.getenv("WRITE_COALESCING_ACK", "commit")
+
+# A buffered update is keyed by the Todo List id and the Todo id.
+Key = Tuple[UUID, UUID]
+Flush = Callable[[Dict[Key, dict]], Awaitable[Dict[Key, Any]]]
+
+
+def covers(key: Key, ids: Collection[UUID]) -> bool:
+    """
+    Tell whether a buffered update is of one of the Todo Lists or Todos.
+    """
+    return key[0] in ids or key[1] in ids
+
+
+class AckMode(str, Enum):
+    """
+    When a buffered update is answered.
+
+    commit: once the batch holding it is committed.
+    buffer: as soon as it is buffered.
+    """
+
+    commit = "commit"
+    buffer = "buffer"
+
+
+class UpdateCoalescer:
+    """
+    Buffer updates per key and write them in batches.
+
+    Updates of the same key are merged, later values winning. A batch is
+    written when the first of its updates has waited `window_ms`, or once
+    it holds `max_batch` keys; batches are written one at a time, in order.
+
+    Attributes:
+        window_ms: How long an update may wait, 0 to disable buffering.
+        max_batch: The number of keys that triggers an early write.
+        ack: When a buffered update is answered.
+        updates: The updates buffered.
+        written: The updates written.
+        flushes: The batches written.
+        rows: The keys written, after merging.
+        failures: The batches whose write failed.
+    """
+
+    def __init__(
+        self,
+        flush: Flush,
+        window_ms: float = WRITE_COALESCING_WINDOW_MS,
+        max_batch: int = WRITE_COALESCING_MAX_BATCH,
+        ack: AckMode = AckMode(WRITE_COALESCING_ACK),
+    ):
+        """
+        Initialize the buffer.
+
+        Args:
+            flush: Writes a batch in one transaction and returns the written
+                rows by key.
+        """
+        self.flush = flush
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+        self.ack = ack
+        self.updates = 0
+        self.written = 0
+        self.flushes = 0
+        self.rows = 0
+        self.failures = 0
+        self._pending: Dict[Key, dict] = {}
+        self._pending_updates = 0
+        self._waiters: Dict[Key, List[asyncio.Future]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight: Dict[asyncio.Task, Dict[Key, dict]] = {}
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_ms > 0
+
+    def pending(self, key: Key) -> Optional[dict]:
+        """
+        Return the values buffered for a key, if any.
+        """
+        return self._pending.get(key)
+
+    async def submit(self, key: Key, values: dict) -> Optional[Any]:
+        """
+        Buffer an update.
+
+        Args:
+            key: The Todo List id and the Todo id.
+            values: The values to set.
+
+        Returns:
+            With `commit` acknowledgements, the written row, or None if no
+            row matched; with `buffer` ones, None right away.
+        """
+        loop = asyncio.get_running_loop()
+        self._pending.setdefault(key, {}).update(values)
+        self.updates += 1
+        self._pending_updates += 1
+        future = None
+        if self.ack is AckMode.commit:
+            future = loop.create_future()
+            self._waiters.setdefault(key, []).append(future)
+        if len(self._pending) >= self.max_batch:
+            self.flush_now()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000, self.flush_now)
+        return None if future is None else await future
+
+    def flush_now(self) -> Optional[asyncio.Task]:
+        """
+        Start writing the buffered updates without waiting for the window.
+
+        Returns:
+            The task writing them, or None if nothing was buffered.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return None
+        batch, waiters = self._pending, self._waiters
+        updates = self._pending_updates
+        self._pending, self._waiters, self._pending_updates = {}, {}, 0
+        task = asyncio.ensure_future(self._write(batch, updates, waiters))
+        self._in_flight[task] = batch
+        task.add_done_callback(lambda task: self._in_flight.pop(task, None))
+        return task
+
+    async def settle(self, ids: Optional[Collection[UUID]] = None):
+        """
+        Write the buffered updates and wait for the batches in flight, so
+        the reads and writes that follow see them.
+
+        Args:
+            ids: The Todo List or Todo ids read, to only wait for updates
+                of those; every update when None.
+        """
+        if ids is None or any(covers(key, ids) for key in self._pending):
+            self.flush_now()
+        tasks = [
+            task
+            for task, batch in self._in_flight.items()
+            if ids is None or any(covers(key, ids) for key in batch)
+        ]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _write(
+        self,
+        batch: Dict[Key, dict],
+        updates: int,
+        waiters: Dict[Key, List[asyncio.Future]],
+    ):
+        """
+        Write a batch and answer the updates waiting for it.
+        """
+        async with self._lock:
+            try:
+                rows = await self.flush(batch)
+            except Exception as exc:
+                self.failures += 1
+                for futures in waiters.values():
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(exc)
+                return
+        self.flushes += 1
+        self.written += updates
+        self.rows += len(batch)
+        for key, futures in waiters.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(rows.get(key))
+
+    def stats(self) -> dict:
+        """
+        Return the counters, with the commits saved by merging updates.
+        """
+        return {
+            "enabled": self.enabled,
+            "ack": self.ack.value,
+            "window_ms": self.window_ms,
+            "updates": self.updates,
+            "written": self.written,
+            "flushes": self.flushes,
+            "rows": self.rows,
+            "failures": self.failures,
+            "commits_saved": self.written - self.flushes,
+            "pending": len(self._pending),
+        }
@@ -0,0 +1,106 @@
+"""
+This file contains the helpers to count the rows behind a collection.
+"""
+
+import os
+import threading
+import time
+from enum import Enum
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlmodel import Session
+
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "30"))
+
+
+class CountMode(str, Enum):
+    """
+    How the total of a collection is computed.
+
+    exact: a `SELECT count(*)` with the same filters as the page.
+    estimated: the planner's row estimate on Postgres, exact elsewhere.
+    cached: an exact count reused for `COUNT_CACHE_TTL` seconds.
+    """
+
+    exact = "exact"
+    estimated = "estimated"
+    cached = "cached"
+
+
+class CountCache:
+    """
+    A small in-process cache of counts, expired by age and by table writes.
+    """
+
+    def __init__(self, ttl: float = COUNT_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, Hashable], Tuple[float, int]] = {}
+
+    def get(self, table: str, key: Hashable) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get((table, key))
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[(table, key)]
+                return None
+            return value
+
+    def set(self, table: str, key: Hashable, value: int):
+        with self._lock:
+            self._entries[(table, key)] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, table: str):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == table]:
+                del self._entries[key]
+
+
+count_cache = CountCache()
+
+
+def exact_count(db: Session, statement: Any) -> int:
+    """
+    Count the rows matched by a select statement.
+    """
+    subquery = statement.order_by(None).subquery()
+    count_statement = select(func.count()).select_from(subquery)
+    return db.execute(count_statement).scalar_one()
+
+
+def estimated_count(db: Session, statement: Any) -> int:
+    """
+    Ask the Postgres planner how many rows a select statement matches.
+
+    Other backends have no cheap estimate, so they get an exact count.
+    """
+    bind = db.get_bind()
+    if bind.dialect.name != "postgresql":
+        return exact_count(db, statement)
+
+    compiled = statement.order_by(None).compile(dialect=bind.dialect)
+    params: Any = compiled.params
+    if compiled.positional:
+        params = tuple(compiled.params[key] for key in compiled.positiontup)
+    plan = (
+        db.connection()
+        .exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled.string}", params)
+        .scalar_one()
+    )
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def cached_count(db: Session, statement: Any, table: str) -> int:
+    """
+    Count the rows matched by a select statement, reusing a recent count.
+    """
+    compiled = statement.order_by(None).compile()
+    key = (str(compiled), tuple(sorted(compiled.params.items())))
+    value = count_cache.get(table, key)
+    if value is None:
+        value = exact_count(db, statement)
+        count_cache.set(table, key, value)
+    return value
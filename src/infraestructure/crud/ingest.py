@@ -0,0 +1,73 @@
+"""
+This file contains the fastest way each database has to load many rows.
+
+Postgres loads them with `COPY ... FROM STDIN`, through asyncpg's binary
+copy on the asyncio engine or psycopg2's `copy_expert` on the sync one.
+Other databases get a plain `INSERT` run with `executemany`, with search
+indexing deferred to the end of the load.
+"""
+
+import io
+from typing import Any, Dict, List
+
+from sqlalchemy import Table, insert
+from sqlalchemy.util import await_only
+from sqlmodel import Session
+
+from infraestructure.crud.search import search_backend
+
+COPY_ESCAPES = str.maketrans(
+    {"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"}
+)
+
+
+def copy_text(value: Any) -> str:
+    """
+    Encode a value for the text format of `COPY`.
+    """
+    if value is None:
+        return "\\N"
+    return str(value).translate(COPY_ESCAPES)
+
+
+def copy_rows(db: Session, table: Table, rows: List[Dict[str, Any]]):
+    """
+    Load rows into a table in the session's transaction.
+
+    Args:
+        db: The database session.
+        table: The table to load.
+        rows: The rows, every one holding the same columns.
+    """
+    if not rows:
+        return
+    connection = db.connection()
+    columns = list(rows[0])
+    if connection.dialect.name != "postgresql":
+        search = search_backend(connection.dialect.name)
+        with search.bulk_load(connection, table.name):
+            connection.execute(insert(table), rows)
+        return
+
+    driver_connection = connection.connection.driver_connection
+    if connection.dialect.driver == "asyncpg":
+        await_only(
+            driver_connection.copy_records_to_table(
+                table.name,
+                records=[
+                    tuple(row[column] for column in columns) for row in rows
+                ],
+                columns=columns,
+            )
+        )
+        return
+
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(copy_text(row[column]) for column in columns))
+        buffer.write("\n")
+    buffer.seek(0)
+    with driver_connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN", buffer
+        )
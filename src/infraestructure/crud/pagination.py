@@ -0,0 +1,96 @@
+"""
+This file contains the helpers for keyset (cursor) pagination.
+"""
+
+import base64
+import json
+from typing import Any, List, Sequence
+
+from sqlalchemy import and_, or_
+
+
+class InvalidCursorError(ValueError):
+    """
+    Raised when a pagination cursor cannot be decoded.
+    """
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Encode the sort key values of the last row of a page as an opaque cursor.
+
+    Args:
+        values: The values of the sort key columns, in order.
+
+    Returns:
+        A url-safe cursor string.
+    """
+    payload = json.dumps(
+        [value if isinstance(value, bool) else str(value) for value in values],
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence[Any]) -> List[Any]:
+    """
+    Decode a cursor into values typed after the given sort key columns.
+
+    Args:
+        cursor: The cursor returned by a previous page.
+        columns: The sort key columns the cursor was built from.
+
+    Returns:
+        The sort key values of the last row of the previous page.
+    """
+    return decode_values(
+        cursor, [column.type.python_type for column in columns]
+    )
+
+
+def decode_values(cursor: str, types: Sequence[type]) -> List[Any]:
+    """
+    Decode a cursor into values of the given types, in order.
+
+    Raises:
+        InvalidCursorError: The cursor does not hold values of the types.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(raw, list) or len(raw) != len(types):
+            raise InvalidCursorError("Invalid cursor")
+        values = []
+        for python_type, value in zip(types, raw):
+            if not isinstance(value, python_type):
+                value = python_type(value)
+            values.append(value)
+        return values
+    except InvalidCursorError:
+        raise
+    except (TypeError, ValueError) as exc:
+        raise InvalidCursorError("Invalid cursor") from exc
+
+
+def keyset_after(columns: Sequence[Any], values: Sequence[Any]):
+    """
+    Build the predicate that seeks past the given sort key values.
+
+    The predicate is the expanded form of ``(a, b) > (x, y)`` so it works on
+    every backend and can still be served by an index on the sort key.
+
+    Args:
+        columns: The sort key columns, in ascending order.
+        values: The sort key values of the last row already returned.
+
+    Returns:
+        A SQL expression matching the rows after the given values.
+    """
+    clauses = []
+    for index, (column, value) in enumerate(zip(columns, values)):
+        equals = [
+            previous == previous_value
+            for previous, previous_value in zip(columns[:index], values[:index])
+        ]
+        clauses.append(and_(*equals, column > value))
+    return or_(*clauses)
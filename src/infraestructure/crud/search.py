@@ -0,0 +1,241 @@
+"""
+This file contains the search backends behind the `name` filters.
+
+Searchable columns are flagged on the models with
+`sa_column_kwargs={"info": {"search": True}}`. Each backend creates the
+structures it needs for them in `setup` and turns a search term into a
+filter plus a rank to order by in `apply`.
+"""
+
+import os
+from contextlib import contextmanager
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import Float, column, literal_column, table, text
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import SQLModel
+
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+
+
+def searchable_column(model: Any) -> Optional[Any]:
+    """
+    Return the searchable column of a model, if it has one.
+    """
+    for table_column in model.__table__.columns:
+        if table_column.info.get("search"):
+            return getattr(model, table_column.name)
+    return None
+
+
+def searchable_columns() -> List[Tuple[str, str]]:
+    """
+    Return the (table, column) pairs flagged as searchable.
+    """
+    return [
+        (model_table.name, table_column.name)
+        for model_table in SQLModel.metadata.sorted_tables
+        for table_column in model_table.columns
+        if table_column.info.get("search")
+    ]
+
+
+class LikeSearch:
+    """
+    Plain case-insensitive substring search, without ranking.
+    """
+
+    def setup(self, connection: Connection):
+        """
+        Create the structures the backend needs, nothing for this one.
+        """
+
+    @contextmanager
+    def bulk_load(self, connection: Connection, table_name: str):
+        """
+        Load many rows into a table, indexing them for search at the end.
+
+        Nothing needs deferring for this one.
+        """
+        yield
+
+    def apply(self, statement: Any, search_column: Any, term: str):
+        """
+        Filter a select statement by a search term.
+
+        Args:
+            statement: The select statement to filter.
+            search_column: The model column to search in.
+            term: The search term.
+
+        Returns:
+            The filtered statement and the rank to order by, if any.
+        """
+        return statement.where(search_column.ilike(f"%{term}%")), None
+
+
+class TrigramSearch(LikeSearch):
+    """
+    Postgres substring search served by `pg_trgm` GIN indexes.
+
+    The GIN index answers the `ILIKE '%term%'` filter and results are ranked
+    by trigram distance to the term, closest first.
+    """
+
+    def setup(self, connection: Connection):
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        for table_name, column_name in searchable_columns():
+            connection.execute(
+                text(
+                    f"CREATE INDEX IF NOT EXISTS "
+                    f"ix_{table_name}_{column_name}_trgm ON {table_name} "
+                    f"USING gin ({column_name} gin_trgm_ops)"
+                )
+            )
+
+    def apply(self, statement: Any, search_column: Any, term: str):
+        statement, _ = super().apply(statement, search_column, term)
+        rank = search_column.op("<->", return_type=Float)(term)
+        return statement, rank
+
+
+class Fts5Search(LikeSearch):
+    """
+    SQLite substring search served by FTS5 trigram tables.
+
+    Each searchable column gets an external content `<table>_fts` table keyed
+    by the rowid of the source table and kept in sync by triggers. Results
+    are ranked by bm25, best first. Terms shorter than a trigram fall back
+    to a plain substring search.
+
+    Rowids of tables without an integer primary key may change on VACUUM,
+    so call `rebuild` after vacuuming the database.
+    """
+
+    def setup(self, connection: Connection):
+        for table_name, column_name in searchable_columns():
+            fts = f"{table_name}_fts"
+            exists = connection.execute(
+                text(
+                    "SELECT 1 FROM sqlite_master "
+                    "WHERE type = 'table' AND name = :name"
+                ),
+                {"name": fts},
+            ).first()
+            connection.execute(
+                text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                    f"{column_name}, content='{table_name}', "
+                    f"content_rowid='rowid', tokenize='trigram')"
+                )
+            )
+            for statement in (
+                self.insert_trigger(table_name, column_name),
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad "
+                f"AFTER DELETE ON {table_name} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {column_name}) "
+                f"VALUES ('delete', old.rowid, old.{column_name}); END",
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_au "
+                f"AFTER UPDATE OF {column_name} ON {table_name} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {column_name}) "
+                f"VALUES ('delete', old.rowid, old.{column_name}); "
+                f"INSERT INTO {fts}(rowid, {column_name}) "
+                f"VALUES (new.rowid, new.{column_name}); END",
+            ):
+                connection.execute(text(statement))
+            if not exists:
+                self.rebuild(connection, fts)
+
+    def insert_trigger(self, table_name: str, column_name: str) -> str:
+        """
+        Build the trigger indexing the rows inserted into a table.
+        """
+        fts = f"{table_name}_fts"
+        return (
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai "
+            f"AFTER INSERT ON {table_name} BEGIN "
+            f"INSERT INTO {fts}(rowid, {column_name}) "
+            f"VALUES (new.rowid, new.{column_name}); END"
+        )
+
+    @contextmanager
+    def bulk_load(self, connection: Connection, table_name: str):
+        """
+        Load many rows into a table, indexing them for search at the end.
+
+        Indexing rows one by one from the insert trigger costs several times
+        the insert itself, so the trigger is dropped for the load and the new
+        rows, the ones past the last rowid, are indexed in one statement.
+        SQLite has a single writer and DDL is transactional, so no other
+        insert can miss the trigger.
+        """
+        columns = [
+            column_name
+            for name, column_name in searchable_columns()
+            if name == table_name
+        ]
+        if not columns:
+            yield
+            return
+        column_name = columns[0]
+        fts = f"{table_name}_fts"
+        last_rowid = connection.execute(
+            text(f"SELECT coalesce(max(rowid), 0) FROM {table_name}")
+        ).scalar()
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {fts}_ai"))
+        yield
+        connection.execute(
+            text(
+                f"INSERT INTO {fts}(rowid, {column_name}) "
+                f"SELECT rowid, {column_name} FROM {table_name} "
+                f"WHERE rowid > :last_rowid"
+            ),
+            {"last_rowid": last_rowid},
+        )
+        connection.execute(text(self.insert_trigger(table_name, column_name)))
+
+    def rebuild(self, connection: Connection, fts: str):
+        """
+        Rebuild a FTS5 table from its source table.
+        """
+        connection.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+    def apply(self, statement: Any, search_column: Any, term: str):
+        if len(term) < 3:
+            return super().apply(statement, search_column, term)
+
+        table_name = search_column.property.columns[0].table.name
+        fts = table(f"{table_name}_fts", column("rowid"), column("rank", Float))
+        statement = statement.join(
+            fts, fts.c.rowid == literal_column(f"{table_name}.rowid")
+        ).where(
+            literal_column(fts.name).op("MATCH")(
+                '"' + term.replace('"', '""') + '"'
+            )
+        )
+        return statement, fts.c.rank
+
+
+BACKENDS = {
+    "postgresql": TrigramSearch,
+    "sqlite": Fts5Search,
+}
+
+
+def search_backend(dialect_name: str) -> LikeSearch:
+    """
+    Return the search backend for a database dialect.
+
+    Set SEARCH_BACKEND=like to always use plain substring search.
+    """
+    if SEARCH_BACKEND == "like":
+        return LikeSearch()
+    return BACKENDS.get(dialect_name, LikeSearch)()
+
+
+def setup_search(engine: Engine):
+    """
+    Create the search structures of the engine's backend.
+    """
+    with engine.begin() as connection:
+        search_backend(engine.dialect.name).setup(connection)
@@ -2,14 +2,74 @@
 This file contains the CRUD operations for the Todo.
 """
 
+import json
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
 from uuid import UUID
 
-from fastapi.encoders import jsonable_encoder
+from sqlalchemy import Row, and_, func, inspect, update
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from domain.models.archive import todo_archive
 from domain.models.todo import Todo
+from domain.models.todo_list import TodoList
 from domain.schemas.todo import TodoCreate, TodoUpdate
-from infraestructure.crud.base import CRUDBase
+from infraestructure.crud.base import (
+    BULK_BATCH_SIZE,
+    AsyncCRUDBase,
+    CRUDBase,
+    StaleVersionError,
+    deleted_values,
+    encode,
+)
+from infraestructure.crud import changes
+from infraestructure.crud.cache import read_cache
+from infraestructure.crud.coalescing import AckMode, Key, UpdateCoalescer
+from infraestructure.crud.counting import CountMode
+from infraestructure.crud.ingest import copy_rows
+from infraestructure.crud.pagination import (
+    decode_values,
+    encode_cursor,
+    keyset_after,
+)
+from infraestructure.db.database import async_flush_engine
+
+COMPLETED_BEFORE = "todo_completed_before"
+EMBED_LIMIT = 10
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FIELDS = ("id", "title", "description", "is_completed")
+CHANGES_LIMIT = 500
+NIL_UUID = UUID(int=0)
+# A change token holds a change sequence, an id and a time in seconds.
+TOKEN_TYPES = (int, UUID, float)
+
+
+def next_change_seq() -> Any:
+    """
+    Build the change sequence of a Todo written by an UPDATE: the version
+    `bump_lists` gives its list at the end of the write.
+
+    The list row is read locked, so on Postgres concurrent writes to a list
+    wait for each other and get increasing sequences, in commit order;
+    SQLite writes one transaction at a time anyway.
+    """
+    todo_list = aliased(TodoList)
+    return (
+        select(todo_list.todos_version + 1)
+        .where(todo_list.id == Todo.list_id)
+        .with_for_update()
+        .scalar_subquery()
+    )
+
+
+class ExpiredTokenError(ValueError):
+    """
+    Raised when a change token is older than the purge of deleted Todos, so
+    deletions since may be missing.
+    """
 
 
 class CRUDTodo(CRUDBase[Todo, TodoCreate, TodoUpdate]):
@@ -21,10 +81,12 @@ class CRUDTodo(CRUDBase[Todo, TodoCreate, TodoUpdate]):
         """
         Create a new Todo.
         """
-        obj_in_data = jsonable_encoder(obj_in)
+        obj_in_data = self.input_data(obj_in)
         db_obj = self.model(**obj_in_data, list_id=todo_list_id)
         db.add(db_obj)
+        self.on_write(db, db_obj)
         db.commit()
+        self.invalidate(db_obj)
         db.refresh(db_obj)
         return db_obj
 
@@ -34,18 +96,513 @@ class CRUDTodo(CRUDBase[Todo, TodoCreate, TodoUpdate]):
         todo_list_id: UUID,
         name: str = None,
         order_by_completed: bool = False,
+        alive_only: bool = True,
+        skip: int = 0,
+        limit: int = 100,
+        after: Optional[str] = None,
+        count: CountMode = CountMode.exact,
+        fields: Optional[Sequence[str]] = None,
     ) -> list[Todo]:
         """
         Get all Todos by Todo List ID, with optional name filter and ordering by is_completed.
+
+        Pages with an offset, or seeks past `after` when a cursor is given.
+        Matches of `name` are ranked by the search backend. With `fields`,
+        only those columns are selected and rows are returned as dicts.
         """
-        statement = select(self.model).where(self.model.list_id == todo_list_id)
+        statement = self.select_fields(fields).where(
+            self.model.list_id == todo_list_id
+        )
+        if alive_only:
+            statement = statement.where(
+                self.model.is_active == True  # noqa E712
+            )
+        sort_keys = [self.model.is_completed] if order_by_completed else []
         if name:
-            statement = statement.where(self.model.title.ilike(f"%{name}%"))
-        if order_by_completed:
-            statement = statement.order_by(self.model.is_completed)
-        results = db.exec(statement).all()
-        total = len(results)
-        return {"total": total, "data": results}
+            statement, rank = self.search(db, statement, name)
+            sort_keys += rank
+        results, next_cursor = self.paginate(
+            db,
+            statement,
+            skip=skip,
+            limit=limit,
+            after=after,
+            sort_keys=sort_keys,
+        )
+        total = self.count(db, statement, mode=count)
+        return {"total": total, "data": results, "next_cursor": next_cursor}
+
+    def get_by_list_ids(
+        self,
+        db: Session,
+        todo_list_ids: Sequence[UUID],
+        limit: int = EMBED_LIMIT,
+        is_completed: Optional[bool] = None,
+    ) -> Dict[UUID, List[Todo]]:
+        """
+        Get the first active Todos of many Todo Lists in one statement.
+
+        The Todos are numbered per list with `ROW_NUMBER() OVER (PARTITION
+        BY list_id)` in id order, and only the first `limit` of each list
+        are read, so the statement stays the same however many lists are
+        asked for.
+
+        Args:
+            db: The database session.
+            todo_list_ids: The ids of the Todo Lists.
+            limit: The most Todos to read per list.
+            is_completed: Only read the completed or the pending Todos.
+
+        Returns:
+            The Todos in id order, by Todo List id.
+        """
+        todos = {todo_list_id: [] for todo_list_id in todo_list_ids}
+        if not todos:
+            return todos
+        filters = [
+            self.model.list_id.in_(todos),
+            self.model.is_active == True,  # noqa E712
+        ]
+        if is_completed is not None:
+            filters.append(self.model.is_completed == is_completed)
+        rank = (
+            func.row_number()
+            .over(partition_by=self.model.list_id, order_by=self.model.id)
+            .label("rank")
+        )
+        ranked = select(self.model, rank).where(*filters).subquery()
+        todo = aliased(self.model, ranked)
+        statement = (
+            select(todo)
+            .where(ranked.c.rank <= limit)
+            .order_by(ranked.c.list_id, ranked.c.rank)
+        )
+        for db_obj in db.exec(statement):
+            todos[db_obj.list_id].append(db_obj)
+        return todos
+
+    def on_write(self, db: Session, *db_objs: Todo):
+        """
+        Bump the collection version and the counters of the written Todos'
+        lists, stamp the Todos with the new version, and record their events
+        for the change feed.
+
+        New Todos (version 1) are counted in and removed ones counted out.
+        Updated Todos move the completed counter by their change of
+        `is_completed`, compared with the value recorded by `_bulk_set` or
+        kept in the attribute history.
+        """
+        completed_before = db.info.pop(COMPLETED_BEFORE, {})
+        deltas = {}
+        for db_obj in db_objs:
+            total, completed = deltas.get(db_obj.list_id, (0, 0))
+            if not db_obj.is_active:
+                total -= 1
+                completed -= db_obj.is_completed
+            elif db_obj.version == 1:
+                total += 1
+                completed += db_obj.is_completed
+            else:
+                history = inspect(db_obj).attrs.is_completed.history
+                was_completed = completed_before.get(
+                    db_obj.id, (history.deleted or [db_obj.is_completed])[0]
+                )
+                completed += db_obj.is_completed - was_completed
+            deltas[db_obj.list_id] = (total, completed)
+        self.stamp(db, self.bump_lists(db, deltas), db_objs)
+        if changes.listened(db):
+            events = [
+                changes.written(db_obj, db_obj.list_id) for db_obj in db_objs
+            ]
+            changes.record(db, events)
+
+    def bump_lists(self, db: Session, deltas: dict):
+        """
+        Bump the collection version of Todo Lists and move their counters.
+
+        Args:
+            db: The database session.
+            deltas: The (total, completed) changes, by Todo List id.
+
+        Returns:
+            The new collection versions, by Todo List id.
+        """
+        groups = {}
+        for list_id, delta in deltas.items():
+            groups.setdefault(delta, []).append(list_id)
+        versions = {}
+        for (total, completed), list_ids in groups.items():
+            versions.update(
+                db.execute(
+                    update(TodoList)
+                    .where(TodoList.id.in_(list_ids))
+                    .values(
+                        todos_version=TodoList.todos_version + 1,
+                        todos_total=TodoList.todos_total + total,
+                        todos_completed=TodoList.todos_completed + completed,
+                    )
+                    .returning(TodoList.id, TodoList.todos_version)
+                    .execution_options(synchronize_session=False)
+                ).all()
+            )
+        return versions
+
+    def stamp(self, db: Session, versions: dict, db_objs: Sequence[Todo]):
+        """
+        Set the change sequence of written Todos to the new collection
+        version of their lists, unless their statement already did, see
+        `next_change_seq`.
+
+        The version is read back from the bump, which locks the list row
+        until commit, so later writes to a list always get a higher
+        sequence. Todos still to be flushed get it with their other changes;
+        the ones already written are stamped with one UPDATE per list.
+        """
+        written = {}
+        for db_obj in db_objs:
+            change_seq = versions.get(db_obj.list_id)
+            if change_seq is None or db_obj.change_seq == change_seq:
+                continue
+            if inspect(db_obj).persistent and not db.is_modified(db_obj):
+                set_committed_value(db_obj, "change_seq", change_seq)
+                written.setdefault(change_seq, []).append(db_obj.id)
+            else:
+                db_obj.change_seq = change_seq
+        for change_seq, ids in written.items():
+            for start in range(0, len(ids), BULK_BATCH_SIZE):
+                db.execute(
+                    update(self.model)
+                    .where(
+                        self.model.id.in_(ids[start : start + BULK_BATCH_SIZE])
+                    )
+                    .values(change_seq=change_seq)
+                    .execution_options(synchronize_session=False)
+                )
+
+    def record_completed(self, db: Session, values: dict, *criteria: Any):
+        """
+        Record the Todos an update is about to complete or reopen.
+
+        Set-based updates only return the new values, so the Todos whose
+        `is_completed` will change are read first, for `on_write`. They are
+        locked until the update, so a concurrent one cannot count the same
+        change twice.
+        """
+        if "is_completed" not in values or not values.get("is_active", True):
+            return
+        statement = (
+            select(self.model.id)
+            .where(
+                self.model.is_active == True,  # noqa E712
+                self.model.is_completed != values["is_completed"],
+                *criteria,
+            )
+            .with_for_update()
+        )
+        completed_before = db.info.setdefault(COMPLETED_BEFORE, {})
+        for id in db.exec(statement):
+            completed_before[id] = not values["is_completed"]
+
+    def _bulk_set(
+        self,
+        db: Session,
+        ids: List[UUID],
+        values: dict,
+        filters: Sequence[Any],
+    ) -> List[Todo]:
+        """
+        Set the same values on many active Todos, recording completion
+        changes first, and stamp them with their change sequence.
+        """
+        self.record_completed(db, values, self.model.id.in_(ids), *filters)
+        values = {**values, "change_seq": next_change_seq()}
+        return super()._bulk_set(db, ids, values, filters)
+
+    def collection_version(
+        self, db: Session, todo_list_id: UUID
+    ) -> Optional[int]:
+        """
+        Get the version of the Todos of an active Todo List.
+
+        It changes whenever one of the list's Todos is written.
+
+        Returns:
+            The version, or None if the Todo List does not exist.
+        """
+        statement = select(TodoList.todos_version).where(
+            TodoList.id == todo_list_id,
+            TodoList.is_active == True,  # noqa E712
+        )
+        return db.exec(statement).first()
+
+    def invalidate(self, *db_objs: Todo):
+        """
+        Drop the cached counts and the cached reads of the written Todos'
+        lists.
+        """
+        self.invalidate_lists(*{db_obj.list_id for db_obj in db_objs})
+
+    def invalidate_lists(self, *todo_list_ids: UUID):
+        """
+        Drop the cached counts and the cached reads of Todo Lists' Todos.
+        """
+        super().invalidate()
+        for list_id in todo_list_ids:
+            read_cache.bump(self.cache_key("list", list_id))
+
+    def list_cache_key(self, todo_list_id: UUID, *parts) -> str:
+        """
+        Build a read cache key in the namespace of a Todo List.
+        """
+        namespace = read_cache.namespace(self.cache_key("list", todo_list_id))
+        return self.cache_key("list", todo_list_id, namespace, *parts)
+
+    def get_all_by_list_id_cached(
+        self, db: Session, todo_list_id: UUID, **kwargs
+    ) -> dict:
+        """
+        Get all Todos by Todo List ID through the read cache.
+
+        Takes the same filters as `get_all_by_list_id`. Without a cache,
+        the page is returned as loaded, not encoded for nothing.
+        """
+        if not read_cache.enabled:
+            return self.get_all_by_list_id(db, todo_list_id, **kwargs)
+        key = self.list_cache_key(
+            todo_list_id,
+            "all",
+            json.dumps(kwargs, sort_keys=True, default=str),
+        )
+        return read_cache.get_or_load(
+            key,
+            lambda: encode(self.get_all_by_list_id(db, todo_list_id, **kwargs)),
+        )
+
+    def get_in_list_cached(
+        self, db: Session, todo_list_id: UUID, todo_id: UUID
+    ) -> Tuple[bool, Optional[Todo]]:
+        """
+        Get an active Todo of a Todo List through the read cache.
+
+        Returns:
+            Whether the Todo List exists and the Todo, detached from the
+            session when cached.
+        """
+        if not read_cache.enabled:
+            return self.get_in_list(db, todo_list_id, todo_id)
+        key = self.list_cache_key(todo_list_id, todo_id)
+        found = True
+
+        def load():
+            nonlocal found
+            found, todo = self.get_in_list(db, todo_list_id, todo_id)
+            return encode(todo)
+
+        todo = read_cache.get_or_load(key, load)
+        return found, self.decode(todo)
+
+    def bulk_create(
+        self, db: Session, objs_in: List[TodoCreate], todo_list_id: UUID
+    ) -> List[Todo]:
+        """
+        Create many Todos in a Todo List in one transaction.
+        """
+        return super().bulk_create(db, objs_in, list_id=todo_list_id)
+
+    def import_rows(
+        self, db: Session, objs_in: List[TodoCreate], todo_list_id: UUID
+    ) -> int:
+        """
+        Load many Todos into a Todo List in one transaction.
+
+        Unlike `bulk_create`, nothing is returned from the database, so the
+        rows can be copied in with the fastest loader of the backend.
+
+        Returns:
+            The number of Todos loaded.
+        """
+        new_id = self.model.model_fields["id"].default_factory
+        defaults = {"is_active": True, "version": 1, "list_id": todo_list_id}
+        rows = [
+            {**defaults, **obj_in.model_dump(), "id": new_id()}
+            for obj_in in objs_in
+        ]
+        completed = sum(row["is_completed"] for row in rows)
+        versions = self.bump_lists(db, {todo_list_id: (len(rows), completed)})
+        for row in rows:
+            row["change_seq"] = versions.get(todo_list_id, 0)
+        copy_rows(db, self.model.__table__, rows)
+        changes.record(
+            db,
+            [
+                {
+                    "type": "imported",
+                    "list_id": str(todo_list_id),
+                    "data": {"count": len(rows)},
+                }
+            ],
+        )
+        db.commit()
+        self.invalidate_lists(todo_list_id)
+        return len(rows)
+
+    def bulk_update(
+        self,
+        db: Session,
+        objs_in: List[Tuple[UUID, TodoUpdate]],
+        todo_list_id: UUID,
+    ) -> List[Todo]:
+        """
+        Update many Todos of a Todo List in one transaction.
+        """
+        return super().bulk_update(
+            db, objs_in, filters=[self.model.list_id == todo_list_id]
+        )
+
+    def bulk_delete(
+        self, db: Session, ids: List[UUID], todo_list_id: UUID
+    ) -> List[Todo]:
+        """
+        Soft delete many Todos of a Todo List in one transaction.
+        """
+        return super().bulk_delete(
+            db, ids, filters=[self.model.list_id == todo_list_id]
+        )
+
+    def flush_updates(self, db: Session, batch: Dict[Key, dict]) -> dict:
+        """
+        Write merged updates of Todos in one transaction.
+
+        Todos of the same list receiving the same values are updated
+        together, one `UPDATE ... WHERE id IN (...) RETURNING` per group,
+        like `bulk_update`.
+
+        Args:
+            db: The database session.
+            batch: The values to set, by Todo List id and Todo id.
+
+        Returns:
+            The updated Todos, by Todo List id and Todo id. Active Todos of
+            active Todo Lists only.
+        """
+        groups = {}
+        for (todo_list_id, todo_id), values in batch.items():
+            key = (todo_list_id, tuple(sorted(values.items())))
+            groups.setdefault(key, []).append(todo_id)
+        updated = []
+        for (todo_list_id, values), ids in groups.items():
+            filters = [
+                self.model.list_id == todo_list_id,
+                select(TodoList.id)
+                .where(
+                    TodoList.id == todo_list_id,
+                    TodoList.is_active == True,  # noqa E712
+                )
+                .exists(),
+            ]
+            updated.extend(self._bulk_set(db, ids, dict(values), filters))
+        self.on_write(db, *updated)
+        db.commit()
+        self.invalidate(*updated)
+        return {(db_obj.list_id, db_obj.id): db_obj for db_obj in updated}
+
+    def get_changes(
+        self,
+        db: Session,
+        todo_list_id: UUID,
+        since: Optional[str] = None,
+        limit: int = CHANGES_LIMIT,
+    ) -> Optional[dict]:
+        """
+        Get the Todos of an active Todo List written since a change token.
+
+        Without a token, the active Todos are returned, from the start. The
+        token is the position, change sequence and id, of the last Todo
+        returned, and the time the client last caught up: deletions are
+        kept as inactive rows until purged, so a token older than the
+        purge horizon of the Todos is refused.
+
+        Args:
+            db: The database session.
+            todo_list_id: The id of the Todo List.
+            since: The token returned by the previous call, if any.
+            limit: The most Todos returned.
+
+        Returns:
+            The written Todos, the ids of the deleted ones, whether more
+            are left, and the token of the next call; or None if the Todo
+            List does not exist.
+
+        Raises:
+            InvalidCursorError: The token cannot be decoded.
+            ExpiredTokenError: The token is older than the purge.
+        """
+        now = time.time()
+        caught_up, after = now, (0, NIL_UUID)
+        if since is not None:
+            change_seq, id, caught_up = decode_values(since, TOKEN_TYPES)
+            purged_before = self.purged_before(db)
+            if purged_before and caught_up < purged_before.timestamp():
+                raise ExpiredTokenError("Change token expired")
+            after = (change_seq, id)
+        version = self.collection_version(db, todo_list_id)
+        if version is None:
+            return None
+
+        db_objs = []
+        if after[0] < version:
+            statement = self.changes_statement(todo_list_id, after, limit + 1)
+            if since is None:
+                statement = statement.where(
+                    self.model.is_active == True  # noqa E712
+                )
+            db_objs = db.exec(statement).all()
+        has_more = len(db_objs) > limit
+        db_objs = db_objs[:limit]
+        if db_objs:
+            after = (db_objs[-1].change_seq, db_objs[-1].id)
+        if not has_more:
+            caught_up = now
+        return {
+            "data": [db_obj for db_obj in db_objs if db_obj.is_active],
+            "deleted": [
+                db_obj.id for db_obj in db_objs if not db_obj.is_active
+            ],
+            "has_more": has_more,
+            "token": encode_cursor([*after, caught_up]),
+        }
+
+    def changes_statement(
+        self, todo_list_id: UUID, after: Tuple[int, UUID], limit: int
+    ) -> Any:
+        """
+        Build the query of a Todo List's Todos past a change position, in
+        change order, served by the change sequence index.
+        """
+        columns = (self.model.change_seq, self.model.id)
+        return (
+            select(self.model)
+            .where(
+                self.model.list_id == todo_list_id,
+                keyset_after(columns, after),
+            )
+            .order_by(*columns)
+            .limit(limit)
+        )
+
+    def export_statement(self, todo_list_id: UUID) -> Any:
+        """
+        Build the query of the exported fields of a Todo List's active
+        Todos, in primary key order.
+        """
+        return (
+            select(*(getattr(self.model, field) for field in EXPORT_FIELDS))
+            .where(
+                self.model.list_id == todo_list_id,
+                self.model.is_active == True,  # noqa E712
+            )
+            .order_by(self.model.id)
+        )
 
     def get_by_list_and_id(
         self, db: Session, todo_list_id: UUID, todo_id: UUID
@@ -58,5 +615,328 @@ class CRUDTodo(CRUDBase[Todo, TodoCreate, TodoUpdate]):
         )
         return db.exec(statement).one_or_none()
 
+    def list_exists(self, db: Session, todo_list_id: UUID) -> bool:
+        """
+        Check whether an active Todo List exists.
+        """
+        statement = select(TodoList.id).where(
+            TodoList.id == todo_list_id,
+            TodoList.is_active == True,  # noqa E712
+        )
+        return db.exec(statement).first() is not None
+
+    def get_in_list(
+        self, db: Session, todo_list_id: UUID, todo_id: UUID
+    ) -> Tuple[bool, Optional[Todo]]:
+        """
+        Get an active Todo and check its Todo List in one query.
+
+        The Todo List is outer joined to the Todo, so a missing list and a
+        missing Todo can be told apart from the same row.
+
+        Returns:
+            Whether the Todo List exists and the Todo, if found.
+        """
+        statement = (
+            select(TodoList.id, self.model)
+            .outerjoin(
+                self.model,
+                and_(
+                    self.model.list_id == TodoList.id,
+                    self.model.id == todo_id,
+                    self.model.is_active == True,  # noqa E712
+                ),
+            )
+            .where(
+                TodoList.id == todo_list_id,
+                TodoList.is_active == True,  # noqa E712
+            )
+        )
+        row = db.exec(statement).first()
+        if row is None:
+            return False, None
+        return True, row[1]
+
+    def update_in_list(
+        self,
+        db: Session,
+        todo_list_id: UUID,
+        todo_id: UUID,
+        obj_in: TodoUpdate,
+        version: Optional[int] = None,
+    ) -> Tuple[bool, Optional[Todo]]:
+        """
+        Update an active Todo of an active Todo List in one statement.
+
+        Runs `UPDATE todo ... FROM todolist ... RETURNING`; the Todo List is
+        only looked up again when nothing was updated, to report which of
+        the two is missing.
+
+        Args:
+            version: The version the Todo must still have, if any.
+
+        Returns:
+            Whether the Todo List exists and the updated Todo, if found.
+
+        Raises:
+            StaleVersionError: The Todo was written since `version`.
+        """
+        update_data = self.update_data(obj_in)
+        if not update_data and version is None:
+            return self.get_in_list(db, todo_list_id, todo_id)
+        filters = [] if version is None else [self.model.version == version]
+        found, db_obj = self._set_in_list(
+            db, todo_list_id, todo_id, update_data, filters
+        )
+        if db_obj is None and filters:
+            found, db_obj = self.get_in_list(db, todo_list_id, todo_id)
+            if db_obj is not None:
+                raise StaleVersionError(todo_id)
+        return found, db_obj
+
+    def delete_in_list(
+        self, db: Session, todo_list_id: UUID, todo_id: UUID
+    ) -> Tuple[bool, Optional[Todo]]:
+        """
+        Soft delete an active Todo of an active Todo List in one statement.
+
+        Returns:
+            Whether the Todo List exists and the removed Todo, if found.
+        """
+        return self._set_in_list(db, todo_list_id, todo_id, deleted_values())
+
+    def _set_in_list(
+        self,
+        db: Session,
+        todo_list_id: UUID,
+        todo_id: UUID,
+        values: dict,
+        filters: Sequence[Any] = (),
+    ) -> Tuple[bool, Optional[Todo]]:
+        """
+        Set values on an active Todo of an active Todo List.
+        """
+        self.record_completed(
+            db,
+            values,
+            self.model.id == todo_id,
+            self.model.list_id == todo_list_id,
+            *filters,
+        )
+        statement = (
+            update(self.model)
+            .where(
+                self.model.id == todo_id,
+                self.model.is_active == True,  # noqa E712
+                self.model.list_id == TodoList.id,
+                TodoList.id == todo_list_id,
+                TodoList.is_active == True,  # noqa E712
+                *filters,
+            )
+            .values(
+                **values,
+                version=self.model.version + 1,
+                change_seq=next_change_seq(),
+            )
+            .returning(self.model)
+            .execution_options(
+                synchronize_session=False, populate_existing=True
+            )
+        )
+        db_obj = db.scalars(statement).one_or_none()
+        if db_obj is None:
+            db.rollback()
+            db.info.pop(COMPLETED_BEFORE, None)
+            return self.list_exists(db, todo_list_id), None
+        self.on_write(db, db_obj)
+        db.commit()
+        self.invalidate(db_obj)
+        return True, db_obj
+
+
+class AsyncCRUDTodo(AsyncCRUDBase[CRUDTodo]):
+    """
+    Asyncio CRUD operations for the Todo.
+    """
+
+    async def get_all_by_list_id(
+        self, db: AsyncSession, todo_list_id: UUID, **kwargs
+    ) -> dict:
+        """
+        Get all Todos by Todo List ID, maybe from a read replica, see
+        `CRUDTodo.get_all_by_list_id`.
+        """
+        return await self.read(
+            db, self.crud.get_all_by_list_id, todo_list_id, **kwargs
+        )
+
+    async def stream_by_list_id(
+        self,
+        db: AsyncSession,
+        todo_list_id: UUID,
+        batch_size: int = EXPORT_BATCH_SIZE,
+    ) -> AsyncIterator[List[Row]]:
+        """
+        Stream the exported fields of a Todo List's active Todos.
+
+        Rows are fetched from a server-side cursor `batch_size` at a time
+        and yielded as plain tuples, so memory does not grow with the list.
+        """
+        if self.coalescer is not None:
+            await self.coalescer.settle({todo_list_id})
+        result = await db.stream(
+            self.crud.export_statement(todo_list_id).execution_options(
+                yield_per=batch_size
+            )
+        )
+        async for rows in result.partitions():
+            yield rows
+
+    async def get_changes(
+        self, db: AsyncSession, todo_list_id: UUID, **kwargs
+    ) -> Optional[dict]:
+        """
+        Get the Todos written since a change token, see
+        `CRUDTodo.get_changes`.
+        """
+        return await self.run(db, self.crud.get_changes, todo_list_id, **kwargs)
+
+    async def import_rows(
+        self, db: AsyncSession, objs_in: List[TodoCreate], todo_list_id: UUID
+    ) -> int:
+        """
+        Load many Todos into a Todo List in one transaction.
+        """
+        return await self.run(db, self.crud.import_rows, objs_in, todo_list_id)
+
+    async def get_by_list_and_id(
+        self, db: AsyncSession, todo_list_id: UUID, todo_id: UUID
+    ) -> Todo:
+        """
+        Get a Todo by Todo List ID and Todo ID, maybe from a read replica.
+        """
+        return await self.read(
+            db, self.crud.get_by_list_and_id, todo_list_id, todo_id
+        )
+
+    async def collection_version(
+        self, db: AsyncSession, todo_list_id: UUID
+    ) -> Optional[int]:
+        """
+        Get the version of the Todos of an active Todo List.
+        """
+        return await self.run(db, self.crud.collection_version, todo_list_id)
+
+    async def get_all_by_list_id_cached(
+        self, db: AsyncSession, todo_list_id: UUID, **kwargs
+    ) -> dict:
+        """
+        Get all Todos by Todo List ID through the read cache, loaded from
+        a read replica on a miss.
+        """
+        return await self.read(
+            db, self.crud.get_all_by_list_id_cached, todo_list_id, **kwargs
+        )
+
+    async def get_in_list_cached(
+        self, db: AsyncSession, todo_list_id: UUID, todo_id: UUID
+    ) -> Tuple[bool, Optional[Todo]]:
+        """
+        Get an active Todo of a Todo List through the read cache, loaded
+        from a read replica on a miss.
+        """
+        return await self.read(
+            db, self.crud.get_in_list_cached, todo_list_id, todo_id
+        )
+
+    async def get_in_list(
+        self, db: AsyncSession, todo_list_id: UUID, todo_id: UUID
+    ) -> Tuple[bool, Optional[Todo]]:
+        """
+        Get an active Todo and check its Todo List in one query.
+        """
+        return await self.run(db, self.crud.get_in_list, todo_list_id, todo_id)
+
+    async def update_in_list(
+        self,
+        db: AsyncSession,
+        todo_list_id: UUID,
+        todo_id: UUID,
+        obj_in: TodoUpdate,
+        version: Optional[int] = None,
+    ) -> Tuple[bool, Optional[Todo]]:
+        """
+        Update an active Todo of an active Todo List in one statement.
+
+        When the coalescer is enabled, unconditional updates are buffered
+        and written with the other updates of their window instead. With
+        `buffer` acknowledgements, the Todo is returned as it will be once
+        written.
+        """
+        update_data = self.crud.update_data(obj_in)
+        if not self.buffers(obj_in, version):
+            return await self.run(
+                db,
+                self.crud.update_in_list,
+                todo_list_id,
+                todo_id,
+                obj_in,
+                version,
+            )
+        key = (todo_list_id, todo_id)
+        if self.coalescer.ack is AckMode.commit:
+            db_obj = await self.coalescer.submit(key, update_data)
+            if db_obj is not None:
+                return True, db_obj
+            return await self.get_in_list(db, todo_list_id, todo_id)
+        # Read without writing the buffer, which would defeat it.
+        found, db_obj = await db.run_sync(
+            lambda session: self.crud.get_in_list(session, *key)
+        )
+        if db_obj is None:
+            return found, None
+        values = {
+            **db_obj.model_dump(),
+            **(self.coalescer.pending(key) or {}),
+            **update_data,
+            "version": db_obj.version + 1,
+        }
+        await self.coalescer.submit(key, update_data)
+        return True, self.model.model_validate(values)
+
+    def buffers(self, obj_in: TodoUpdate, version: Optional[int]) -> bool:
+        """
+        Tell whether an update goes through the coalescer.
+        """
+        return (
+            self.coalescer.enabled
+            and version is None
+            and bool(self.crud.update_data(obj_in))
+        )
+
+    async def flush_updates(self, batch: Dict[Key, dict]) -> dict:
+        """
+        Write merged updates of Todos in one transaction, on a session and
+        a connection of their own, see `database.async_flush_engine`.
+        """
+        async with AsyncSession(
+            async_flush_engine, expire_on_commit=False
+        ) as db:
+            return await db.run_sync(
+                lambda session: self.crud.flush_updates(session, batch)
+            )
+
+    async def delete_in_list(
+        self, db: AsyncSession, todo_list_id: UUID, todo_id: UUID
+    ) -> Tuple[bool, Optional[Todo]]:
+        """
+        Soft delete an active Todo of an active Todo List in one statement.
+        """
+        return await self.run(
+            db, self.crud.delete_in_list, todo_list_id, todo_id
+        )
+
 
-todo = CRUDTodo(Todo)
+todo = CRUDTodo(Todo, todo_archive)
+async_todo = AsyncCRUDTodo(todo)
+async_todo.coalescer = UpdateCoalescer(async_todo.flush_updates)
@@ -2,9 +2,41 @@
 This file contains the CRUD operations for the Todo List.
 """
 
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+
+from sqlalchemy import func, or_, update
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from domain.models.archive import todo_list_archive
+from domain.models.todo import Todo
 from domain.models.todo_list import TodoList
-from domain.schemas.todo_list import TodoListCreate, TodoListUpdate
-from infraestructure.crud.base import CRUDBase
+from domain.schemas.todo_list import (
+    TodoListCreate,
+    TodoListStats,
+    TodoListUpdate,
+)
+from infraestructure.crud import changes
+from infraestructure.crud.base import (
+    PURGE_BATCH_SIZE,
+    AsyncCRUDBase,
+    CRUDBase,
+    deleted_values,
+)
+from infraestructure.crud.todo import EMBED_LIMIT, async_todo
+from infraestructure.crud.todo import todo as todo_crud
+
+RECONCILE_BATCH_SIZE = 1000
+
+
+def stats_of(total: int, completed: int) -> TodoListStats:
+    """
+    Build the completion stats of a Todo List from its counters.
+    """
+    percent = round(100 * completed / total, 2) if total else 0.0
+    return TodoListStats(total=total, completed=completed, percent=percent)
 
 
 class CRUDTodoList(CRUDBase[TodoList, TodoListCreate, TodoListUpdate]):
@@ -12,8 +44,196 @@ class CRUDTodoList(CRUDBase[TodoList, TodoListCreate, TodoListUpdate]):
     CRUD operations for the Todo List.
     """
 
-    ...
+    def stats(self, db: Session, id: Any) -> Optional[TodoListStats]:
+        """
+        Get the completion stats of an active Todo List.
+
+        They are read from the counters `CRUDTodo` keeps on the list, so no
+        Todo is scanned.
+        """
+        db_obj = self.get(db, id)
+        if db_obj is None:
+            return None
+        return stats_of(db_obj.todos_total, db_obj.todos_completed)
+
+    def include_todos(
+        self,
+        db: Session,
+        db_objs: List[Any],
+        limit: int = EMBED_LIMIT,
+        is_completed: Optional[bool] = None,
+    ) -> List[Any]:
+        """
+        Embed the first active Todos of Todo Lists in `todos`.
+
+        The Todos of all the lists are read in one statement, instead of
+        one lazy load of `todos` per list.
+
+        Args:
+            db: The database session.
+            db_objs: The Todo Lists, as models or as dicts holding their id.
+            limit: The most Todos to embed per list.
+            is_completed: Only embed the completed or the pending Todos.
+
+        Returns:
+            The Todo Lists, with their Todos.
+        """
+        ids = [
+            db_obj["id"] if isinstance(db_obj, dict) else db_obj.id
+            for db_obj in db_objs
+        ]
+        todos = todo_crud.get_by_list_ids(db, ids, limit, is_completed)
+        for id, db_obj in zip(ids, db_objs):
+            if isinstance(db_obj, dict):
+                db_obj["todos"] = todos[id]
+            else:
+                set_committed_value(db_obj, "todos", todos[id])
+        return db_objs
+
+    def on_write(self, db: Session, *db_objs: TodoList):
+        """
+        Reset the counters of the removed Todo Lists, and soft delete their
+        active Todos in one set-based UPDATE, stamped with the lists' new
+        collection version.
+
+        The events of the lists are recorded for the change feed; the one
+        of a removed list stands for its Todos.
+        """
+        if changes.listened(db):
+            events = [
+                changes.written(db_obj, db_obj.id, "list_")
+                for db_obj in db_objs
+            ]
+            changes.record(db, events)
+        removed = [db_obj.id for db_obj in db_objs if not db_obj.is_active]
+        if not removed:
+            return
+        db.execute(
+            update(TodoList)
+            .where(TodoList.id.in_(removed))
+            .values(
+                todos_version=TodoList.todos_version + 1,
+                todos_total=0,
+                todos_completed=0,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(
+            update(Todo)
+            .where(
+                Todo.list_id.in_(removed),
+                Todo.is_active == True,  # noqa E712
+            )
+            .values(
+                **deleted_values(),
+                version=Todo.version + 1,
+                change_seq=select(TodoList.todos_version)
+                .where(TodoList.id == Todo.list_id)
+                .scalar_subquery(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    def invalidate(self, *db_objs: TodoList):
+        """
+        Drop the cached reads of the written Todo Lists, and of the Todos
+        of the removed ones.
+        """
+        super().invalidate(*db_objs)
+        removed = [db_obj.id for db_obj in db_objs if not db_obj.is_active]
+        if removed:
+            todo_crud.invalidate_lists(*removed)
+
+    def purge(
+        self,
+        db: Session,
+        before: datetime,
+        archive: bool = True,
+        batch_size: int = PURGE_BATCH_SIZE,
+        filters: Sequence[Any] = (),
+    ) -> int:
+        """
+        Remove the Todo Lists soft deleted before a time, once none of
+        their Todos is left, see `CRUDBase.purge`.
+        """
+        has_todos = select(Todo.id).where(Todo.list_id == TodoList.id).exists()
+        return super().purge(
+            db, before, archive, batch_size, [~has_todos, *filters]
+        )
+
+    def reconcile_counters(
+        self, db: Session, batch_size: int = RECONCILE_BATCH_SIZE
+    ) -> int:
+        """
+        Rebuild the Todo counters of every Todo List from the Todos.
+
+        Lists are recounted batch by batch, each in its own transaction, so
+        writers are only held up for one batch at a time.
+
+        Returns:
+            The number of Todo Lists whose counters were wrong.
+        """
+        total = (
+            select(func.count())
+            .where(
+                Todo.list_id == TodoList.id,
+                Todo.is_active == True,  # noqa E712
+            )
+            .scalar_subquery()
+        )
+        completed = (
+            select(func.count())
+            .where(
+                Todo.list_id == TodoList.id,
+                Todo.is_active == True,  # noqa E712
+                Todo.is_completed == True,  # noqa E712
+            )
+            .scalar_subquery()
+        )
+        fixed, last_id = 0, None
+        while True:
+            statement = select(TodoList.id).order_by(TodoList.id)
+            if last_id is not None:
+                statement = statement.where(TodoList.id > last_id)
+            ids = db.exec(statement.limit(batch_size)).all()
+            if not ids:
+                return fixed
+            result = db.execute(
+                update(TodoList)
+                .where(
+                    TodoList.id.in_(ids),
+                    or_(
+                        TodoList.todos_total != total,
+                        TodoList.todos_completed != completed,
+                    ),
+                )
+                .values(todos_total=total, todos_completed=completed)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            fixed += result.rowcount
+            last_id = ids[-1]
+
+
+class AsyncCRUDTodoList(AsyncCRUDBase[CRUDTodoList]):
+    """
+    Asyncio CRUD operations for the Todo List.
+    """
+
+    async def stats(self, db: AsyncSession, id: Any) -> Optional[TodoListStats]:
+        """
+        Get the completion stats of an active Todo List.
+        """
+        return await self.run(db, self.crud.stats, id)
+
+    async def include_todos(
+        self, db: AsyncSession, db_objs: List[Any], **kwargs: Any
+    ) -> List[Any]:
+        """
+        Embed the first active Todos of Todo Lists in `todos`.
+        """
+        return await self.run(db, self.crud.include_todos, db_objs, **kwargs)
 
 
-todo_list = CRUDTodoList(TodoList)
-todo_list = CRUDTodoList(TodoList)
+todo_list = CRUDTodoList(TodoList, todo_list_archive)
+async_todo_list = AsyncCRUDTodoList(todo_list, async_todo.coalescer)
@@ -3,26 +3,325 @@ This file contains the database configuration for the application.
 """
 
 import os
+import threading
+import time
 
+from sqlalchemy import event, inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.schema import CreateColumn
 from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from domain.models.base import utcnow
+from infraestructure.crud.search import setup_search
+from infraestructure.db import metrics, routing, sqlite
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
-engine = create_engine(DATABASE_URL)
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "5"))
+DATABASE_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", "10"))
+DATABASE_POOL_TIMEOUT = float(os.getenv("DATABASE_POOL_TIMEOUT", "30"))
+DATABASE_POOL_RECYCLE = int(os.getenv("DATABASE_POOL_RECYCLE", "1800"))
+DATABASE_POOL_PRE_PING = os.getenv("DATABASE_POOL_PRE_PING", "true") == "true"
+DATABASE_REPLICA_URLS = [
+    url.strip()
+    for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",")
+    if url.strip()
+]
+
+
+def async_url(url: str) -> str:
+    """
+    Swap the driver of a database url for its asyncio counterpart.
+    """
+    scheme, _, rest = url.partition("://")
+    backend = scheme.split("+")[0]
+    return f"{ASYNC_DRIVERS.get(backend, scheme)}://{rest}"
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", async_url(DATABASE_URL))
+
+
+def engine_options(
+    url: str,
+    pool_size: int = DATABASE_POOL_SIZE,
+    max_overflow: int = DATABASE_MAX_OVERFLOW,
+) -> dict:
+    """
+    Build the engine options for a database url from the environment.
+    """
+    options = {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": DATABASE_POOL_TIMEOUT,
+        "pool_recycle": DATABASE_POOL_RECYCLE,
+        "pool_pre_ping": DATABASE_POOL_PRE_PING,
+    }
+    if url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False}
+    return options
+
+
+class PoolMetrics:
+    """
+    Counters of the connection pool activity of an engine.
+
+    Attributes:
+        name: The name of the engine in the metrics.
+        connects: New DBAPI connections opened by the pool.
+        checkouts: Connections handed out by the pool.
+        checkins: Connections returned to the pool.
+        invalidations: Connections discarded after an error.
+        wait_seconds: Total time spent waiting for a connection.
+        max_wait_seconds: Longest time spent waiting for a connection.
+    """
+
+    def __init__(self, engine, name: str):
+        self.engine = engine
+        self.name = name
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.instrument()
+
+    def increment(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def observe_wait(self, seconds: float):
+        with self._lock:
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+        if metrics.METRICS_ENABLED:
+            metrics.pool_wait_seconds.observe((self.name,), seconds)
+
+    def instrument(self):
+        """
+        Listen to the pool events of the engine.
+        """
+        for name, counter in (
+            ("connect", "connects"),
+            ("checkout", "checkouts"),
+            ("checkin", "checkins"),
+            ("invalidate", "invalidations"),
+        ):
+            event.listen(
+                self.engine.pool,
+                name,
+                lambda *args, counter=counter: self.increment(counter),
+            )
+
+    def snapshot(self) -> dict:
+        """
+        Return the counters with the current state of the engine pool.
+        """
+        pool = self.engine.pool
+        with self._lock:
+            data = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "wait_seconds": self.wait_seconds,
+                "max_wait_seconds": self.max_wait_seconds,
+            }
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            if hasattr(pool, name):
+                data[name] = getattr(pool, name)()
+        return data
+
+
+SQLITE_TUNED = sqlite.tuned(DATABASE_URL)
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+if SQLITE_TUNED:
+    # A single writer connection.
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        **engine_options(ASYNC_DATABASE_URL, pool_size=1, max_overflow=0),
+    )
+    sqlite.tune(engine)
+    sqlite.tune(async_engine.sync_engine)
+else:
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL)
+    )
+
+# The update coalescer writes on a connection of its own: the requests
+# waiting for its batches hold theirs, so sharing their pool could leave no
+# connection to write with. Batches are written one at a time.
+async_flush_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **engine_options(ASYNC_DATABASE_URL, pool_size=1, max_overflow=0),
+)
+if SQLITE_TUNED:
+    sqlite.tune(async_flush_engine.sync_engine)
+
+pool_metrics = PoolMetrics(engine, "sync")
+async_pool_metrics = PoolMetrics(async_engine.sync_engine, "async")
+all_pool_metrics = [
+    pool_metrics,
+    async_pool_metrics,
+    PoolMetrics(async_flush_engine.sync_engine, "async_flush"),
+]
+
+
+def create_read_engine(
+    url: str, name: str, pool_size: int = DATABASE_POOL_SIZE
+):
+    """
+    Create an asyncio engine reads can go to, read-only with the tuned
+    SQLite profile.
+    """
+    url = async_url(url)
+    options = engine_options(url, pool_size=pool_size)
+    reader = create_async_engine(url, **options)
+    if sqlite.tuned(url):
+        sqlite.tune(reader.sync_engine, read_only=True)
+    all_pool_metrics.append(PoolMetrics(reader.sync_engine, name))
+    return reader
+
+
+if DATABASE_REPLICA_URLS:
+    async_read_engines = [
+        create_read_engine(url, f"replica_{index}")
+        for index, url in enumerate(DATABASE_REPLICA_URLS)
+    ]
+elif SQLITE_TUNED:
+    async_read_engines = [
+        create_read_engine(
+            ASYNC_DATABASE_URL, "async_read", pool_size=sqlite.SQLITE_READERS
+        )
+    ]
+else:
+    async_read_engines = []
+read_engines = routing.ReadEngines(
+    async_engine.sync_engine,
+    [reader.sync_engine for reader in async_read_engines],
+)
+for pool in all_pool_metrics:
+    metrics.instrument(pool.engine)
+
+
+def add_missing_columns(engine) -> set:
+    """
+    Add the columns of the models missing from their existing tables, with
+    their server defaults, so databases created before a column was added
+    keep working.
+
+    Returns:
+        The `(table, column)` names added.
+    """
+    existing = inspect(engine)
+    added = set()
+    with engine.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            if not existing.has_table(table.name):
+                continue
+            columns = {
+                column["name"] for column in existing.get_columns(table.name)
+            }
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                specification = CreateColumn(column).compile(
+                    dialect=engine.dialect
+                )
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {table.name} "
+                        f"ADD COLUMN {specification}"
+                    )
+                )
+                added.add((table.name, column.name))
+    return added
+
+
+def backfill(engine, added: set):
+    """
+    Fill the columns added to existing tables: rows already soft deleted
+    count as deleted now, and the Todo counters are rebuilt from the Todos.
+    """
+    # Imported here, as the CRUD layer imports this module.
+    from infraestructure.crud.todo_list import todo_list
+
+    with engine.begin() as connection:
+        for table, column in added:
+            if column == "deleted_at" and not table.endswith("_archive"):
+                connection.execute(
+                    text(
+                        f"UPDATE {table} SET deleted_at = :now "
+                        "WHERE is_active = :inactive AND deleted_at IS NULL"
+                    ),
+                    {"now": utcnow(), "inactive": False},
+                )
+    if {column for _, column in added} & {"todos_total", "todos_completed"}:
+        with Session(engine) as db:
+            todo_list.reconcile_counters(db)
 
 
 def init_db():
     """
     Initialize the database
+
+    Columns missing from existing tables are added and filled first, then
+    indexes are created separately so the ones added to an existing table
+    are picked up too, then the search backend builds its own structures.
     """
     SQLModel.metadata.create_all(engine)
+    added = add_missing_columns(engine)
+    if added:
+        backfill(engine, added)
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+    setup_search(engine)
 
 
 def get_db():
     """
     Get a database session
+
+    The session is bound to a single connection that is held for the whole
+    request and returned to the pool once the response is sent. Rows stay
+    loaded after a commit so they can be serialized without another round
+    trip.
+    """
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        pool_metrics.observe_wait(time.perf_counter() - started)
+        with Session(bind=connection, expire_on_commit=False) as db:
+            yield db
+
+
+async def get_async_db():
+    """
+    Get an asyncio database session
+
+    Like `get_db`, the session holds a single connection for the whole
+    request and keeps rows loaded after a commit. When there are read
+    replicas, or with the tuned SQLite profile, the read-only CRUD methods
+    read from a reader instead, see `routing.RoutingSession`.
     """
-    db = Session(engine)
-    try:
-        return db
-    finally:
-        db.close()
+    if async_read_engines:
+        async with AsyncSession(
+            sync_session_class=routing.RoutingSession,
+            reader=read_engines.pick(),
+            writer=async_engine.sync_engine,
+            expire_on_commit=False,
+        ) as db:
+            yield db
+        return
+    started = time.perf_counter()
+    async with async_engine.connect() as connection:
+        async_pool_metrics.observe_wait(time.perf_counter() - started)
+        async with AsyncSession(bind=connection, expire_on_commit=False) as db:
+            yield db
@@ -0,0 +1,331 @@
+"""
+This file contains the request and query metrics, and the slow query log.
+
+Statements are timed by engine events, and the queries, rows and time of
+each request are added up in a context variable the metrics middleware
+sets. Everything is kept in process and rendered in the Prometheus text
+format. Nothing is hooked unless `METRICS_ENABLED` or `SLOW_QUERY_MS` is
+set, so disabled instrumentation costs nothing.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false") == "true"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+slow_query_log = logging.getLogger("infraestructure.db.slow_queries")
+
+Labels = Tuple[str, ...]
+
+
+class Counter:
+    """
+    A Prometheus counter, by label values.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str]):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[Tuple[str, Labels, Tuple, float]]:
+        """
+        Return the samples as (suffix, labels, extra labels, value).
+        """
+        with self._lock:
+            return [
+                ("_total", labels, (), value)
+                for labels, value in self._values.items()
+            ]
+
+
+class Histogram(Counter):
+    """
+    A Prometheus histogram, by label values.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        label_names: Sequence[str],
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, label_names)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels: Labels, value: float):
+        with self._lock:
+            # Cumulative bucket counts, then the count and the sum.
+            series = self._values.get(labels)
+            if series is None:
+                series = [0] * (len(self.buckets) + 1) + [0.0]
+                self._values[labels] = series
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def samples(self) -> List[Tuple[str, Labels, Tuple, float]]:
+        with self._lock:
+            values = {labels: list(s) for labels, s in self._values.items()}
+        samples = []
+        for labels, series in values.items():
+            for bound, count in zip(self.buckets, series):
+                samples.append(("_bucket", labels, (("le", bound),), count))
+            samples.append(("_bucket", labels, (("le", "+Inf"),), series[-2]))
+            samples.append(("_count", labels, (), series[-2]))
+            samples.append(("_sum", labels, (), series[-1]))
+        return samples
+
+
+class RequestStats:
+    """
+    The database activity of one request.
+
+    Attributes:
+        queries: The statements run.
+        seconds: The time spent running them.
+    """
+
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+class CountingCursor:
+    """
+    A DBAPI cursor that counts the rows fetched from it, since drivers
+    report no row count for what a statement returns.
+    """
+
+    __slots__ = ("cursor", "operation")
+
+    def __init__(self, cursor, operation: str):
+        self.cursor = cursor
+        self.operation = operation
+
+    def __getattr__(self, name: str):
+        return getattr(self.cursor, name)
+
+    def counted(self, rows):
+        if rows:
+            statement_rows.inc((self.operation,), len(rows))
+        return rows
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        if row is not None:
+            statement_rows.inc((self.operation,))
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        return self.counted(self.cursor.fetchmany(*args, **kwargs))
+
+    def fetchall(self):
+        return self.counted(self.cursor.fetchall())
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar(
+    "current_request", default=None
+)
+
+request_seconds = Histogram(
+    "http_request_duration_seconds",
+    "Time to answer a request, by route.",
+    ("method", "route"),
+)
+requests_total = Counter(
+    "http_requests",
+    "Requests answered, by route and status.",
+    ("method", "route", "status"),
+)
+request_queries = Histogram(
+    "http_request_queries",
+    "Statements run by a request, by route.",
+    ("method", "route"),
+    COUNT_BUCKETS,
+)
+request_db_seconds = Histogram(
+    "http_request_db_duration_seconds",
+    "Time a request spent running statements, by route.",
+    ("method", "route"),
+)
+statement_seconds = Histogram(
+    "db_statement_duration_seconds",
+    "Time to run a statement, by operation.",
+    ("operation",),
+)
+statement_rows = Counter(
+    "db_rows",
+    "Rows fetched from or changed by statements, by operation.",
+    ("operation",),
+)
+pool_wait_seconds = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a pooled connection, by engine.",
+    ("engine",),
+)
+
+METRICS = (
+    request_seconds,
+    requests_total,
+    request_queries,
+    request_db_seconds,
+    statement_seconds,
+    statement_rows,
+    pool_wait_seconds,
+)
+
+
+def operation_of(statement: str) -> str:
+    """
+    Return the SQL verb a statement starts with, or OTHER.
+    """
+    verb = statement.lstrip()[:6].upper()
+    return verb if verb in OPERATIONS else "OTHER"
+
+
+def redact(parameters: Any, executemany: bool = False) -> str:
+    """
+    Describe bound parameters by their types only, so no value is logged.
+    """
+    if executemany:
+        first = parameters[0] if parameters else ()
+        return f"{len(parameters)} x {redact(first)}"
+    if isinstance(parameters, dict):
+        types = {key: type(value).__name__ for key, value in parameters.items()}
+        return str(types)
+    return str(tuple(type(value).__name__ for value in parameters or ()))
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+    context.query_started = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+    """
+    Time a statement into the metrics and the slow query log.
+    """
+    elapsed = time.perf_counter() - context.query_started
+    if METRICS_ENABLED:
+        operation = operation_of(statement)
+        statement_seconds.observe((operation,), elapsed)
+        if cursor.description is not None:
+            # The result reads its rows from the cursor of the context.
+            context.cursor = CountingCursor(cursor, operation)
+        elif cursor.rowcount > 0:
+            statement_rows.inc((operation,), cursor.rowcount)
+        stats = current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += elapsed
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        slow_query_log.warning(
+            "Slow query (%.1f ms): %s parameters=%s",
+            elapsed * 1000,
+            " ".join(statement.split()),
+            redact(parameters, many),
+        )
+
+
+def instrument(engine: Engine):
+    """
+    Time the statements of an engine, when metrics or the slow query log
+    are enabled.
+    """
+    if not (METRICS_ENABLED or SLOW_QUERY_MS):
+        return
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+
+def record_request(
+    method: str, route: str, status: int, seconds: float, stats: RequestStats
+):
+    """
+    Add a finished request to the metrics.
+    """
+    request_seconds.observe((method, route), seconds)
+    requests_total.inc((method, route, str(status)))
+    request_queries.observe((method, route), stats.queries)
+    request_db_seconds.observe((method, route), stats.seconds)
+
+
+def escape(value: Any) -> str:
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace('"', '\\"')
+    )
+
+
+def sample(name: str, pairs: Sequence[Tuple[str, Any]], value: Any) -> str:
+    """
+    Render one sample line of the Prometheus text format.
+    """
+    labels = ",".join(f'{key}="{escape(label)}"' for key, label in pairs)
+    return f"{name}{{{labels}}} {value}" if labels else f"{name} {value}"
+
+
+def render(gauges: Sequence[Tuple[str, Dict[str, Any], float]] = ()) -> str:
+    """
+    Render every metric in the Prometheus text format.
+
+    Args:
+        gauges: Extra values to expose as gauges, as (name, labels, value).
+    """
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for suffix, labels, extra, value in metric.samples():
+            pairs = [*zip(metric.label_names, labels), *extra]
+            lines.append(sample(f"{metric.name}{suffix}", pairs, value))
+    typed = set()
+    for name, labels, value in gauges:
+        if name not in typed:
+            lines.append(f"# TYPE {name} gauge")
+            typed.add(name)
+        lines.append(sample(name, labels.items(), value))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,89 @@
+"""
+This file contains the routing of reads and writes between engines.
+
+Sessions use the primary, except for the read-only CRUD methods, which
+run `reading` and send their queries to a reader engine: a read replica or
+the read-only pool of the tuned SQLite profile. The reads of a write, before
+or after its commit, stay on the primary, so they never see a lagging
+replica. Readers are picked round-robin per request. A client that just
+wrote reads from the primary for `READ_YOUR_WRITES_SECONDS`, so it sees its
+own writes even while the replicas lag behind.
+"""
+
+import itertools
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Sequence
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+READING = "routing_reading"
+
+read_primary: ContextVar[bool] = ContextVar("read_primary", default=False)
+
+
+class RoutingSession(Session):
+    """
+    Session sending the queries run in `reading` to a reader engine, and
+    everything else to the primary.
+
+    Attributes:
+        reader: The engine reads go to.
+        writer: The engine of the primary.
+    """
+
+    def __init__(self, reader: Engine, writer: Engine, **kwargs):
+        super().__init__(**kwargs)
+        self.reader = reader
+        self.writer = writer
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if (
+            self.info.get(READING)
+            and clause is not None
+            and not self._flushing
+            and not getattr(clause, "is_dml", False)
+        ):
+            return self.reader
+        return self.writer
+
+
+@contextmanager
+def reading(session: Session):
+    """
+    Let the queries of a read-only operation go to the session's reader
+    engine, if it has one.
+    """
+    session.info[READING] = True
+    try:
+        yield
+    finally:
+        session.info.pop(READING, None)
+
+
+class ReadEngines:
+    """
+    The engines reads can go to, taken in turn.
+
+    Attributes:
+        primary: The engine of the primary, read from by clients that just
+            wrote.
+        readers: The reader engines.
+    """
+
+    def __init__(self, primary: Engine, readers: Sequence[Engine]):
+        self.primary = primary
+        self.readers = list(readers)
+        self._next = itertools.cycle(self.readers)
+
+    def pick(self) -> Engine:
+        """
+        Return the engine the reads of the current request go to.
+        """
+        if read_primary.get():
+            return self.primary
+        return next(self._next)
@@ -0,0 +1,68 @@
+"""
+This file contains the tuned SQLite profile.
+
+With `SQLITE_PROFILE=tuned`, every connection to a SQLite file is switched
+to WAL with `synchronous=NORMAL`, memory mapping, a larger page cache and a
+busy timeout. Requests then read from a pool of read-only connections, which
+WAL lets run alongside the writer, and write through a single connection, so
+writers queue in the pool instead of failing with "database is locked". The
+sessions are split between the two with `routing.RoutingSession`.
+"""
+
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "default")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_READERS = int(os.getenv("SQLITE_READERS", "4"))
+
+
+def tuned(url: str) -> bool:
+    """
+    Tell whether the tuned profile applies to a database url: a SQLite
+    file, as in-memory databases are not shared between connections.
+    """
+    url = make_url(url)
+    return (
+        SQLITE_PROFILE == "tuned"
+        and url.get_backend_name() == "sqlite"
+        and url.database not in (None, "", ":memory:")
+    )
+
+
+def pragmas(read_only: bool = False) -> list:
+    """
+    Build the pragmas run on each new connection.
+    """
+    statements = [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size={SQLITE_CACHE_SIZE}",
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+    ]
+    if read_only:
+        statements.append("PRAGMA query_only=ON")
+    return statements
+
+
+def tune(engine: Engine, read_only: bool = False):
+    """
+    Run the profile's pragmas on every connection the engine opens.
+
+    Args:
+        engine: The engine, the sync one of an asyncio engine.
+        read_only: Whether the connections must refuse to write.
+    """
+    statements = pragmas(read_only)
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.close()
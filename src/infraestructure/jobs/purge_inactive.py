@@ -0,0 +1,96 @@
+"""
+This file contains the job that purges the rows soft deleted long ago.
+
+Tasks, then lists, inactive for more than `PURGE_AFTER_DAYS` days are moved
+to the archive tables, or deleted with `--mode delete`, in bounded batches
+each committed on its own, so the hot tables stay small without long locks:
+
+    cd src && python -m infraestructure.jobs.purge_inactive --days 30
+
+With `PURGE_INTERVAL_SECONDS` set, the application also runs it in the
+background every that many seconds.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+from datetime import timedelta
+from enum import Enum
+
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from domain.models.base import utcnow
+from infraestructure.crud.base import PURGE_AFTER_DAYS, PURGE_BATCH_SIZE
+from infraestructure.crud.todo import todo
+from infraestructure.crud.todo_list import todo_list
+from infraestructure.db.database import async_engine, engine
+
+PURGE_MODE = os.getenv("PURGE_MODE", "archive")
+PURGE_INTERVAL_SECONDS = float(os.getenv("PURGE_INTERVAL_SECONDS", "0"))
+
+log = logging.getLogger(__name__)
+
+
+class PurgeMode(str, Enum):
+    """
+    What happens to purged rows.
+    """
+
+    archive = "archive"
+    delete = "delete"
+
+
+def purge_inactive(
+    db: Session,
+    days: float = PURGE_AFTER_DAYS,
+    mode: PurgeMode = PurgeMode(PURGE_MODE),
+    batch_size: int = PURGE_BATCH_SIZE,
+) -> dict:
+    """
+    Purge the Todos, then the Todo Lists, soft deleted more than `days`
+    days ago.
+
+    Returns:
+        The number of rows purged, by table.
+    """
+    before = utcnow() - timedelta(days=days)
+    archive = mode is PurgeMode.archive
+    return {
+        "todos": todo.purge(db, before, archive, batch_size),
+        "todo_lists": todo_list.purge(db, before, archive, batch_size),
+    }
+
+
+async def purge_periodically(interval: float = PURGE_INTERVAL_SECONDS):
+    """
+    Purge every `interval` seconds, until cancelled.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with AsyncSession(async_engine) as db:
+                purged = await db.run_sync(purge_inactive)
+            log.info("Purged %s", purged)
+        except Exception:
+            log.exception("Purge of inactive rows failed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--days", type=float, default=PURGE_AFTER_DAYS)
+    parser.add_argument("--mode", type=PurgeMode, default=PurgeMode(PURGE_MODE))
+    parser.add_argument("--batch-size", type=int, default=PURGE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    with Session(engine) as db:
+        purged = purge_inactive(db, args.days, args.mode, args.batch_size)
+    print(
+        f"Purged {purged['todos']} todos and {purged['todo_lists']} todo "
+        f"lists ({args.mode.value})"
+    )
+
+
+if __name__ == "__main__":
+    main()
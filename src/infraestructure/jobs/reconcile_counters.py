@@ -0,0 +1,29 @@
+"""
+This file contains the job that rebuilds the Todo counters of the Todo Lists.
+
+The counters are kept by every write through `CRUDTodo`; run this after
+writing to the tables by other means, or on a schedule to repair drift:
+
+    cd src && python -m infraestructure.jobs.reconcile_counters
+"""
+
+import argparse
+
+from sqlmodel import Session
+
+from infraestructure.crud.todo_list import RECONCILE_BATCH_SIZE, todo_list
+from infraestructure.db.database import engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=RECONCILE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    with Session(engine) as db:
+        fixed = todo_list.reconcile_counters(db, batch_size=args.batch_size)
+    print(f"Fixed the counters of {fixed} todo lists")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,47 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
 from fastapi import FastAPI
 
-from infraestructure.db.database import init_db
+from infraestructure.api.metrics import MetricsMiddleware, metrics_endpoint
+from infraestructure.api.read_your_writes import ReadYourWritesMiddleware
+from infraestructure.crud import changes
+from infraestructure.crud.cache import read_cache
+from infraestructure.crud.todo import async_todo
+from infraestructure.db.database import (
+    DATABASE_REPLICA_URLS,
+    all_pool_metrics,
+    async_engine,
+    async_flush_engine,
+    async_read_engines,
+    init_db,
+)
+from infraestructure.db.metrics import METRICS_ENABLED
+from infraestructure.jobs.purge_inactive import (
+    PURGE_INTERVAL_SECONDS,
+    purge_periodically,
+)
 from router import api_router
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
+    tasks = []
+    if PURGE_INTERVAL_SECONDS:
+        tasks.append(asyncio.create_task(purge_periodically()))
+    if async_engine.dialect.name == "postgresql":
+        tasks.append(asyncio.create_task(changes.listen(async_engine)))
     yield
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await async_todo.coalescer.settle()
+    await async_flush_engine.dispose()
+    await async_engine.dispose()
+    for read_engine in async_read_engines:
+        await read_engine.dispose()
 
 
 app = FastAPI(
@@ -21,12 +53,39 @@ app = FastAPI(
 
 app.include_router(api_router, prefix="/api")
 
+if DATABASE_REPLICA_URLS:
+    app.add_middleware(ReadYourWritesMiddleware)
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.add_api_route("/metrics", metrics_endpoint, include_in_schema=False)
+
 
 @app.get("/")
 def root():
     return {"message": "Go to /docs"}
 
 
+@app.get("/health/db")
+def database_health():
+    return {pool.name: pool.snapshot() for pool in all_pool_metrics}
+
+
+@app.get("/health/cache")
+def cache_health():
+    return read_cache.stats()
+
+
+@app.get("/health/writes")
+def writes_health():
+    return async_todo.coalescer.stats()
+
+
+@app.get("/health/changes")
+def changes_health():
+    return changes.change_feed.stats()
+
+
 if __name__ == "__main__":
     import uvicorn
 
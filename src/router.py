@@ -4,6 +4,7 @@ This file contains the routers for the application.
 
 from fastapi import APIRouter
 
+from infraestructure.api.changes import router as changes_router
 from infraestructure.api.todo import router as todo_router
 from infraestructure.api.todo_list import router as todo_list_router
 
@@ -20,3 +21,9 @@ api_router.include_router(
     prefix="/lists",
     tags=["todo_lists"],
 )
+
+api_router.include_router(
+    changes_router,
+    prefix="/lists",
+    tags=["changes"],
+)
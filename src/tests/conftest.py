@@ -0,0 +1,17 @@
+"""
+This file contains the shared fixtures for the tests.
+"""
+
+import pytest
+
+from infraestructure.db.database import get_db, init_db
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    init_db()
+
+
+@pytest.fixture
+def db():
+    yield from get_db()
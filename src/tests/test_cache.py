@@ -0,0 +1,150 @@
+"""
+This file contains the tests for the read cache.
+"""
+
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from domain.schemas.todo import TodoCreate
+from domain.schemas.todo_list import TodoListCreate, TodoListUpdate
+from infraestructure.crud.base import encode
+from infraestructure.crud.cache import (
+    LRUCache,
+    NullCache,
+    RedisCache,
+    read_cache,
+)
+from infraestructure.crud.todo import todo as todo_crud
+from infraestructure.crud.todo_list import todo_list as todo_list_crud
+from main import app
+
+client = TestClient(app)
+
+
+def redis_backend():
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisCache(client=fakeredis.FakeRedis())
+
+
+@pytest.fixture(params=["memory", "redis"])
+def cache(request):
+    backend = LRUCache() if request.param == "memory" else redis_backend()
+    read_cache.use(backend)
+    yield read_cache
+    read_cache.use(NullCache())
+
+
+@pytest.fixture
+def todo_list_id(db):
+    todo_list = todo_list_crud.create(db, TodoListCreate(name="Test List"))
+    return todo_list.id
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """
+    GIVEN a full LRU cache
+    WHEN a new entry is stored
+    THEN the least recently used entry is evicted and counted
+    """
+    backend = LRUCache(max_entries=2)
+    backend.set("a", 1, ttl=60)
+    backend.set("b", 2, ttl=60)
+    backend.get("a")
+    backend.set("c", 3, ttl=60)
+
+    assert backend.get("a") == 1
+    assert backend.get("b") is None
+    assert backend.get("c") == 3
+    assert backend.evictions == 1
+
+
+def test_lru_cache_expires_entries():
+    """
+    GIVEN an entry stored with a short time to live
+    WHEN it is read after expiring
+    THEN it is a miss
+    """
+    backend = LRUCache()
+    backend.set("a", 1, ttl=0.01)
+    time.sleep(0.02)
+    assert backend.get("a") is None
+
+
+def test_get_todo_list_is_cached(cache, todo_list_id):
+    """
+    GIVEN a cached Todo List
+    WHEN it is read twice and then updated
+    THEN the second read is a hit and the update is visible right away
+    """
+    url = f"/api/lists/{todo_list_id}"
+    assert client.get(url).json()["name"] == "Test List"
+    assert client.get(url).json()["name"] == "Test List"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    client.put(url, json={"name": "Renamed"})
+    assert client.get(url).json()["name"] == "Renamed"
+
+
+def test_get_todo_list_read_racing_a_write_is_not_served(
+    cache, todo_list_id, db, monkeypatch
+):
+    """
+    GIVEN a Todo List loaded on a cache miss
+    WHEN it is renamed before the loaded read is stored
+    THEN the next read is the renamed Todo List, not the stored one
+    """
+    get = todo_list_crud.get
+
+    def racing_get(db, id):
+        stale = encode(get(db, id))
+        todo_list_crud.update(db, get(db, id), TodoListUpdate(name="Renamed"))
+        return todo_list_crud.decode(stale)
+
+    monkeypatch.setattr(todo_list_crud, "get", racing_get)
+    assert todo_list_crud.get_cached(db, todo_list_id).name == "Test List"
+    monkeypatch.undo()
+
+    assert todo_list_crud.get_cached(db, todo_list_id).name == "Renamed"
+
+
+def test_get_todos_is_invalidated_by_writes(cache, todo_list_id, db):
+    """
+    GIVEN a cached collection of Todos
+    WHEN a Todo is created, updated or deleted in the list
+    THEN the next read of the collection reflects the write
+    """
+    url = f"/api/lists/{todo_list_id}/task"
+    assert client.get(url).json()["total"] == 0
+    assert client.get(url).json()["total"] == 0
+    assert cache.hits == 1
+
+    todo = client.post(url, json={"title": "Test todo"}).json()
+    assert client.get(url).json()["total"] == 1
+
+    client.put(f"{url}/{todo['id']}", json={"is_completed": True})
+    assert client.get(url).json()["data"][0]["is_completed"] is True
+    assert client.get(f"{url}/{todo['id']}").json()["is_completed"] is True
+
+    client.delete(f"{url}/{todo['id']}")
+    assert client.get(url).json()["total"] == 0
+    assert client.get(f"{url}/{todo['id']}").status_code == 404
+
+    todo_crud.bulk_create(db, [TodoCreate(title="Bulk")], todo_list_id)
+    assert client.get(url).json()["total"] == 1
+
+
+def test_cache_health(cache, todo_list_id):
+    """
+    GIVEN the cache health endpoint
+    WHEN cached reads were served
+    THEN the hit, miss and eviction counters are reported
+    """
+    client.get(f"/api/lists/{todo_list_id}")
+    client.get(f"/api/lists/{todo_list_id}")
+
+    data = client.get("/health/cache").json()
+    assert data["hits"] == 1
+    assert data["misses"] == 1
+    assert data["evictions"] == 0
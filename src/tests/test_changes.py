@@ -0,0 +1,204 @@
+"""
+This file contains the tests for the change feed.
+"""
+
+import asyncio
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from domain.models.base import utcnow
+from domain.models.todo import Todo
+from domain.schemas.todo_list import TodoListCreate
+from infraestructure.api.changes import server_sent_events
+from infraestructure.crud import changes
+from infraestructure.crud.changes import ChangeFeed, change_feed
+from infraestructure.crud.pagination import encode_cursor
+from infraestructure.crud.todo import NIL_UUID
+from infraestructure.crud.todo import todo as todo_crud
+from infraestructure.crud.todo_list import todo_list as todo_list_crud
+from main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def todo_list_id(db):
+    todo_list = todo_list_crud.create(db, TodoListCreate(name="Feed"))
+    return todo_list.id
+
+
+def event(list_id, type="updated"):
+    return {"type": type, "list_id": str(list_id)}
+
+
+def test_feed_publishes_to_the_list_subscribers():
+    first, other = uuid4(), uuid4()
+
+    async def run():
+        feed = ChangeFeed()
+        subscription = feed.subscribe(first)
+        feed.subscribe(other)
+        feed.publish([event(first), event(other, "created")])
+        return subscription.queue.get_nowait(), subscription.queue.empty()
+
+    assert asyncio.run(run()) == (event(first), True)
+
+
+def test_feed_drops_slow_subscribers():
+    async def run():
+        feed = ChangeFeed(queue_size=2)
+        list_id = uuid4()
+        slow = feed.subscribe(list_id)
+        feed.publish([event(list_id)] * 3)
+        received = [item async for item in slow.events(heartbeat=0.01)]
+        return feed, slow, received
+
+    feed, slow, received = asyncio.run(run())
+    assert slow.dropped
+    assert received == [{"type": "resync", "list_id": slow.list_id}]
+    assert feed.subscribers == {}
+    assert feed.stats()["dropped"] == 1
+
+
+def test_server_sent_events(monkeypatch):
+    monkeypatch.setattr(changes, "change_feed", ChangeFeed())
+
+    async def run():
+        list_id = uuid4()
+        subscription = changes.change_feed.subscribe(list_id)
+        stream = server_sent_events(subscription)
+        changes.change_feed.publish([event(list_id)])
+        first = await stream.__anext__()
+        changes.change_feed.publish([event(list_id, "list_deleted")])
+        return first, [chunk async for chunk in stream]
+
+    first, rest = asyncio.run(run())
+    assert first.startswith("event: updated\ndata: {")
+    assert rest[0].startswith("event: list_deleted\n")
+    assert len(rest) == 1
+
+
+def test_rolled_back_writes_are_not_published(db, todo_list_id):
+    changes.record(db, [event(todo_list_id)])
+    db.rollback()
+    assert changes.PENDING not in db.info
+
+
+def test_websocket_pushes_the_list_changes(todo_list_id):
+    url = f"/api/lists/{todo_list_id}"
+    with client.websocket_connect(f"{url}/ws") as websocket:
+        todo = client.post(f"{url}/task", json={"title": "A"}).json()
+        created = websocket.receive_json()
+        assert created["type"] == "created"
+        assert created["list_id"] == str(todo_list_id)
+        assert created["data"]["id"] == todo["id"]
+
+        client.put(f"{url}/task/{todo['id']}", json={"is_completed": True})
+        updated = websocket.receive_json()
+        assert updated["type"] == "updated"
+        assert updated["data"]["is_completed"] is True
+
+        client.delete(f"{url}/task/{todo['id']}")
+        assert websocket.receive_json()["type"] == "deleted"
+
+        client.delete(url)
+        assert websocket.receive_json()["type"] == "list_deleted"
+        with pytest.raises(WebSocketDisconnect):
+            websocket.receive_json()
+    assert str(todo_list_id) not in change_feed.subscribers
+
+
+def test_websocket_list_not_found():
+    with pytest.raises(WebSocketDisconnect) as exc_info:
+        with client.websocket_connect(f"/api/lists/{uuid4()}/ws"):
+            pass
+    assert exc_info.value.code == 4404
+
+
+def test_events_list_not_found():
+    response = client.get(f"/api/lists/{uuid4()}/events")
+    assert response.status_code == 404
+
+
+def test_changes_since_token(todo_list_id):
+    url = f"/api/lists/{todo_list_id}"
+    ids = [
+        client.post(f"{url}/task", json={"title": str(i)}).json()["id"]
+        for i in range(3)
+    ]
+    synced = client.get(f"{url}/changes").json()
+    assert [todo["id"] for todo in synced["data"]] == ids
+    assert synced["deleted"] == []
+    assert synced["has_more"] is False
+
+    client.put(f"{url}/task/{ids[0]}", json={"is_completed": True})
+    client.delete(f"{url}/task/{ids[1]}")
+    client.patch(
+        f"{url}/task/bulk",
+        json={"items": [{"id": ids[2], "title": "Renamed"}]},
+    )
+    created = client.post(
+        f"{url}/task/bulk", json={"items": [{"title": "New"}]}
+    ).json()["data"][0]["id"]
+    changed = client.get(
+        f"{url}/changes", params={"since": synced["token"]}
+    ).json()
+    assert [todo["id"] for todo in changed["data"]] == [ids[0], ids[2], created]
+    assert changed["data"][0]["is_completed"] is True
+    assert changed["deleted"] == [ids[1]]
+
+    unchanged = client.get(
+        f"{url}/changes", params={"since": changed["token"]}
+    ).json()
+    assert unchanged["data"] == unchanged["deleted"] == []
+
+
+def test_changes_pages(todo_list_id):
+    url = f"/api/lists/{todo_list_id}"
+    ids = [
+        client.post(f"{url}/task", json={"title": str(i)}).json()["id"]
+        for i in range(3)
+    ]
+    first = client.get(f"{url}/changes", params={"limit": 2}).json()
+    assert first["has_more"] is True
+    client.delete(f"{url}/task/{ids[0]}")
+    second = client.get(
+        f"{url}/changes", params={"since": first["token"], "limit": 2}
+    ).json()
+    assert [todo["id"] for todo in first["data"] + second["data"]] == ids[:3]
+    assert second["deleted"] == [ids[0]]
+    assert second["has_more"] is False
+
+
+def test_changes_of_deleted_list(todo_list_id):
+    url = f"/api/lists/{todo_list_id}"
+    client.post(f"{url}/task", json={"title": "A"})
+    client.delete(url)
+    assert client.get(f"{url}/changes").status_code == 404
+
+
+def test_changes_invalid_or_expired_token(todo_list_id, db):
+    url = f"/api/lists/{todo_list_id}"
+    for since in (
+        "not-a-token",
+        encode_cursor([0, "not-an-id", 0]),
+        encode_cursor([0, NIL_UUID]),
+    ):
+        response = client.get(f"{url}/changes", params={"since": since})
+        assert response.status_code == 400
+
+    todo = client.post(f"{url}/task", json={"title": "A"}).json()
+    token = client.get(f"{url}/changes").json()["token"]
+    client.delete(f"{url}/task/{todo['id']}")
+    purged = todo_crud.purge(
+        db, utcnow(), filters=[Todo.list_id == todo_list_id]
+    )
+    assert purged == 1
+    response = client.get(f"{url}/changes", params={"since": token})
+    assert response.status_code == 410
+    token = client.get(f"{url}/changes").json()["token"]
+    response = client.get(f"{url}/changes", params={"since": token})
+    assert response.status_code == 200
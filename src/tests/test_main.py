@@ -4,8 +4,13 @@ This file contains the tests for the main file.
 
 from unittest.mock import patch
 
+from uuid import uuid4
+
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
 
+from infraestructure.db import database
+from infraestructure.db.database import get_db
 from main import app
 
 client = TestClient(app)
@@ -31,3 +36,96 @@ def test_root():
     response = client.get("/")
     assert response.status_code == 200
     assert response.json() == {"message": "Go to /docs"}
+
+
+def test_database_health():
+    """
+    GIVEN the database health endpoint
+    WHEN a request is served
+    THEN the pool counters are reported and no connection is left checked out
+    """
+    client.get("/api/lists/")
+    response = client.get("/health/db")
+    assert response.status_code == 200
+    assert {"sync", "async"} <= set(response.json())
+    data = response.json()["async"]
+    assert data["checkouts"] >= 1
+    assert data["checkouts"] - data["checkins"] == data["checkedout"]
+    assert data["checkedout"] == 0
+
+
+def test_get_db_keeps_one_connection():
+    """
+    GIVEN a request scoped session
+    WHEN several statements and commits run on it
+    THEN they all use the same connection until the request ends
+    """
+    dependency = get_db()
+    db = next(dependency)
+    first = db.connection()
+    db.execute(text("SELECT 1"))
+    db.commit()
+    assert db.connection() is first
+    dependency.close()
+    assert first.closed
+
+
+BASELINE_SCHEMA = (
+    "CREATE TABLE todolist (id CHAR(32) NOT NULL PRIMARY KEY, "
+    "is_active BOOLEAN NOT NULL, name VARCHAR NOT NULL)",
+    "CREATE TABLE todo (id CHAR(32) NOT NULL PRIMARY KEY, "
+    "is_active BOOLEAN NOT NULL, title VARCHAR NOT NULL, "
+    "description VARCHAR, is_completed BOOLEAN NOT NULL, "
+    "list_id CHAR(32) NOT NULL REFERENCES todolist (id))",
+)
+
+
+def test_init_db_migrates_a_baseline_database(tmp_path, monkeypatch):
+    """
+    GIVEN a database created before the new columns existed
+    WHEN the database is initialized
+    THEN the columns are added with their defaults and the counters filled
+    """
+    baseline = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    list_id = uuid4().hex
+    with baseline.begin() as connection:
+        for statement in BASELINE_SCHEMA:
+            connection.execute(text(statement))
+        connection.execute(
+            text("INSERT INTO todolist VALUES (:id, 1, 'Old')"),
+            {"id": list_id},
+        )
+        for is_active, is_completed in ((1, 1), (1, 0), (0, 1)):
+            connection.execute(
+                text(
+                    "INSERT INTO todo VALUES "
+                    "(:id, :is_active, 'Old', NULL, :is_completed, :list_id)"
+                ),
+                {
+                    "id": uuid4().hex,
+                    "is_active": is_active,
+                    "is_completed": is_completed,
+                    "list_id": list_id,
+                },
+            )
+    monkeypatch.setattr(database, "engine", baseline)
+    database.init_db()
+
+    with baseline.connect() as connection:
+        todo_list = connection.execute(
+            text(
+                "SELECT version, todos_version, todos_total, "
+                "todos_completed, deleted_at FROM todolist"
+            )
+        ).one()
+        deleted = connection.execute(
+            text("SELECT deleted_at FROM todo WHERE is_active = 0")
+        ).scalar()
+        change_seqs = connection.execute(
+            text("SELECT DISTINCT change_seq FROM todo")
+        ).scalars()
+        assert tuple(todo_list) == (1, 0, 2, 1, None)
+        assert deleted is not None
+        assert list(change_seqs) == [0]
+        assert database.add_missing_columns(baseline) == set()
+    baseline.dispose()
@@ -0,0 +1,93 @@
+"""
+This file contains the tests for the request and query metrics.
+"""
+
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, text
+
+from infraestructure.api.metrics import MetricsMiddleware, metrics_endpoint
+from infraestructure.db import metrics
+from infraestructure.db.database import async_engine
+from main import app
+
+
+@pytest.fixture
+def instrumented(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+    engine = async_engine.sync_engine
+    metrics.instrument(engine)
+    yield TestClient(MetricsMiddleware(app))
+    event.remove(engine, "before_cursor_execute", metrics.before_cursor_execute)
+    event.remove(engine, "after_cursor_execute", metrics.after_cursor_execute)
+
+
+def test_histogram_render():
+    histogram = metrics.Histogram("latency", "Latency.", ("route",), (1, 5))
+    histogram.observe(("/a",), 0.5)
+    histogram.observe(("/a",), 3)
+    histogram.observe(("/a",), 10)
+    metrics.METRICS, saved = (histogram,), metrics.METRICS
+    try:
+        text = metrics.render([("pool_size", {"engine": "sync"}, 5)])
+    finally:
+        metrics.METRICS = saved
+
+    assert 'latency_bucket{route="/a",le="1"} 1' in text
+    assert 'latency_bucket{route="/a",le="5"} 2' in text
+    assert 'latency_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'latency_count{route="/a"} 3' in text
+    assert 'latency_sum{route="/a"} 13.5' in text
+    assert 'pool_size{engine="sync"} 5' in text
+
+
+def test_redact():
+    assert metrics.redact(("secret", 1)) == "('str', 'int')"
+    assert metrics.redact([("secret", 1)] * 2, True) == "2 x ('str', 'int')"
+    assert "secret" not in metrics.redact({"name": "secret"})
+
+
+def test_request_metrics(instrumented):
+    todo_list = instrumented.post("/api/lists/", json={"name": "Metrics"})
+    url = f"/api/lists/{todo_list.json()['id']}/task"
+    instrumented.post(url, json={"title": "Test todo"})
+    instrumented.get(url)
+
+    text = metrics_endpoint().body.decode()
+    route = 'method="GET",route="/api/lists/{todo_list_id}/task"'
+    assert f'http_requests_total{{{route},status="200"}}' in text
+    assert f"http_request_duration_seconds_count{{{route}}}" in text
+    # The version, the page and the count.
+    assert f"http_request_queries_sum{{{route}}} 3.0" in text
+    assert 'db_statement_duration_seconds_count{operation="SELECT"}' in text
+    assert 'db_rows_total{operation="INSERT"}' in text
+    assert 'db_rows_total{operation="SELECT"}' in text
+
+
+def test_select_rows_are_counted_as_fetched(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+    rows = metrics.Counter("db_rows", "Rows.", ("operation",))
+    monkeypatch.setattr(metrics, "statement_rows", rows)
+    engine = create_engine("sqlite://")
+    metrics.instrument(engine)
+    with engine.connect() as connection:
+        result = connection.execute(
+            text("SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3")
+        )
+        assert result.first() == (1,)
+        connection.execute(text("CREATE TABLE item (id INTEGER)"))
+        connection.execute(text("INSERT INTO item VALUES (1), (2)"))
+        assert len(connection.execute(text("SELECT id FROM item")).all()) == 2
+
+    assert dict(rows._values) == {("SELECT",): 3, ("INSERT",): 2}
+
+
+def test_slow_query_log_redacts_parameters(instrumented, monkeypatch, caplog):
+    monkeypatch.setattr(metrics, "SLOW_QUERY_MS", 1e-9)
+    with caplog.at_level(logging.WARNING, logger=metrics.slow_query_log.name):
+        instrumented.post("/api/lists/", json={"name": "Very secret name"})
+
+    assert "INSERT INTO todolist" in caplog.text
+    assert "Very secret name" not in caplog.text
@@ -0,0 +1,172 @@
+"""
+This file contains the tests for the query plans of the hot queries.
+
+Each CRUD call is run against the database, the statements it sends are
+captured and explained, and every table access must go through an index.
+Set TEST_POSTGRES_URL to run the same checks against Postgres.
+"""
+
+import json
+import os
+from contextlib import contextmanager
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlmodel import Session, SQLModel
+
+from infraestructure.crud.todo import todo as todo_crud
+from infraestructure.crud.search import setup_search
+from infraestructure.crud.todo_list import todo_list as todo_list_crud
+from infraestructure.db.database import engine
+
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+LIST_ID = uuid4()
+
+HOT_QUERIES = {
+    "all_lists": (
+        lambda db: todo_list_crud.all(db),
+        "ix_todolist_active_id",
+    ),
+    "all_tasks_by_list": (
+        lambda db: todo_crud.get_all_by_list_id(db, LIST_ID),
+        "ix_todo_active_list_id_id",
+    ),
+    "all_tasks_by_list_ordered_by_completed": (
+        lambda db: todo_crud.get_all_by_list_id(
+            db, LIST_ID, order_by_completed=True
+        ),
+        "ix_todo_list_id_is_active_is_completed",
+    ),
+    "search_lists": (
+        lambda db: todo_list_crud.all(db, name="groceries"),
+        "todolist_fts",
+    ),
+    "search_tasks_by_list": (
+        lambda db: todo_crud.get_all_by_list_id(db, LIST_ID, name="milk"),
+        "todo_fts",
+    ),
+    "changes_by_list": (
+        lambda db: db.exec(
+            todo_crud.changes_statement(LIST_ID, (0, uuid4()), 100)
+        ).all(),
+        "ix_todo_list_id_change_seq_id",
+    ),
+    "get_list": (lambda db: todo_list_crud.get(db, LIST_ID), None),
+    "get_task": (
+        lambda db: todo_crud.get_by_list_and_id(db, LIST_ID, uuid4()),
+        None,
+    ),
+    "get_task_in_list": (
+        lambda db: todo_crud.get_in_list(db, LIST_ID, uuid4()),
+        None,
+    ),
+    "delete_task_in_list": (
+        lambda db: todo_crud.delete_in_list(db, LIST_ID, uuid4()),
+        None,
+    ),
+}
+
+POSTGRES_INDEXES = {
+    "search_lists": "ix_todolist_name_trgm",
+    "search_tasks_by_list": None,
+}
+
+
+@contextmanager
+def captured_statements(bind):
+    """
+    Collect the statements and parameters sent to the database.
+    """
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(bind, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(bind, "before_cursor_execute", capture)
+
+
+def sqlite_plan(db, statement, parameters):
+    rows = db.connection().exec_driver_sql(
+        f"EXPLAIN QUERY PLAN {statement}", parameters
+    )
+    return [row[-1] for row in rows]
+
+
+def postgres_plan(db, statement, parameters):
+    connection = db.connection()
+    connection.exec_driver_sql("SET enable_seqscan = off")
+    plan = connection.exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {statement}", parameters
+    ).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    steps = []
+    nodes = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if "Relation Name" in node or "Index Name" in node:
+            steps.append(f"{node['Node Type']} {node.get('Index Name', '')}")
+        nodes.extend(node.get("Plans", []))
+    return steps
+
+
+@pytest.mark.parametrize("query", HOT_QUERIES)
+def test_hot_queries_use_indexes_on_sqlite(db, query):
+    """
+    GIVEN a hot CRUD query
+    WHEN it runs on SQLite
+    THEN every table access goes through an index or the primary key
+    """
+    run, expected_index = HOT_QUERIES[query]
+    with captured_statements(engine) as statements:
+        run(db)
+
+    assert statements
+    for statement, parameters in statements:
+        plan = sqlite_plan(db, statement, parameters)
+        accesses = [
+            step for step in plan if step.startswith(("SCAN", "SEARCH"))
+        ]
+        assert accesses, plan
+        assert all(
+            "INDEX" in step or "PRIMARY KEY" in step for step in accesses
+        ), plan
+
+    data_plan = sqlite_plan(db, *statements[0])
+    if expected_index:
+        assert any(expected_index in step for step in data_plan), data_plan
+
+
+@pytest.mark.skipif(not TEST_POSTGRES_URL, reason="TEST_POSTGRES_URL not set")
+@pytest.mark.parametrize("query", HOT_QUERIES)
+def test_hot_queries_use_indexes_on_postgres(query):
+    """
+    GIVEN a hot CRUD query
+    WHEN it runs on Postgres with sequential scans disabled
+    THEN no table is read with a sequential scan
+    """
+    postgres = create_engine(TEST_POSTGRES_URL)
+    SQLModel.metadata.create_all(postgres)
+    setup_search(postgres)
+    run, expected_index = HOT_QUERIES[query]
+    expected_index = POSTGRES_INDEXES.get(query, expected_index)
+    with Session(postgres) as db:
+        with captured_statements(postgres) as statements:
+            run(db)
+
+        for statement, parameters in statements:
+            plan = postgres_plan(db, statement, parameters)
+            assert plan
+            assert not any(step.startswith("Seq Scan") for step in plan), plan
+
+        data_plan = postgres_plan(db, *statements[0])
+        if expected_index:
+            assert any(expected_index in step for step in data_plan), data_plan
+    postgres.dispose()
@@ -0,0 +1,67 @@
+"""
+This file contains the tests for the lean JSON responses.
+"""
+
+import json
+
+from domain.schemas.todo import TodoAll, TodoCreate
+from domain.schemas.todo_list import TodoListAll, TodoListCreate
+from infraestructure.api.responses import (
+    SERIALIZER_CACHE_SIZE,
+    compile_serializer,
+    serialized,
+    sparse_schema,
+)
+from infraestructure.crud.base import encode
+from infraestructure.crud.todo import todo as todo_crud
+from infraestructure.crud.todo_list import stats_of
+from infraestructure.crud.todo_list import todo_list as todo_list_crud
+
+
+def validated(schema, content):
+    return json.loads(schema.model_validate(content).model_dump_json())
+
+
+def test_serialized_matches_validated_todos(db):
+    todo_list = todo_list_crud.create(db, TodoListCreate(name="Test List"))
+    todo_crud.bulk_create(
+        db,
+        [TodoCreate(title="A", description="x"), TodoCreate(title="B")],
+        todo_list.id,
+    )
+    page = todo_crud.get_all_by_list_id(db, todo_list.id)
+
+    response = serialized(TodoAll, page)
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == validated(TodoAll, page)
+    cached = encode(page)
+    assert json.loads(serialized(TodoAll, cached).body) == validated(
+        TodoAll, cached
+    )
+
+
+def test_serialized_matches_validated_lists_with_stats(db):
+    todo_list_crud.create(db, TodoListCreate(name="Test List"))
+    page = todo_list_crud.all(db, limit=5)
+    page["data"] = [
+        {"id": db_obj.id, "name": db_obj.name, "stats": stats_of(0, 0)}
+        for db_obj in page["data"]
+    ]
+
+    body = json.loads(serialized(TodoListAll, page).body)
+    assert body == validated(TodoListAll, page)
+    assert body["data"][0]["stats"]["percent"] == 0.0
+
+
+def test_sparse_fields_share_schema_and_serializer():
+    assert sparse_schema(TodoAll, ("title", "id", "title")) is sparse_schema(
+        TodoAll, ("id", "title")
+    )
+    page = {"total": 1, "data": [{"id": 1, "title": "A", "description": ""}]}
+    body = json.loads(serialized(TodoAll, page, fields=("title", "id")).body)
+    assert body["data"] == [{"id": 1, "title": "A"}]
+    hits = compile_serializer.cache_info().hits
+    serialized(TodoAll, page, fields=("id", "title"))
+    info = compile_serializer.cache_info()
+    assert info.hits == hits + 1
+    assert info.currsize <= info.maxsize == SERIALIZER_CACHE_SIZE
@@ -0,0 +1,173 @@
+"""
+This file contains the tests for the read replica routing.
+"""
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, select
+
+from domain.models.todo import Todo  # noqa: F401
+from domain.models.todo_list import TodoList
+from infraestructure.api.read_your_writes import ReadYourWritesMiddleware
+from infraestructure.crud.cache import LRUCache, NullCache, read_cache
+from infraestructure.db import database, routing
+from main import app
+
+
+@pytest.fixture
+def engines(tmp_path):
+    """
+    A primary and a replica, two SQLite files the replica does not follow.
+    """
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    SQLModel.metadata.create_all(primary)
+    SQLModel.metadata.create_all(replica)
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+
+def capture(engine, statements, name):
+    def before(conn, cursor, statement, parameters, context, many):
+        statements.append((name, statement.split()[0]))
+
+    event.listen(engine, "before_cursor_execute", before)
+
+
+def test_routing_session(engines):
+    primary, replica = engines
+    statements = []
+    capture(primary, statements, "primary")
+    capture(replica, statements, "replica")
+
+    with routing.RoutingSession(
+        reader=replica, writer=primary, expire_on_commit=False
+    ) as db:
+        todo_list = TodoList(name="Routed")
+        db.add(todo_list)
+        db.commit()
+        # Reads outside `reading`, such as a write's, stay on the primary.
+        db.refresh(todo_list)
+        with routing.reading(db):
+            assert db.exec(select(TodoList)).all() == []
+            db.add(TodoList(name="Second"))
+            db.flush()
+        db.commit()
+
+    assert statements == [
+        ("primary", "INSERT"),
+        ("primary", "SELECT"),
+        ("replica", "SELECT"),
+        ("primary", "INSERT"),
+    ]
+
+
+@pytest.fixture
+def lagging(engines, monkeypatch):
+    """
+    A client of the app reading from a replica that never caught up.
+    """
+    _, replica = engines
+    async_replica = create_async_engine(
+        f"sqlite+aiosqlite:///{replica.url.database}"
+    )
+    read_engines = routing.ReadEngines(
+        database.async_engine.sync_engine, [async_replica.sync_engine]
+    )
+    monkeypatch.setattr(database, "async_read_engines", [async_replica])
+    monkeypatch.setattr(database, "read_engines", read_engines)
+    yield TestClient(app)
+    asyncio.run(async_replica.dispose())
+
+
+def test_writes_ignore_a_lagging_replica(lagging):
+    """
+    A replica that never caught up only serves the read-only CRUD methods:
+    writes, their reads and the counters they move stay on the primary.
+    """
+    client = lagging
+    response = client.post("/api/lists/", json={"name": "Lagging"})
+    assert response.status_code == 200
+    url = f"/api/lists/{response.json()['id']}"
+    todo = client.post(f"{url}/task", json={"title": "A"}).json()
+    for _ in range(3):
+        response = client.put(
+            f"{url}/task/{todo['id']}", json={"is_completed": True}
+        )
+        assert response.status_code == 200
+    stats = client.get(f"{url}/stats").json()
+    assert stats == {"total": 1, "completed": 1, "percent": 100.0}
+    assert client.put(url, json={"name": "Renamed"}).status_code == 200
+
+    # The read-only methods do read the replica.
+    assert client.get("/api/lists/").json()["data"] == []
+    assert client.delete(url).status_code == 200
+
+
+@pytest.mark.parametrize("backend", [NullCache, LRUCache])
+def test_task_reads_use_the_replica(lagging, backend):
+    """
+    Listing a list's tasks and getting a task read the replica, with or
+    without the read cache, once the client's own writes are old enough.
+    """
+    client = lagging
+    todo_list = client.post("/api/lists/", json={"name": "Lagging"}).json()
+    url = f"/api/lists/{todo_list['id']}/task"
+    todo = client.post(url, json={"title": "A"}).json()
+    client.cookies.clear()
+    read_cache.use(backend())
+    try:
+        # The version of the list is checked on the primary first.
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.json()["total"] == 0
+        assert client.get(f"{url}/{todo['id']}").status_code == 404
+        assert client.get(f"/api/lists/{todo_list['id']}").status_code == 404
+    finally:
+        read_cache.use(NullCache())
+
+
+def test_reads_round_robin_until_a_client_wrote(engines):
+    primary, replica = engines
+    second = create_engine("sqlite://")
+    read_engines = routing.ReadEngines(primary, [replica, second])
+
+    assert [read_engines.pick() for _ in range(4)] == [
+        replica,
+        second,
+        replica,
+        second,
+    ]
+    token = routing.read_primary.set(True)
+    try:
+        assert read_engines.pick() is primary
+    finally:
+        routing.read_primary.reset(token)
+
+
+def test_read_your_writes_cookie(monkeypatch):
+    monkeypatch.setattr(routing, "READ_YOUR_WRITES_SECONDS", 5)
+    app = FastAPI()
+
+    @app.get("/")
+    def read():
+        return {"primary": routing.read_primary.get()}
+
+    @app.post("/")
+    def write():
+        return {}
+
+    client = TestClient(ReadYourWritesMiddleware(app))
+    assert client.get("/").json() == {"primary": False}
+    response = client.post("/")
+    assert "read_primary_until" in response.headers["set-cookie"]
+    assert client.get("/").json() == {"primary": True}
+
+    client.cookies.set("read_primary_until", "0")
+    assert client.get("/").json() == {"primary": False}
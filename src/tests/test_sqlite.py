@@ -0,0 +1,50 @@
+"""
+This file contains the tests for the tuned SQLite profile.
+"""
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlmodel import SQLModel
+
+from infraestructure.db import sqlite
+
+
+@pytest.fixture
+def engines(tmp_path):
+    url = f"sqlite:///{tmp_path / 'tuned.db'}"
+    writer = create_engine(url)
+    reader = create_engine(url)
+    sqlite.tune(writer)
+    sqlite.tune(reader, read_only=True)
+    SQLModel.metadata.create_all(writer)
+    yield reader, writer
+    reader.dispose()
+    writer.dispose()
+
+
+def test_tuned_applies_to_sqlite_files_only(monkeypatch):
+    monkeypatch.setattr(sqlite, "SQLITE_PROFILE", "tuned")
+    assert sqlite.tuned("sqlite:///./test.db")
+    assert not sqlite.tuned("sqlite://")
+    assert not sqlite.tuned("sqlite:///:memory:")
+    assert not sqlite.tuned("postgresql://localhost/todo")
+    monkeypatch.setattr(sqlite, "SQLITE_PROFILE", "default")
+    assert not sqlite.tuned("sqlite:///./test.db")
+
+
+def test_pragmas_are_set_on_connect(engines):
+    reader, writer = engines
+    with writer.connect() as connection:
+        assert connection.scalar(text("PRAGMA journal_mode")) == "wal"
+        assert connection.scalar(text("PRAGMA synchronous")) == 1
+        assert connection.scalar(text("PRAGMA busy_timeout")) == (
+            sqlite.SQLITE_BUSY_TIMEOUT_MS
+        )
+        assert connection.scalar(text("PRAGMA query_only")) == 0
+    with reader.connect() as connection:
+        assert connection.scalar(text("PRAGMA query_only")) == 1
+        with pytest.raises(OperationalError):
+            connection.execute(
+                text("INSERT INTO todolist (id, name) VALUES ('x', 'x')")
+            )
@@ -2,23 +2,33 @@
 This file contains the tests for the Todo.
 """
 
-from uuid import uuid4
+import asyncio
+import csv
+import io
+import json
+from uuid import UUID, uuid4
 
+import httpx
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
 
 from domain.schemas.todo_list import TodoListCreate
+from infraestructure.api import imports
+from infraestructure.crud.coalescing import AckMode, UpdateCoalescer
+from infraestructure.crud.todo import async_todo
 from infraestructure.crud.todo import todo as todo_crud
 from infraestructure.crud.todo_list import todo_list as todo_list_crud
-from infraestructure.db.database import get_db
+from infraestructure.db import database
+from infraestructure.db.database import async_engine
 from main import app
 
 client = TestClient(app)
 
 
 @pytest.fixture
-def todo_list_id():
-    db = get_db()
+def todo_list_id(db):
     todo_list = todo_list_crud.create(db, TodoListCreate(name="Test List"))
     return todo_list.id
 
@@ -45,13 +55,12 @@ def test_create_todo(todo_list_id):
     assert data["is_completed"] is False
 
 
-def test_get_todos(todo_list_id):
+def test_get_todos(todo_list_id, db):
     """
     GIVEN a TodoCreate object
     WHEN a GET request is made to the /api/lists/{todo_list_id}/task endpoint
     THEN a 200 status code and a list of Todo objects is returned
     """
-    db = get_db()
     todo_crud.create(
         db,
         {
@@ -68,13 +77,12 @@ def test_get_todos(todo_list_id):
     assert any(todo["title"] == "Test todo" for todo in data["data"])
 
 
-def test_get_todo(todo_list_id):
+def test_get_todo(todo_list_id, db):
     """
     GIVEN a TodoCreate object
     WHEN a GET request is made to the /api/lists/{todo_list_id}/task endpoint
     THEN a 200 status code and the Todo object is returned
     """
-    db = get_db()
     todo = todo_crud.create(
         db,
         {
@@ -117,13 +125,12 @@ def test_get_todo__todo_list_not_found():
     assert data["detail"] == "Todo list not found"
 
 
-def test_update_todo(todo_list_id):
+def test_update_todo(todo_list_id, db):
     """
     GIVEN a TodoCreate object
     WHEN a PUT request is made to the /api/lists/{todo_list_id}/tasks endpoint
     THEN a 200 status code and the Todo object is returned
     """
-    db = get_db()
     todo = todo_crud.create(
         db,
         {
@@ -186,14 +193,14 @@ def test_update_todo__todo_list_not_found():
     assert data["detail"] == "Todo list not found"
 
 
-def test_delete_todo(todo_list_id):
+def test_delete_todo(todo_list_id, db):
     """
     GIVEN a TodoCreate object
     WHEN a DELETE request is made to the /api/lists/{todo_list_id}/tasks endpoint
     THEN a 200 status code and the Todo object is returned
     """
     todo = todo_crud.create(
-        get_db(),
+        db,
         {
             "title": "Test todo",
             "description": "Test description",
@@ -232,3 +239,691 @@ def test_delete_todo__todo_list_not_found():
     data = response.json()
     assert response.status_code == 404
     assert data["detail"] == "Todo list not found"
+
+
+def test_get_todos_cursor_pagination(todo_list_id, db):
+    """
+    GIVEN a Todo List with several Todos
+    WHEN the /api/lists/{todo_list_id}/task endpoint is paged with a cursor
+    THEN every Todo is returned exactly once
+    """
+    created = {
+        str(todo_crud.create(db, {"title": f"Todo {index}"}, todo_list_id).id)
+        for index in range(5)
+    }
+
+    seen = []
+    response = client.get(f"/api/lists/{todo_list_id}/task?limit=2")
+    while True:
+        data = response.json()
+        assert response.status_code == 200
+        seen.extend(todo["id"] for todo in data["data"])
+        if not data["next_cursor"]:
+            break
+        response = client.get(
+            f"/api/lists/{todo_list_id}/task",
+            params={"limit": 2, "after": data["next_cursor"]},
+        )
+
+    assert len(seen) == len(created)
+    assert set(seen) == created
+
+
+def test_get_todos_invalid_cursor(todo_list_id):
+    """
+    GIVEN a malformed cursor
+    WHEN a GET request is made to the /api/lists/{todo_list_id}/task endpoint
+    THEN a 400 status code and error message is returned
+    """
+    response = client.get(
+        f"/api/lists/{todo_list_id}/task", params={"after": "not-a-cursor"}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+@pytest.mark.parametrize("count", ["exact", "estimated", "cached"])
+def test_get_todos_total_counts_every_page(todo_list_id, count, db):
+    """
+    GIVEN a Todo List with more Todos than fit in a page
+    WHEN a GET request is made with each count mode
+    THEN total is the number of Todos in the list, not in the page
+    """
+    for index in range(3):
+        todo_crud.create(db, {"title": f"Todo {index}"}, todo_list_id)
+
+    response = client.get(
+        f"/api/lists/{todo_list_id}/task", params={"limit": 1, "count": count}
+    )
+    data = response.json()
+    assert response.status_code == 200
+    assert len(data["data"]) == 1
+    assert data["total"] == 3
+
+
+def test_get_todos_cached_total_is_invalidated_on_create(todo_list_id, db):
+    """
+    GIVEN a cached total for a Todo List
+    WHEN a new Todo is created in it
+    THEN the next cached total includes the new Todo
+    """
+    url = f"/api/lists/{todo_list_id}/task"
+    assert client.get(url, params={"count": "cached"}).json()["total"] == 0
+
+    todo_crud.create(db, {"title": "Test todo"}, todo_list_id)
+    assert client.get(url, params={"count": "cached"}).json()["total"] == 1
+
+
+def test_get_todos_search_by_title(todo_list_id, db):
+    """
+    GIVEN Todos whose titles contain a search term
+    WHEN the /api/lists/{todo_list_id}/task endpoint is searched by name
+    THEN only the matching Todos are returned, best match first
+    """
+    for title in ("Buy oat milk and bread", "Milk", "Walk the dog"):
+        todo_crud.create(db, {"title": title}, todo_list_id)
+
+    response = client.get(
+        f"/api/lists/{todo_list_id}/task", params={"name": "MILK"}
+    )
+    data = response.json()
+    assert response.status_code == 200
+    assert data["total"] == 2
+    assert [todo["title"] for todo in data["data"]] == [
+        "Milk",
+        "Buy oat milk and bread",
+    ]
+
+
+def test_get_todos_search_follows_updates(todo_list_id, db):
+    """
+    GIVEN a Todo whose title is updated
+    WHEN the Todos are searched by the old and the new title
+    THEN only the new title matches
+    """
+    todo = todo_crud.create(db, {"title": "Call plumber"}, todo_list_id)
+    client.put(
+        f"/api/lists/{todo_list_id}/task/{todo.id}",
+        json={"title": "Call electrician"},
+    )
+
+    url = f"/api/lists/{todo_list_id}/task"
+    assert client.get(url, params={"name": "plumber"}).json()["total"] == 0
+    assert client.get(url, params={"name": "electric"}).json()["total"] == 1
+
+
+def test_get_todos_search_cursor_pagination(todo_list_id, db):
+    """
+    GIVEN several Todos matching a search term
+    WHEN the ranked results are paged with a cursor
+    THEN every match is returned exactly once
+    """
+    for index in range(5):
+        todo_crud.create(db, {"title": f"Report {'x' * index}"}, todo_list_id)
+
+    url = f"/api/lists/{todo_list_id}/task"
+    seen = []
+    params = {"name": "report", "limit": 2}
+    while True:
+        data = client.get(url, params=params).json()
+        seen.extend(todo["id"] for todo in data["data"])
+        if not data["next_cursor"]:
+            break
+        params["after"] = data["next_cursor"]
+
+    assert len(seen) == len(set(seen)) == 5
+
+
+def test_bulk_create_todos(todo_list_id):
+    """
+    GIVEN a batch of TodoCreate items with one invalid item
+    WHEN a POST request is made to the /api/lists/{todo_list_id}/task/bulk endpoint
+    THEN the valid Todos are created in order and the invalid one is reported
+    """
+    response = client.post(
+        f"/api/lists/{todo_list_id}/task/bulk",
+        json={
+            "items": [
+                {"title": "First"},
+                {"description": "Missing title"},
+                {"title": "Third", "is_completed": True},
+            ]
+        },
+    )
+    data = response.json()
+    assert response.status_code == 200
+    assert [todo["title"] for todo in data["data"]] == ["First", "Third"]
+    assert data["data"][1]["is_completed"] is True
+    assert [error["index"] for error in data["errors"]] == [1]
+
+    listed = client.get(f"/api/lists/{todo_list_id}/task").json()
+    assert listed["total"] == 2
+
+
+def test_bulk_create_todos__todo_list_not_found():
+    """
+    GIVEN a Todo List that does not exist
+    WHEN a POST request is made to the /api/lists/{todo_list_id}/task/bulk endpoint
+    THEN a 404 status code and error message is returned
+    """
+    response = client.post(
+        f"/api/lists/{uuid4()}/task/bulk", json={"items": [{"title": "A"}]}
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Todo list not found"
+
+
+def test_bulk_update_todos(todo_list_id, db):
+    """
+    GIVEN Todos in a Todo List and an unknown id
+    WHEN a PATCH request is made to the /api/lists/{todo_list_id}/task/bulk endpoint
+    THEN the known Todos are updated and the unknown id is reported
+    """
+    todos = [
+        todo_crud.create(db, {"title": f"Todo {index}"}, todo_list_id)
+        for index in range(3)
+    ]
+    missing = uuid4()
+    response = client.patch(
+        f"/api/lists/{todo_list_id}/task/bulk",
+        json={
+            "items": [
+                {"id": str(todos[0].id), "is_completed": True},
+                {"id": str(todos[1].id), "is_completed": True},
+                {"id": str(todos[2].id), "title": "Renamed"},
+                {"id": str(missing), "is_completed": True},
+                {"is_completed": True},
+                {"id": str(todos[0].id)},
+            ]
+        },
+    )
+    data = response.json()
+    assert response.status_code == 200
+    updated = {todo["id"]: todo for todo in data["data"]}
+    assert updated[str(todos[0].id)]["is_completed"] is True
+    assert updated[str(todos[1].id)]["is_completed"] is True
+    assert updated[str(todos[2].id)]["title"] == "Renamed"
+    assert [error["index"] for error in data["errors"]] == [3, 4, 5]
+    assert data["errors"][0]["detail"] == "Todo not found"
+    assert data["errors"][2]["detail"] == "No fields to update"
+
+
+def test_bulk_delete_todos(todo_list_id, db):
+    """
+    GIVEN Todos in a Todo List and an unknown id
+    WHEN a POST request is made to the /api/lists/{todo_list_id}/task/bulk/delete endpoint
+    THEN the known Todos are soft deleted and the unknown id is reported
+    """
+    todos = [
+        todo_crud.create(db, {"title": f"Todo {index}"}, todo_list_id)
+        for index in range(2)
+    ]
+    missing = uuid4()
+    response = client.post(
+        f"/api/lists/{todo_list_id}/task/bulk/delete",
+        json={"ids": [str(todos[0].id), str(todos[1].id), str(missing)]},
+    )
+    data = response.json()
+    assert response.status_code == 200
+    assert len(data["data"]) == 2
+    assert data["errors"] == [
+        {"index": 2, "id": str(missing), "detail": "Todo not found"}
+    ]
+
+    listed = client.get(f"/api/lists/{todo_list_id}/task").json()
+    assert listed["total"] == 0
+
+
+@pytest.mark.parametrize(
+    "method, body, extra",
+    [
+        ("GET", None, 0),
+        ("PUT", {"title": "Renamed"}, 1),
+        ("PUT", {"is_completed": True}, 2),
+        ("DELETE", None, 1),
+    ],
+)
+def test_todo_operations_use_one_statement(
+    todo_list_id, db, method, body, extra
+):
+    """
+    GIVEN an existing Todo
+    WHEN it is read, updated or deleted
+    THEN a single statement reads or writes the Todo
+    AND writes only add the update of the list's version and counters,
+    plus a read of the Todos to complete when `is_completed` is set
+    """
+    todo = todo_crud.create(db, {"title": "Test todo"}, todo_list_id)
+    statements = []
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        response = client.request(
+            method, f"/api/lists/{todo_list_id}/task/{todo.id}", json=body
+        )
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+    assert response.status_code == 200
+    assert len(statements) == 1 + extra, statements
+
+
+def test_get_deleted_todo_not_found(todo_list_id, db):
+    """
+    GIVEN a Todo that was deleted
+    WHEN a GET request is made for it
+    THEN a 404 status code and error message is returned
+    """
+    todo = todo_crud.create(db, {"title": "Test todo"}, todo_list_id)
+    client.delete(f"/api/lists/{todo_list_id}/task/{todo.id}")
+
+    response = client.get(f"/api/lists/{todo_list_id}/task/{todo.id}")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Todo not found"
+
+
+def test_get_todo_not_modified(todo_list_id, db):
+    """
+    GIVEN a Todo read with its ETag
+    WHEN it is read again with If-None-Match, before and after an update
+    THEN a 304 is returned until the update changes the ETag
+    """
+    todo = todo_crud.create(db, {"title": "Test todo"}, todo_list_id)
+    url = f"/api/lists/{todo_list_id}/task/{todo.id}"
+    tag = client.get(url).headers["ETag"]
+
+    response = client.get(url, headers={"If-None-Match": tag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    client.put(url, json={"is_completed": True})
+    response = client.get(url, headers={"If-None-Match": tag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != tag
+
+
+def test_get_all_todos_not_modified(todo_list_id, db):
+    """
+    GIVEN the Todos of a list read with their ETag
+    WHEN they are read again with If-None-Match, before and after a create
+    THEN a 304 is returned until the create changes the ETag
+    """
+    url = f"/api/lists/{todo_list_id}/task"
+    tag = client.get(url).headers["ETag"]
+
+    assert client.get(url, headers={"If-None-Match": tag}).status_code == 304
+
+    client.post(url, json={"title": "Test todo"})
+    response = client.get(url, headers={"If-None-Match": tag})
+    assert response.status_code == 200
+    assert response.json()["total"] == 1
+
+
+def test_update_todo_if_match(todo_list_id, db):
+    """
+    GIVEN a Todo read with its ETag
+    WHEN it is updated twice with If-Match holding that ETag
+    THEN the first update succeeds and the second gets a 412
+    """
+    todo = todo_crud.create(db, {"title": "Test todo"}, todo_list_id)
+    url = f"/api/lists/{todo_list_id}/task/{todo.id}"
+    tag = client.get(url).headers["ETag"]
+
+    response = client.put(url, json={"title": "A"}, headers={"If-Match": tag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != tag
+
+    response = client.put(url, json={"title": "B"}, headers={"If-Match": tag})
+    assert response.status_code == 412
+    assert client.get(url).json()["title"] == "A"
+
+    missing = f"/api/lists/{todo_list_id}/task/{uuid4()}"
+    response = client.put(
+        missing, json={"title": "B"}, headers={"If-Match": tag}
+    )
+    assert response.status_code == 404
+
+
+def test_export_todos(todo_list_id, db):
+    """
+    GIVEN a Todo List with active and deleted Todos
+    WHEN its Todos are exported as NDJSON and as CSV
+    THEN every active Todo is streamed once, in id order
+    """
+    todos = [
+        todo_crud.create(db, {"title": f"Todo {i}"}, todo_list_id)
+        for i in range(3)
+    ]
+    todo_crud.delete_in_list(db, todo_list_id, todos[0].id)
+    expected = sorted(str(todo.id) for todo in todos[1:])
+    url = f"/api/lists/{todo_list_id}/task/export"
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == expected
+    assert rows[0]["is_completed"] is False
+
+    response = client.get(url, params={"format": "csv"})
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["id"] for row in rows] == expected
+    assert set(rows[0]) == {"id", "title", "description", "is_completed"}
+
+
+def test_export_todos_list_not_found():
+    """
+    GIVEN a Todo List that does not exist
+    WHEN its Todos are exported
+    THEN a 404 status code is returned before anything is streamed
+    """
+    response = client.get(f"/api/lists/{uuid4()}/task/export")
+    assert response.status_code == 404
+
+
+def test_import_todos(todo_list_id):
+    """
+    GIVEN a NDJSON body with valid and invalid rows
+    WHEN it is imported into a Todo List
+    THEN the valid rows are loaded and the invalid ones reported
+    """
+    body = "\n".join(
+        [
+            json.dumps({"title": "A", "is_completed": True}),
+            json.dumps({"description": "no title"}),
+            "{not json",
+            json.dumps({"title": "B"}),
+            "",
+        ]
+    )
+    url = f"/api/lists/{todo_list_id}/task/import"
+    response = client.post(url, content=body.encode())
+    assert response.status_code == 200
+    result = response.json()
+    assert result["rows"] == 4
+    assert result["imported"] == 2
+    assert result["failed"] == 2
+    assert [error["index"] for error in result["errors"]] == [1, 2]
+    assert client.get(url).json() == result
+
+    listed = client.get(f"/api/lists/{todo_list_id}/task").json()
+    assert sorted(todo["title"] for todo in listed["data"]) == ["A", "B"]
+    stats = client.get(f"/api/lists/{todo_list_id}/stats").json()
+    assert stats == {"total": 2, "completed": 1, "percent": 50.0}
+
+
+def test_import_todos_invalid_utf8(todo_list_id):
+    """
+    GIVEN a body with a line that is not valid UTF-8
+    WHEN it is imported into a Todo List
+    THEN that line is reported as a row error and the others are loaded
+    """
+    body = b'{"title": "A"}\n{"title": "\xff"}\n{"title": "\xc3\xa9"}'
+    url = f"/api/lists/{todo_list_id}/task/import"
+    for params in ({}, {"format": "csv"}):
+        content = body if not params else b"title\nA\n\xff\n\xc3\xa9"
+        result = client.post(url, params=params, content=content).json()
+        assert (result["imported"], result["failed"]) == (2, 1)
+        assert result["errors"][0]["index"] == 1
+        assert result["errors"][0]["detail"].startswith("Invalid UTF-8")
+
+
+def test_import_todos_empty_body(todo_list_id, monkeypatch):
+    """
+    GIVEN an empty body
+    WHEN it is imported into a Todo List
+    THEN nothing is written
+    """
+    calls = []
+    monkeypatch.setattr(
+        async_todo, "import_rows", lambda *args: calls.append(args)
+    )
+    url = f"/api/lists/{todo_list_id}/task/import"
+    response = client.post(url, content=b"")
+    assert response.json()["rows"] == 0
+    assert calls == []
+
+
+def test_import_progress_is_bounded(monkeypatch):
+    """
+    GIVEN more finished imports than are tracked
+    WHEN another import starts
+    THEN the oldest finished ones are forgotten, the running ones kept
+    """
+    monkeypatch.setattr(imports, "imports", {})
+    monkeypatch.setattr(imports, "IMPORT_MAX_TRACKED", 2)
+    running, first, second = uuid4(), uuid4(), uuid4()
+    imports.track(running)
+    imports.track(first).done = True
+    imports.track(second).done = True
+    latest = uuid4()
+    imports.track(latest)
+    assert set(imports.imports) == {running, latest}
+
+
+def test_import_exported_csv(todo_list_id, db):
+    """
+    GIVEN the CSV export of a Todo List
+    WHEN it is imported into another Todo List
+    THEN the same titles, descriptions and states are loaded
+    """
+    todo_crud.create(
+        db,
+        {"title": 'Quoted, "x"', "description": "Two\nlines"},
+        todo_list_id,
+    )
+    todo_crud.create(db, {"title": "Done", "is_completed": True}, todo_list_id)
+    exported = client.get(
+        f"/api/lists/{todo_list_id}/task/export", params={"format": "csv"}
+    ).content
+    other_id = client.post("/api/lists/", json={"name": "Copy"}).json()["id"]
+
+    response = client.post(
+        f"/api/lists/{other_id}/task/import",
+        params={"format": "csv"},
+        content=exported,
+    )
+    assert response.json()["imported"] == 2
+
+    fields = ("title", "description", "is_completed")
+    copied = client.get(f"/api/lists/{other_id}/task").json()["data"]
+    original = client.get(f"/api/lists/{todo_list_id}/task").json()["data"]
+    assert sorted(tuple(t[f] for f in fields) for t in copied) == sorted(
+        tuple(t[f] for f in fields) for t in original
+    )
+
+
+def test_import_todos_list_not_found():
+    """
+    GIVEN a Todo List that does not exist
+    WHEN Todos are imported into it
+    THEN a 404 status code is returned
+    """
+    response = client.post(
+        f"/api/lists/{uuid4()}/task/import", content=b'{"title": "A"}'
+    )
+    assert response.status_code == 404
+
+
+def test_get_todos_fields(todo_list_id, db):
+    """
+    GIVEN Todos in a list
+    WHEN they are read with fields, alone and with a search
+    THEN only those fields are returned, and unknown fields are a 400
+    """
+    todo_crud.create(db, {"title": "Write docs"}, todo_list_id)
+    todo_crud.create(db, {"title": "Fix bug"}, todo_list_id)
+    url = f"/api/lists/{todo_list_id}/task"
+
+    response = client.get(url, params={"fields": "id,title", "limit": 1})
+    data = response.json()
+    assert response.status_code == 200
+    assert data["total"] == 2
+    assert list(data["data"][0]) == ["id", "title"]
+    after = data["next_cursor"]
+    response = client.get(url, params={"fields": "title", "after": after})
+    assert len(response.json()["data"]) == 1
+
+    response = client.get(url, params={"fields": "title", "name": "docs"})
+    assert response.json()["data"] == [{"title": "Write docs"}]
+
+    response = client.get(url, params={"fields": "title,list_id"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown fields: list_id"
+
+
+def test_todo_ids_are_time_ordered(todo_list_id, db):
+    """
+    GIVEN Todos created one after the other, next to one with a uuid4 id
+    WHEN the list's Todos are read
+    THEN new ids are UUIDv7 in creation order and the uuid4 one still works
+    """
+    legacy = todo_crud.create(
+        db, {"id": uuid4(), "title": "Legacy"}, todo_list_id
+    )
+    url = f"/api/lists/{todo_list_id}/task"
+    for index in range(5):
+        client.post(url, json={"title": f"Todo {index}"})
+
+    data = client.get(url).json()["data"]
+    created = [todo for todo in data if todo["title"] != "Legacy"]
+    assert [todo["title"] for todo in created] == [
+        f"Todo {i}" for i in range(5)
+    ]
+    assert {UUID(todo["id"]).version for todo in created} == {7}
+    response = client.get(f"{url}/{legacy.id}")
+    assert response.status_code == 200
+    assert response.json()["title"] == "Legacy"
+
+
+def test_update_todos_coalesced(todo_list_id, db, monkeypatch):
+    """
+    GIVEN write coalescing acknowledged on commit
+    WHEN two Todos are updated four times at once
+    THEN the updates are merged into one transaction and each response
+    holds the written Todo
+    """
+    monkeypatch.setattr(async_todo.coalescer, "window_ms", 50)
+    first = todo_crud.create(db, {"title": "First"}, todo_list_id)
+    second = todo_crud.create(db, {"title": "Second"}, todo_list_id)
+    before = async_todo.coalescer.stats()
+    url = f"/api/lists/{todo_list_id}/task"
+
+    async def toggle():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as http:
+            return await asyncio.gather(
+                http.put(f"{url}/{first.id}", json={"is_completed": True}),
+                http.put(f"{url}/{first.id}", json={"title": "Renamed"}),
+                http.put(f"{url}/{first.id}", json={"is_completed": False}),
+                http.put(f"{url}/{second.id}", json={"is_completed": True}),
+            )
+
+    responses = asyncio.run(toggle())
+    after = async_todo.coalescer.stats()
+    assert [response.status_code for response in responses] == [200] * 4
+    assert after["flushes"] - before["flushes"] == 1
+    assert after["written"] - before["written"] == 4
+    assert after["rows"] - before["rows"] == 2
+    written = client.get(f"{url}/{first.id}").json()
+    assert written["title"] == "Renamed"
+    assert all(r.json() == written for r in responses[:3])
+    stats = client.get(f"/api/lists/{todo_list_id}/stats").json()
+    assert stats["completed"] == 1 + written["is_completed"]
+
+
+def test_update_todo_buffered(todo_list_id, db, monkeypatch):
+    """
+    GIVEN write coalescing acknowledged once buffered
+    WHEN a Todo is updated and read back right away
+    THEN the update is answered with a 202 and the read sees it
+    """
+    monkeypatch.setattr(async_todo.coalescer, "window_ms", 1000)
+    monkeypatch.setattr(async_todo.coalescer, "ack", AckMode.buffer)
+    todo = todo_crud.create(db, {"title": "Test todo"}, todo_list_id)
+    url = f"/api/lists/{todo_list_id}/task/{todo.id}"
+
+    with TestClient(app) as buffered:
+        response = buffered.put(url, json={"is_completed": True})
+        assert response.status_code == 202
+        assert response.json()["is_completed"] is True
+        assert response.json()["version"] == 2
+        assert async_todo.coalescer.stats()["pending"] == 1
+
+        response = buffered.get(url)
+        assert response.json()["is_completed"] is True
+        assert response.headers["ETag"] == '"2"'
+        assert async_todo.coalescer.stats()["pending"] == 0
+
+        response = buffered.put(f"{url[:-36]}{uuid4()}", json={"title": "A"})
+        assert response.status_code == 404
+
+
+def test_update_todos_coalesced_on_a_small_pool(todo_list_id, db, monkeypatch):
+    """
+    GIVEN write coalescing and a pool of three connections, none more
+    WHEN six Todos are updated at once
+    THEN every update is written, the requests waiting for the batch
+    holding their connections
+    """
+    url = database.ASYNC_DATABASE_URL
+    options = database.engine_options(url, pool_size=3, max_overflow=0)
+    small = create_async_engine(url, **{**options, "pool_timeout": 2})
+    monkeypatch.setattr(database, "async_engine", small)
+    monkeypatch.setattr(async_todo.coalescer, "window_ms", 5)
+    todos = [
+        todo_crud.create(db, {"title": f"Todo {index}"}, todo_list_id)
+        for index in range(6)
+    ]
+    url = f"/api/lists/{todo_list_id}/task"
+
+    async def toggle():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as http:
+            responses = await asyncio.gather(
+                *(
+                    http.put(f"{url}/{todo.id}", json={"is_completed": True})
+                    for todo in todos
+                )
+            )
+        await small.dispose()
+        return responses
+
+    responses = asyncio.run(toggle())
+    assert [response.status_code for response in responses] == [200] * 6
+    assert all(response.json()["is_completed"] for response in responses)
+
+
+def test_coalescer_settles_only_the_updates_read():
+    """
+    GIVEN an update buffered for a Todo of a Todo List
+    WHEN another Todo List is read, then the Todo
+    THEN only the read of the Todo waits for the update to be written
+    """
+    todo_list_id, todo_id = uuid4(), uuid4()
+    written = []
+
+    async def flush(batch):
+        written.append(batch)
+        return {}
+
+    async def read():
+        coalescer = UpdateCoalescer(flush, window_ms=60_000)
+        submitted = asyncio.ensure_future(
+            coalescer.submit((todo_list_id, todo_id), {"title": "A"})
+        )
+        await asyncio.sleep(0)
+        await coalescer.settle({uuid4()})
+        assert written == []
+        await coalescer.settle({todo_id})
+        assert written == [{(todo_list_id, todo_id): {"title": "A"}}]
+        await submitted
+
+    asyncio.run(read())
@@ -2,22 +2,28 @@
 This file contains the tests for the TodoList endpoints.
 """
 
+from datetime import timedelta
 from uuid import uuid4
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event, func, select, update
 
+from domain.models.archive import todo_archive, todo_list_archive
+from domain.models.base import utcnow
+from domain.models.todo import Todo
+from domain.models.todo_list import TodoList
 from domain.schemas.todo_list import TodoListCreate
+from infraestructure.crud.todo import todo as todo_crud
 from infraestructure.crud.todo_list import todo_list as todo_list_crud
-from infraestructure.db.database import get_db
+from infraestructure.db.database import async_engine
 from main import app
 
 client = TestClient(app)
 
 
 @pytest.fixture
-def todo_list_id():
-    db = get_db()
+def todo_list_id(db):
     todo_list = todo_list_crud.create(db, TodoListCreate(name="Test List"))
     return todo_list.id
 
@@ -90,3 +96,285 @@ def test_delete_todo_list_not_found():
     assert data["detail"] == "Todo not found"
     assert response.status_code == 404
     assert data["detail"] == "Todo not found"
+
+
+def test_get_all_todo_lists_cursor_pagination(todo_list_id):
+    first = client.get("/api/lists/", params={"limit": 1}).json()
+    assert len(first["data"]) == 1
+    assert first["next_cursor"]
+
+    second = client.get(
+        "/api/lists/", params={"limit": 1, "after": first["next_cursor"]}
+    ).json()
+    assert len(second["data"]) == 1
+    assert second["data"][0]["id"] > first["data"][0]["id"]
+
+
+def test_get_all_todo_lists_invalid_cursor():
+    response = client.get("/api/lists/", params={"after": "bm90LWpzb24"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_get_all_todo_lists_search_by_name(db):
+    todo_list_crud.create(db, TodoListCreate(name="Groceries for the weekend"))
+
+    response = client.get("/api/lists/", params={"name": "weekend"})
+    data = response.json()
+    assert response.status_code == 200
+    assert data["total"] >= 1
+    assert all("weekend" in item["name"].lower() for item in data["data"])
+
+
+def test_get_all_todo_lists_search_short_term(db):
+    todo_list_crud.create(db, TodoListCreate(name="Q4"))
+
+    response = client.get("/api/lists/", params={"name": "q4"})
+    data = response.json()
+    assert response.status_code == 200
+    assert any(item["name"] == "Q4" for item in data["data"])
+
+
+def test_get_todo_list_not_modified(todo_list_id):
+    url = f"/api/lists/{todo_list_id}"
+    tag = client.get(url).headers["ETag"]
+
+    assert client.get(url, headers={"If-None-Match": tag}).status_code == 304
+    assert client.get(url, headers={"If-None-Match": "*"}).status_code == 304
+
+
+def test_update_todo_list_if_match(todo_list_id):
+    url = f"/api/lists/{todo_list_id}"
+    tag = client.get(url).headers["ETag"]
+
+    response = client.put(url, json={"name": "A"}, headers={"If-Match": tag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"2"'
+    assert "version" not in response.json()
+
+    response = client.put(url, json={"name": "B"}, headers={"If-Match": tag})
+    assert response.status_code == 412
+    assert client.get(url).json()["name"] == "A"
+
+
+def test_get_todo_list_stats(todo_list_id):
+    url = f"/api/lists/{todo_list_id}"
+    ids = [
+        client.post(f"{url}/task", json={"title": str(i)}).json()["id"]
+        for i in range(4)
+    ]
+    client.put(f"{url}/task/{ids[0]}", json={"is_completed": True})
+    client.put(f"{url}/task/{ids[0]}", json={"is_completed": True})
+    client.patch(
+        f"{url}/task/bulk",
+        json={"items": [{"id": id, "is_completed": True} for id in ids[1:3]]},
+    )
+    client.put(f"{url}/task/{ids[2]}", json={"is_completed": False})
+    client.delete(f"{url}/task/{ids[1]}")
+    client.post(
+        f"{url}/task/bulk", json={"items": [{"title": "x", "is_completed": 1}]}
+    )
+
+    response = client.get(f"{url}/stats")
+    assert response.status_code == 200
+    assert response.json() == {"total": 4, "completed": 2, "percent": 50.0}
+
+
+def test_get_todo_list_stats_not_found():
+    response = client.get(f"/api/lists/{uuid4()}/stats")
+    assert response.status_code == 404
+
+
+def test_get_all_todo_lists_with_stats(todo_list_id):
+    client.post(f"/api/lists/{todo_list_id}/task", json={"title": "A"})
+
+    response = client.get("/api/lists/", params={"stats": True, "limit": 1000})
+    data = {item["id"]: item for item in response.json()["data"]}
+    stats = data[str(todo_list_id)]["stats"]
+    assert stats == {"total": 1, "completed": 0, "percent": 0.0}
+
+    response = client.get("/api/lists/", params={"limit": 1})
+    assert response.json()["data"][0]["stats"] is None
+
+
+def test_reconcile_counters(todo_list_id, db):
+    client.post(f"/api/lists/{todo_list_id}/task", json={"title": "A"})
+    db.execute(
+        update(TodoList)
+        .where(TodoList.id == todo_list_id)
+        .values(todos_total=7, todos_completed=3)
+    )
+    db.commit()
+
+    assert todo_list_crud.reconcile_counters(db, batch_size=2) >= 1
+    assert todo_list_crud.reconcile_counters(db) == 0
+    stats = client.get(f"/api/lists/{todo_list_id}/stats").json()
+    assert stats == {"total": 1, "completed": 0, "percent": 0.0}
+
+
+def test_delete_todo_list_deletes_its_todos(todo_list_id, db):
+    url = f"/api/lists/{todo_list_id}"
+    ids = [
+        client.post(f"{url}/task", json={"title": str(i)}).json()["id"]
+        for i in range(3)
+    ]
+
+    assert client.delete(url).status_code == 200
+    todos = db.scalars(select(Todo).where(Todo.list_id == todo_list_id)).all()
+    assert {str(todo.id) for todo in todos} == set(ids)
+    assert all(not todo.is_active and todo.deleted_at for todo in todos)
+    assert all(todo.version == 2 for todo in todos)
+    assert client.get(f"{url}/task/{ids[0]}").status_code == 404
+    counters = db.exec(
+        select(TodoList.todos_total).where(TodoList.id == todo_list_id)
+    ).one()
+    assert counters == (0,)
+
+
+def deleted_long_ago(db, todo_list_id):
+    """
+    Delete a list with a task, and date the deletion a year back.
+    """
+    url = f"/api/lists/{todo_list_id}"
+    client.post(f"{url}/task", json={"title": "A"})
+    client.delete(url)
+    long_ago = utcnow() - timedelta(days=365)
+    for model, column in ((Todo, Todo.list_id), (TodoList, TodoList.id)):
+        db.execute(
+            update(model)
+            .where(column == todo_list_id)
+            .values(deleted_at=long_ago)
+        )
+    db.commit()
+
+
+def count(db, table, column, todo_list_id) -> int:
+    statement = select(func.count()).select_from(table)
+    return db.exec(statement.where(column == todo_list_id)).one()[0]
+
+
+def test_purge_archives_inactive_rows(todo_list_id, db):
+    deleted_long_ago(db, todo_list_id)
+    before = utcnow() - timedelta(days=30)
+
+    assert todo_list_crud.purge(db, before) == 0
+    assert todo_crud.purge(db, before, batch_size=1) >= 1
+    assert todo_list_crud.purge(db, before) >= 1
+    assert count(db, Todo, Todo.list_id, todo_list_id) == 0
+    assert count(db, TodoList, TodoList.id, todo_list_id) == 0
+    assert count(db, todo_archive, todo_archive.c.list_id, todo_list_id) == 1
+    assert (
+        count(db, todo_list_archive, todo_list_archive.c.id, todo_list_id) == 1
+    )
+
+
+def test_purge_deletes_inactive_rows(todo_list_id, db):
+    deleted_long_ago(db, todo_list_id)
+    before = utcnow() - timedelta(days=30)
+
+    todo_crud.purge(db, before, archive=False)
+    todo_list_crud.purge(db, before, archive=False)
+    assert count(db, TodoList, TodoList.id, todo_list_id) == 0
+    assert count(db, todo_archive, todo_archive.c.list_id, todo_list_id) == 0
+    assert (
+        count(db, todo_list_archive, todo_list_archive.c.id, todo_list_id) == 0
+    )
+
+
+def test_get_all_todo_lists_fields(todo_list_id):
+    client.post(f"/api/lists/{todo_list_id}/task", json={"title": "A"})
+
+    response = client.get("/api/lists/", params={"fields": "name"})
+    assert response.status_code == 200
+    assert all(list(item) == ["name"] for item in response.json()["data"])
+
+    response = client.get(
+        "/api/lists/", params={"fields": "id", "stats": True, "limit": 1000}
+    )
+    data = {item["id"]: item for item in response.json()["data"]}
+    assert data[str(todo_list_id)] == {
+        "id": str(todo_list_id),
+        "stats": {"total": 1, "completed": 0, "percent": 0.0},
+    }
+
+    response = client.get("/api/lists/", params={"fields": "todos_total"})
+    assert response.status_code == 400
+
+
+def test_get_todo_list_include_todos(todo_list_id):
+    url = f"/api/lists/{todo_list_id}"
+    for title in ("A", "B", "C"):
+        client.post(f"{url}/task", json={"title": title})
+    page = client.get(f"{url}/task").json()["data"]
+    client.put(f"{url}/task/{page[0]['id']}", json={"is_completed": True})
+
+    response = client.get(url, params={"include": "todos", "todos_limit": 2})
+    data = response.json()
+    assert response.status_code == 200
+    assert data["name"] == "Test List"
+    assert set(data) == {"id", "name", "stats", "todos"}
+    assert [todo["id"] for todo in data["todos"]] == [
+        todo["id"] for todo in page[:2]
+    ]
+    tag = response.headers["ETag"]
+    assert tag == '"1.4"'
+
+    response = client.get(
+        url, params={"include": "todos", "todos_completed": False}
+    )
+    assert [todo["id"] for todo in response.json()["todos"]] == [
+        todo["id"] for todo in page[1:]
+    ]
+
+    client.post(f"{url}/task", json={"title": "D"})
+    response = client.get(
+        url, params={"include": "todos"}, headers={"If-None-Match": tag}
+    )
+    assert response.status_code == 200
+    assert len(response.json()["todos"]) == 4
+
+    response = client.get(url, params={"include": "tasks"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown include: tasks"
+
+
+def test_get_all_todo_lists_include_todos_statements(db):
+    ids = set()
+    for _ in range(3):
+        todo_list = todo_list_crud.create(db, TodoListCreate(name="Embed"))
+        for title in ("A", "B", "C"):
+            client.post(
+                f"/api/lists/{todo_list.id}/task", json={"title": title}
+            )
+        ids.add(str(todo_list.id))
+
+    def statements_for(limit):
+        statements = []
+
+        def capture(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+        try:
+            response = client.get(
+                "/api/lists/",
+                params={"include": "todos", "todos_limit": 2, "limit": limit},
+            )
+        finally:
+            event.remove(
+                async_engine.sync_engine, "before_cursor_execute", capture
+            )
+        return response.json()["data"], statements
+
+    _, few = statements_for(1)
+    data, many = statements_for(1000)
+    assert len(many) == len(few) == 3
+    for item in data:
+        if item["id"] in ids:
+            page = client.get(f"/api/lists/{item['id']}/task").json()["data"]
+            assert item["todos"] == page[:2]
+
+    response = client.get(
+        "/api/lists/", params={"include": "todos", "fields": "name"}
+    )
+    assert list(response.json()["data"][0]) == ["name", "todos"]